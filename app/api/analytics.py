@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from typing import Optional
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.auth import get_current_active_user
+from app.database import get_db
+from app.models import database_models as db_m
+from app.services import analytics
+from app.services.cache import NS_STATS, get_cache
+from app.services.criterion_results import CRITERIA
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["Analytics"],
+)
+
+def _rate(part: int, total: int) -> float:
+    return round(part / total * 100, 2) if total else 0.0
+
+@router.get("/dashboard")
+async def get_dashboard(
+    days: int = Query(30, ge=1, le=366, description="Période en jours"),
+    db: AsyncSession = Depends(get_db),
+    current_user: db_m.User = Depends(get_current_active_user)
+):
+    """Indicateurs du tableau de bord, lus sur les agrégats quotidiens"""
+    cache = get_cache()
+    cached = await cache.get(NS_STATS, f"dashboard:{days}")
+    if cached is not None:
+        return cached
+
+    summary = await analytics.summarize(db, "day", datetime.utcnow() - timedelta(days=days))
+    totals = summary["totals"]
+    classifications = totals["classifications"]
+    # Documents en attente : file de révision matérialisée
+    pending_review = await db.scalar(select(func.count()).select_from(db_m.ReviewQueueEntry))
+
+    response = {
+        "period_days": days,
+        "total_documents": await analytics.total_classifications(db),
+        "documents_this_period": classifications,
+        "average_confidence": round(totals["confidence_sum"] / classifications, 4) if classifications else 0.0,
+        "average_processing_time_ms": round(totals["processing_ms_sum"] / classifications, 1) if classifications else 0.0,
+        "needs_review_count": pending_review or 0,
+        "review_rate_percent": _rate(totals["needs_review"], classifications),
+        "ia_accuracy_percent": _rate(totals["ia_correct"], totals["validations"]),
+        "status_distribution": [
+            {"status": db_m.DocumentStatus.COMPLETED.value, "count": classifications - totals["needs_review"]},
+            {"status": db_m.DocumentStatus.NEEDS_REVIEW.value, "count": totals["needs_review"]},
+            {"status": db_m.DocumentStatus.ERROR.value, "count": totals["errors"]},
+        ],
+        "classification_results": [
+            {"result": db_m.ClassificationResult.RECEVABLE.value, "count": totals["recevable"]},
+            {"result": db_m.ClassificationResult.IRRECEVABLE.value, "count": totals["irrecevable"]},
+        ],
+        "timeline": summary["timeline"],
+        "generated_at": datetime.utcnow().isoformat()
+    }
+    await cache.set(NS_STATS, f"dashboard:{days}", response)
+    return response
+
+@router.get("/performance")
+async def get_performance(
+    hours: int = Query(24, ge=1, le=24 * 31, description="Période en heures (si start n'est pas fourni)"),
+    start: Optional[datetime] = Query(None, description="Début de la fenêtre (UTC)"),
+    end: Optional[datetime] = Query(None, description="Fin de la fenêtre (UTC, maintenant par défaut)"),
+    db: AsyncSession = Depends(get_db),
+    current_user: db_m.User = Depends(get_current_active_user)
+):
+    """Taux de succès, quantiles des temps de traitement, de la latence LLM et du débit, activité horaire"""
+    # Fenêtre glissante : en cache par durée ; fenêtre explicite : par bornes
+    cache_key = f"performance:{start.isoformat() if start else hours}:{end.isoformat() if end else 'now'}"
+    cache = get_cache()
+    cached = await cache.get(NS_STATS, cache_key)
+    if cached is not None:
+        return cached
+
+    end = analytics.as_utc(end) if end else datetime.utcnow()
+    start = analytics.as_utc(start) if start else end - timedelta(hours=hours)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start doit précéder end")
+
+    summary = await analytics.summarize(db, "hour", start, end)
+    totals = summary["totals"]
+    classifications = totals["classifications"]
+    attempts = classifications + totals["errors"]
+    # Esquisses des périodes fusionnées : état de taille constante quel que soit le volume
+    distributions = await analytics.distributions(db, start, end)
+    empty = {"count": 0, **{f"p{round(q * 100):d}": 0.0 for q in analytics.PERCENTILES}}
+
+    response = {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "analyses": classifications,
+        "errors": totals["errors"],
+        "success_rate_percent": _rate(classifications, attempts),
+        "review_rate_percent": _rate(totals["needs_review"], classifications),
+        "ia_accuracy_percent": _rate(totals["ia_correct"], totals["validations"]),
+        "average_processing_time_ms": round(totals["processing_ms_sum"] / classifications, 1) if classifications else 0.0,
+        "max_processing_time_ms": totals["processing_ms_max"],
+        "processing_time_percentiles_ms": distributions.get(analytics.METRIC_PROCESSING_TIME, empty),
+        "criterion_latency_percentiles_ms": {
+            criterion: distributions.get(analytics.criterion_metric(criterion), empty)
+            for criterion in CRITERIA
+        },
+        "tokens_per_second_percentiles": distributions.get(analytics.METRIC_TOKENS_PER_SECOND, empty),
+        "timeline": summary["timeline"],
+        "generated_at": datetime.utcnow().isoformat()
+    }
+    await cache.set(NS_STATS, cache_key, response)
+    return response
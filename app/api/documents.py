@@ -1,35 +1,260 @@
+import asyncio
+import hashlib
+import json
 import uuid
-from fastapi import APIRouter, Depends, UploadFile, File, BackgroundTasks, HTTPException, status
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload, undefer
 
-from app.database import get_db
+from app.database import AsyncSessionLocal, get_db
 from app.models import pydantic_schemas as schemas, database_models as db_m
 from app.services import document_service
+from app.services.admission_service import AdmissionDecision, admission_controller
+from app.services.cache import NS_DOCUMENT, NS_DOCUMENT_VERSION, get_cache
+from app.services.status_events import TERMINAL_STATUSES, status_bus
 
 router = APIRouter(
     prefix="/documents",
     tags=["Documents"],
 )
 
+# Intervalle (s) entre deux relectures du statut en base et commentaires keep-alive du flux SSE.
+# Couvre les analyses exécutées par un worker dédié, dont les événements ne passent pas par ce processus.
+EVENTS_RECHECK_SECONDS = 15.0
+
+async def _admit_uploads(new_documents: int) -> AdmissionDecision:
+    """Refuse l'upload (429) quand la file d'analyses est saturée et que la politique l'exige"""
+    decision = await admission_controller.admit(new_documents)
+    if not decision.accepted:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"File d'analyses saturée (attente estimée: {decision.estimated_wait_seconds}s). Réessayez plus tard.",
+            headers={"Retry-After": str(decision.retry_after)},
+        )
+    return decision
+
+class _Admission:
+    """Contrôle d'admission appelé par le service une fois les doublons écartés (décision retenue pour la réponse)"""
+
+    def __init__(self):
+        self.decision = AdmissionDecision(accepted=True)
+
+    async def __call__(self, new_documents: int) -> AdmissionDecision:
+        self.decision = await _admit_uploads(new_documents)
+        return self.decision
+
 @router.post("/upload", status_code=status.HTTP_202_ACCEPTED, response_model=schemas.DocumentUploadResponse)
 async def upload_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     # current_user: db_m.User = Depends(get_current_active_user)
 ):
     # Pour l'instant, on utilise un utilisateur par défaut
     # En production, utilisez le current_user authentifié
     default_user_id = "00000000-0000-0000-0000-000000000000"
     
-    document = await document_service.receive_document(db, file, default_user_id)
-    background_tasks.add_task(document_service.process_document_analysis, str(document.id))
+    # Un contenu déjà classé (même modèle, mêmes prompts) ou déjà en file n'est pas réanalysé,
+    # ni soumis au contrôle d'admission ; sinon le service met l'analyse en file avec le document
+    admission = _Admission()
+    document, analysis = await document_service.receive_for_analysis(db, file, default_user_id, admission)
+    decision = admission.decision
+    if analysis == document_service.ANALYSIS_REUSED:
+        document_read = await _read_document(db, document.id)
+        return {
+            "message": "Document déjà analysé : classification existante.",
+            "document_id": document.id,
+            "analysis": analysis,
+            "status": document_read.status,
+            "classification": document_read.classification,
+        }
+    if analysis == document_service.ANALYSIS_IN_FLIGHT:
+        return {
+            "message": "Document déjà reçu, analyse en cours.",
+            "document_id": document.id,
+            "analysis": analysis,
+        }
     
-    return {"message": "Document reçu et en cours d'analyse.", "document_id": document.id}
+    return {
+        "message": "Document reçu, analyse différée." if decision.defer_seconds else "Document reçu et en cours d'analyse.",
+        "document_id": document.id,
+        "analysis": analysis,
+        "analysis_deferred": decision.defer_seconds > 0,
+        "estimated_wait_seconds": decision.estimated_wait_seconds,
+    }
+
+@router.post("/upload/batch", status_code=status.HTTP_202_ACCEPTED, response_model=schemas.BatchUploadResponse)
+async def upload_documents_batch(
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_db),
+):
+    """Ingestion groupée : plusieurs fichiers et/ou archives ZIP en une seule requête"""
+    default_user_id = "00000000-0000-0000-0000-000000000000"
+    
+    # Admission sur le nombre de documents nouveaux, archives dépliées et doublons écartés ;
+    # les analyses des documents créés sont mises en file avec eux (les doublons ne sont pas réanalysés)
+    admission = _Admission()
+    try:
+        batch_id, items = await document_service.receive_batch(db, files, default_user_id, admission)
+    except ValueError as e:
+        # Archive au-delà des limites ZIP_MAX_* : aucun document du lot n'est créé
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    decision = admission.decision
+    created_ids = [item["document_id"] for item in items if item["status"] == "created"]
+    
+    return {
+        "message": f"{len(created_ids)} document(s) reçu(s) et en cours d'analyse.",
+        "batch_id": batch_id,
+        "documents": items,
+        "analysis_deferred": decision.defer_seconds > 0,
+        "estimated_wait_seconds": decision.estimated_wait_seconds,
+    }
+
+@router.get("", response_model=schemas.DocumentPage)
+async def list_documents(
+    limit: int = Query(50, ge=1, le=500, description="Nombre de documents à retourner"),
+    doc_status: Optional[db_m.DocumentStatus] = Query(None, alias="status", description="Filtrer par statut"),
+    batch_id: Optional[str] = Query(None, description="Filtrer par lot d'upload"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (next_cursor)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Liste des documents, plus récents d'abord, paginée par curseur"""
+    try:
+        documents, next_cursor = await document_service.list_documents(db, limit, doc_status, batch_id, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"documents": documents, "next_cursor": next_cursor}
+
+@router.get("/queue/status", response_model=schemas.QueueStatusRead)
+async def get_queue_status():
+    """Profondeur de la file d'analyses et attente estimée"""
+    queue_status = await admission_controller.get_status()
+    return queue_status.to_dict()
+
+async def _read_version(db: AsyncSession, document_id: str) -> Optional[Dict[str, str]]:
+    """Statut et ETag courants d'un document (None si inconnu), en cache jusqu'à sa prochaine transition"""
+    # Les transitions sont souvent écrites par un worker dédié : son invalidation n'atteint
+    # pas le cache mémoire de l'API, la version n'est donc gardée que dans un cache partagé
+    cache = get_cache()
+    if cache.shared:
+        version = await cache.get(NS_DOCUMENT_VERSION, document_id)
+        if version is not None:
+            return version
+
+    # Une requête jointe sur les seules colonnes de version, sans toucher à l'état de l'analyse
+    row = (await db.execute(
+        select(db_m.Document.status, db_m.Classification.id, db_m.Document.updated_at)
+        .outerjoin(db_m.Classification, db_m.Classification.document_id == db_m.Document.id)
+        .where(db_m.Document.id == document_id)
+    )).first()
+    if row is None:
+        return None
+    version = {"status": row.status.value, "etag": _document_etag(*row)}
+    if cache.shared:
+        await cache.set(NS_DOCUMENT_VERSION, document_id, version)
+    return version
+
+async def _read_status_snapshot(document_id: str) -> Optional[Dict[str, Any]]:
+    """Statut courant du document (None si inconnu)"""
+    async with AsyncSessionLocal() as db:
+        version = await _read_version(db, document_id)
+    if version is None:
+        return None
+    return {"type": "status", "document_id": document_id, "status": version["status"]}
+
+def _format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+async def _document_event_stream(document_id: str, snapshot: Dict[str, Any]) -> AsyncIterator[str]:
+    async with status_bus.subscribe(document_id) as events:
+        # Relecture après abonnement : aucune transition ne peut être manquée entre les deux
+        snapshot = await _read_status_snapshot(document_id) or snapshot
+        yield _format_sse(snapshot)
+        last_status = snapshot["status"]
+
+        while last_status not in TERMINAL_STATUSES:
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=EVENTS_RECHECK_SECONDS)
+            except asyncio.TimeoutError:
+                event = await _read_status_snapshot(document_id)
+                if event is None or event["status"] == last_status:
+                    yield ": keep-alive\n\n"
+                    continue
+
+            if event["type"] == "status":
+                last_status = event["status"]
+            yield _format_sse(event)
+
+@router.get("/{document_id}/events")
+async def stream_document_events(document_id: str):
+    """Flux SSE : transitions de statut et progression de l'analyse, fermé au premier statut final"""
+    snapshot = await _read_status_snapshot(document_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Document non trouvé")
+
+    return StreamingResponse(
+        _document_event_stream(document_id, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _document_etag(doc_status: db_m.DocumentStatus, classification_id: Optional[str], updated_at: Optional[datetime]) -> str:
+    """ETag faible d'un document : change à chaque transition, (ré)analyse ou mise à jour"""
+    version = f"{doc_status.value}|{classification_id or ''}|{updated_at.isoformat() if updated_at else ''}"
+    return f'W/"{hashlib.sha1(version.encode("utf-8")).hexdigest()[:20]}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparaison faible : le préfixe W/ est ignoré
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+async def _read_document(db: AsyncSession, document_id: str) -> schemas.DocumentRead:
+    """Document complet (classification, résultats par critère et état de l'analyse)"""
+    doc = (await db.execute(
+        select(db_m.Document)
+        .options(
+            joinedload(db_m.Document.classification).options(
+                undefer(db_m.Classification.analysis_blob),
+                undefer(db_m.Classification.legacy_analysis_steps),
+                selectinload(db_m.Classification.criterion_results),
+            )
+        )
+        .where(db_m.Document.id == document_id)
+        # Le document peut déjà être en session (upload) sans ses colonnes différées
+        .execution_options(populate_existing=True)
+    )).scalars().first()
+    return schemas.DocumentRead.model_validate(doc)
+
+async def _serialize_document(db: AsyncSession, document_id: str) -> bytes:
+    """Réponse complète sérialisée"""
+    return (await _read_document(db, document_id)).model_dump_json().encode("utf-8")
 
 @router.get("/{document_id}", response_model=schemas.DocumentRead)
-async def get_document_details(document_id: str, db: Session = Depends(get_db)):
-    doc = db.query(db_m.Document).filter(db_m.Document.id == document_id).first()
-    if not doc:
+async def get_document_details(document_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """Détails d'un document : 304 si l'ETag n'a pas changé, réponse en cache pour les documents analysés"""
+    version = await _read_version(db, document_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Document non trouvé")
-    return doc
\ No newline at end of file
+
+    etag = version["etag"]
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    cache = get_cache()
+    cached = await cache.get(NS_DOCUMENT, document_id)
+    if cached is not None and cached["etag"] == etag:
+        body = cached["body"].encode("utf-8")
+    else:
+        body = await _serialize_document(db, document_id)
+        # Seuls les documents au statut final sont gardés : les autres changent à chaque étape
+        if version["status"] in TERMINAL_STATUSES:
+            await cache.set(NS_DOCUMENT, document_id, {"etag": etag, "body": body.decode("utf-8")})
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models import pydantic_schemas as schemas
+from app.services.dossier_service import DossierService
+
+router = APIRouter(
+    prefix="/dossiers",
+    tags=["Dossiers"],
+)
+
+@router.post("", status_code=status.HTTP_202_ACCEPTED, response_model=schemas.DossierRead)
+async def create_dossier(
+    dossier_data: schemas.DossierCreate,
+    db: AsyncSession = Depends(get_db),
+):
+    """Regroupe un recours et ses pièces jointes puis lance l'analyse du dossier"""
+    default_user_id = "00000000-0000-0000-0000-000000000000"
+    
+    try:
+        dossier = await DossierService(db).create_dossier(
+            dossier_data.main_document_id,
+            dossier_data.attachment_ids,
+            default_user_id,
+            reference=dossier_data.reference
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return dossier
+
+@router.get("/{dossier_id}", response_model=schemas.DossierRead)
+async def get_dossier_details(dossier_id: str, db: AsyncSession = Depends(get_db)):
+    dossier = await DossierService(db).get_dossier(dossier_id)
+    if not dossier:
+        raise HTTPException(status_code=404, detail="Dossier non trouvé")
+    return dossier
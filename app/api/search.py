@@ -0,0 +1,31 @@
+import time
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.auth import get_current_active_user
+from app.database import get_db
+from app.models import database_models as db_m
+from app.models import pydantic_schemas as schemas
+from app.services import search_index
+
+router = APIRouter(
+    prefix="/search",
+    tags=["Search"],
+)
+
+@router.get("", response_model=schemas.SearchResponse)
+async def search_documents(
+    q: str = Query(..., min_length=2, description="Termes recherchés (demandeur, objet, justification, texte)"),
+    limit: int = Query(20, ge=1, le=100, description="Nombre de résultats"),
+    db: AsyncSession = Depends(get_db),
+    current_user: db_m.User = Depends(get_current_active_user)
+):
+    """Recherche plein texte classée, avec un extrait autour des termes trouvés"""
+    started = time.perf_counter()
+    results = await search_index.search(db, q, limit)
+    return {
+        "query": q,
+        "results": results,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
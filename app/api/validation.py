@@ -1,14 +1,19 @@
 # app/api/validation.py
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Optional
 from datetime import datetime
+import json
 
 from app.database import get_db
 from app.models import database_models as db_m
 from app.models import pydantic_schemas as schemas
 from app.api.auth import get_current_active_user
+from app.services import analytics, review_queue, validation_history, validation_stats
+from app.services.cache import NS_STATS, get_cache
+from app.services.write_queue import write_queue
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,65 +29,44 @@ router = APIRouter(
 async def get_pending_validations(
     limit: int = Query(20, description="Nombre maximum de documents à retourner"),
     priority: Optional[str] = Query(None, description="Filtrer par priorité"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (next_cursor)"),
+    db: AsyncSession = Depends(get_db),
     current_user: db_m.User = Depends(get_current_active_user)
 ):
     """Obtient la liste des documents en attente de validation"""
     logger.info(f"Récupération des validations en attente pour {current_user.email}")
     
     try:
-        # Requête de base pour les documents nécessitant une validation
-        query = db.query(db_m.Document).join(
-            db_m.Classification, db_m.Document.id == db_m.Classification.document_id
-        ).outerjoin(
-            db_m.HumanValidation, db_m.Classification.id == db_m.HumanValidation.classification_id
-        ).filter(
-            db_m.Document.status == db_m.DocumentStatus.NEEDS_REVIEW,
-            db_m.HumanValidation.id.is_(None)  # Pas encore validé
-        )
-        
-        # Filtrage par priorité (basé sur la confiance)
-        if priority == "high":
-            query = query.filter(db_m.Classification.confidence_score < 0.5)
-        elif priority == "medium":
-            query = query.filter(
-                and_(
-                    db_m.Classification.confidence_score >= 0.5,
-                    db_m.Classification.confidence_score < 0.8
-                )
-            )
-        elif priority == "low":
-            query = query.filter(db_m.Classification.confidence_score >= 0.8)
+        # Une seule requête sur la file matérialisée, servie par ses index (pagination par curseur)
+        entries, next_cursor = await review_queue.list_pending(db, limit, priority, cursor)
         
-        # Ordonner par date de création (les plus anciens d'abord)
-        documents = query.order_by(desc(db_m.Document.upload_date)).limit(limit).all()
-        
-        # Enrichir avec les données de classification
         result = []
-        for doc in documents:
-            classification = doc.classification
-            if classification:
-                result.append({
-                    "document_id": doc.id,
-                    "filename": doc.filename,
-                    "upload_date": doc.upload_date.isoformat(),
-                    "classification": {
-                        "id": classification.id,
-                        "result": classification.result.value if classification.result else None,
-                        "justification": classification.justification,
-                        "confidence_score": float(classification.confidence_score) if classification.confidence_score else 0.0
-                    },
-                    "priority": _calculate_priority(classification.confidence_score),
-                    "estimated_review_time": _estimate_review_time(classification.confidence_score)
-                })
+        for entry in entries:
+            confidence = float(entry["confidence_score"]) if entry["confidence_score"] is not None else None
+            result.append({
+                "document_id": entry["document_id"],
+                "filename": entry["filename"],
+                "upload_date": entry["upload_date"].isoformat(),
+                "classification": {
+                    "id": entry["classification_id"],
+                    "result": entry["result"].value if entry["result"] else None,
+                    "justification": entry["justification"],
+                    "confidence_score": confidence or 0.0
+                },
+                "priority": entry["priority"],
+                "estimated_review_time": _estimate_review_time(confidence)
+            })
         
         logger.info(f"Retour de {len(result)} documents en attente de validation")
         return {
             "pending_documents": result,
             "total_count": len(result),
+            "next_cursor": next_cursor,
             "generated_at": datetime.utcnow().isoformat()
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des validations en attente: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -93,7 +77,7 @@ async def get_pending_validations(
 async def validate_classification(
     classification_id: str,
     validation_data: schemas.HumanValidationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: db_m.User = Depends(get_current_active_user)
 ):
     """Valide une classification existante"""
@@ -101,17 +85,17 @@ async def validate_classification(
     
     try:
         # Vérifier que la classification existe
-        classification = db.query(db_m.Classification).filter(
-            db_m.Classification.id == classification_id
-        ).first()
+        classification = await db.get(db_m.Classification, classification_id)
         
         if not classification:
             raise HTTPException(status_code=404, detail="Classification not found")
         
         # Vérifier qu'il n'y a pas déjà une validation
-        existing_validation = db.query(db_m.HumanValidation).filter(
-            db_m.HumanValidation.classification_id == classification_id
-        ).first()
+        existing_validation = await db.scalar(
+            select(db_m.HumanValidation.id).where(
+                db_m.HumanValidation.classification_id == classification_id
+            )
+        )
         
         if existing_validation:
             raise HTTPException(status_code=400, detail="Classification already validated")
@@ -127,15 +111,24 @@ async def validate_classification(
             notes=validation_data.notes
         )
         
-        db.add(validation)
-        
-        # Mettre à jour le statut du document
-        document = classification.document
-        if document:
-            document.status = db_m.DocumentStatus.COMPLETED
+        async def save_validation(session: AsyncSession) -> None:
+            session.add(validation)
+            # Mettre à jour le statut du document
+            await session.execute(
+                update(db_m.Document)
+                .where(db_m.Document.id == classification.document_id)
+                .values(status=db_m.DocumentStatus.COMPLETED)
+            )
+            await review_queue.remove_entry(session, classification.document_id)
+            await validation_stats.record_validation(
+                session, validation.validator_id, validation.validated_result, validation.is_ia_correct
+            )
+            await analytics.record_validation(session, validation.is_ia_correct)
+            await session.flush()
+            await session.refresh(validation)
         
-        db.commit()
-        db.refresh(validation)
+        await write_queue.submit(save_validation)
+        await get_cache().invalidate_document(classification.document_id)
         
         logger.info(f"Validation créée avec succès: {validation.id}")
         
@@ -154,7 +147,7 @@ async def validate_classification(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Erreur lors de la validation: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -162,124 +155,89 @@ async def validate_classification(
 
 @router.get("/history")
 async def get_validation_history(
-    limit: int = Query(50, description="Nombre de validations à retourner"),
+    limit: int = Query(50, ge=1, le=500, description="Nombre de validations à retourner"),
     validator_id: Optional[str] = Query(None, description="ID du validateur"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (next_cursor)"),
+    db: AsyncSession = Depends(get_db),
     current_user: db_m.User = Depends(get_current_active_user)
 ):
     """Obtient l'historique des validations"""
     logger.info(f"Récupération de l'historique des validations pour {current_user.email}")
     
     try:
-        query = db.query(db_m.HumanValidation).join(
-            db_m.Classification, db_m.HumanValidation.classification_id == db_m.Classification.id
-        ).join(
-            db_m.Document, db_m.Classification.document_id == db_m.Document.id
-        )
-        
-        # Filtrer par validateur si spécifié
-        if validator_id:
-            query = query.filter(db_m.HumanValidation.validator_id == validator_id)
-        
-        validations = query.order_by(
-            desc(db_m.HumanValidation.validation_date)
-        ).limit(limit).all()
-        
-        result = []
-        for validation in validations:
-            classification = validation.classification
-            document = classification.document if classification else None
-            
-            result.append({
-                "validation_id": validation.id,
-                "document": {
-                    "id": document.id if document else None,
-                    "filename": document.filename if document else None,
-                    "upload_date": document.upload_date.isoformat() if document else None
-                },
-                "original_classification": {
-                    "result": classification.result.value if classification and classification.result else None,
-                    "confidence": float(classification.confidence_score) if classification and classification.confidence_score else 0.0
-                },
-                "validation": {
-                    "result": validation.validated_result.value,
-                    "is_ia_correct": validation.is_ia_correct,
-                    "notes": validation.notes,
-                    "validated_at": validation.validation_date.isoformat(),
-                    "validator_id": validation.validator_id
-                }
-            })
+        # Projection des colonnes affichées et pagination par curseur (validation_date, id)
+        result, next_cursor = await validation_history.list_history(db, limit, validator_id, cursor)
         
         return {
             "validations": result,
             "total_count": len(result),
+            "next_cursor": next_cursor,
             "generated_at": datetime.utcnow().isoformat()
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Erreur lors de la récupération de l'historique: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _history_jsonl(validator_id: Optional[str]) -> AsyncIterator[str]:
+    async for entry in validation_history.iter_history(validator_id):
+        yield json.dumps(entry, ensure_ascii=False) + "\n"
+
+@router.get("/history/export")
+async def export_validation_history(
+    validator_id: Optional[str] = Query(None, description="ID du validateur"),
+    current_user: db_m.User = Depends(get_current_active_user)
+):
+    """Export complet de l'historique en JSON Lines (une validation par ligne), diffusé par lots"""
+    logger.info(f"Export de l'historique des validations pour {current_user.email}")
+    
+    filename = f"validations_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    return StreamingResponse(
+        _history_jsonl(validator_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 # ===== STATISTIQUES DE VALIDATION =====
 
 @router.get("/stats")
 async def get_validation_stats(
     days: int = Query(30, description="Période en jours"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: db_m.User = Depends(get_current_active_user)
 ):
     """Obtient les statistiques de validation"""
     logger.info(f"Génération des statistiques de validation pour {current_user.email}")
     
     try:
-        from sqlalchemy import func
-        from datetime import timedelta
-        
-        start_date = datetime.utcnow() - timedelta(days=days)
-        
-        # Nombre total de validations
-        total_validations = db.query(func.count(db_m.HumanValidation.id)).filter(
-            db_m.HumanValidation.validation_date >= start_date
-        ).scalar()
-        
-        # Taux de précision de l'IA
-        correct_predictions = db.query(func.count(db_m.HumanValidation.id)).filter(
-            db_m.HumanValidation.validation_date >= start_date,
-            db_m.HumanValidation.is_ia_correct == True
-        ).scalar()
+        cache = get_cache()
+        cached = await cache.get(NS_STATS, f"validation:{days}")
+        if cached is not None:
+            return cached
         
-        accuracy_rate = (correct_predictions / total_validations * 100) if total_validations > 0 else 0
+        # Agrégats quotidiens maintenus à chaque validation : aucun parcours de human_validations
+        stats = await validation_stats.get_stats(db, days)
+        total_validations = stats["total_validations"]
+        accuracy_rate = (stats["correct_predictions"] / total_validations * 100) if total_validations > 0 else 0
         
-        # Répartition des résultats validés
-        validation_results = db.query(
-            db_m.HumanValidation.validated_result,
-            func.count(db_m.HumanValidation.id).label('count')
-        ).filter(
-            db_m.HumanValidation.validation_date >= start_date
-        ).group_by(db_m.HumanValidation.validated_result).all()
-        
-        # Top validateurs
-        top_validators = db.query(
-            db_m.HumanValidation.validator_id,
-            func.count(db_m.HumanValidation.id).label('count')
-        ).filter(
-            db_m.HumanValidation.validation_date >= start_date
-        ).group_by(db_m.HumanValidation.validator_id).order_by(desc('count')).limit(5).all()
-        
-        return {
+        response = {
             "period_days": days,
             "total_validations": total_validations,
             "ia_accuracy_percent": round(accuracy_rate, 2),
             "validation_results": [
                 {"result": result.value, "count": count}
-                for result, count in validation_results
+                for result, count in stats["validation_results"].items()
             ],
             "top_validators": [
                 {"validator_id": validator_id, "validations_count": count}
-                for validator_id, count in top_validators
+                for validator_id, count in stats["top_validators"]
             ],
             "generated_at": datetime.utcnow().isoformat()
         }
+        await cache.set(NS_STATS, f"validation:{days}", response)
+        return response
         
     except Exception as e:
         logger.error(f"Erreur lors de la génération des statistiques: {e}")
@@ -287,18 +245,6 @@ async def get_validation_stats(
 
 # ===== FONCTIONS UTILITAIRES =====
 
-def _calculate_priority(confidence_score: Optional[float]) -> str:
-    """Calcule la priorité basée sur le score de confiance"""
-    if confidence_score is None:
-        return "high"
-    
-    if confidence_score < 0.5:
-        return "high"
-    elif confidence_score < 0.8:
-        return "medium"
-    else:
-        return "low"
-
 def _estimate_review_time(confidence_score: Optional[float]) -> str:
     """Estime le temps de révision nécessaire"""
     if confidence_score is None:
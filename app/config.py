@@ -9,11 +9,32 @@ class Settings(BaseSettings):
     POSTGRES_USER: Optional[str] = None
     POSTGRES_PASSWORD: Optional[str] = None
     POSTGRES_DB: Optional[str] = None
+    DB_ECHO: bool = False  # journalise chaque requête SQL (débogage uniquement)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800  # secondes avant de recycler une connexion
+    DB_POOL_PRE_PING: bool = True  # vérifie la connexion avant usage (coupures réseau, redémarrage)
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # attente d'un verrou d'écriture avant "database is locked"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # octets lus via mmap (0 pour désactiver)
+    WRITE_QUEUE_ENABLED: Optional[bool] = None  # écrivain unique à commit groupé (par défaut : SQLite uniquement)
+    WRITE_QUEUE_MAX_BATCH: int = 64  # écritures maximum par transaction
+    WRITE_QUEUE_WINDOW_MS: int = 5  # fenêtre de regroupement des écritures
     
     # Redis
     REDIS_HOST: Optional[str] = None
     REDIS_PORT: Optional[int] = None
     
+    # Cache (statuts et réponses des documents, complétions LLM, textes extraits, statistiques)
+    CACHE_BACKEND: str = "memory"  # "memory" (par processus) ou "redis" (partagé entre répliques)
+    CACHE_MEMORY_SIZE: int = 2048  # entrées du backend mémoire (0 pour désactiver)
+    CACHE_KEY_PREFIX: str = "sacdj:cache"
+    CACHE_REDIS_TIMEOUT: float = 0.5  # secondes avant de considérer Redis indisponible (absence de cache)
+    CACHE_TTL_DOCUMENT_STATUS: int = 60  # secondes (invalidé à chaque transition ; backend redis uniquement)
+    CACHE_TTL_DOCUMENT: int = 3600
+    CACHE_TTL_LLM: int = 7 * 24 * 3600
+    CACHE_TTL_TEXT: int = 3600
+    CACHE_TTL_STATS: int = 30  # agrégats du tableau de bord : légèrement en retard sur les événements
+    
     # Sécurité
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
@@ -40,6 +61,61 @@ class Settings(BaseSettings):
     LLM_MODEL: str = "mistral:7b-instruct"
     LLM_TIMEOUT: int = 180
     
+    # File d'attente des analyses
+    JOB_QUEUE_BACKEND: str = "database"  # "database" ou "redis"
+    JOB_VISIBILITY_TIMEOUT: int = 600  # secondes avant qu'un job non acquitté redevienne disponible
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF: int = 30  # secondes, doublé à chaque nouvelle tentative
+    JOB_RETENTION_DAYS: int = 7  # jobs terminés conservés avant purge (les lettres mortes sont gardées)
+    JOB_ORPHAN_GRACE_SECONDS: int = 300  # documents/dossiers PENDING sans job au-delà de ce délai : remis en file
+    EMBEDDED_WORKER_CONCURRENCY: int = 1  # workers lancés dans le processus API (0 si workers dédiés)
+    
+    # Stockage des analyses
+    ANALYSIS_BLOB_ENABLED: bool = True  # conserve l'état complet de l'analyse (JSON compressé) en plus des champs promus
+    
+    # Lettres types quasi identiques : reprise des critères liés au modèle de courrier
+    NEAR_DUPLICATE_ENABLED: bool = True
+    NEAR_DUPLICATE_THRESHOLD: float = 0.8  # similarité de Jaccard estimée minimale avec le courrier déjà analysé
+    NEAR_DUPLICATE_MIN_CONFIDENCE: float = 0.7  # analyse du courrier modèle reprise seulement au-delà de cette confiance
+    MINHASH_NUM_PERM: int = 128  # composantes de la signature (changement : python -m app.maintenance rebuild-signatures)
+    MINHASH_BANDS: int = 32  # bandes LSH (MINHASH_NUM_PERM / MINHASH_BANDS lignes par bande)
+    MINHASH_SHINGLE_SIZE: int = 3  # mots par bardeau
+    
+    # NLP (spaCy) : modèle chargé au premier usage, sans les composants absents de SPACY_PIPES
+    SPACY_MODEL: str = "fr_core_news_lg"
+    SPACY_PIPES: List[str] = ["tok2vec", "ner", "senter"]  # les vecteurs du vocabulaire sont toujours chargés
+    NLP_PRELOAD: bool = False  # charge le modèle à l'import (gunicorn --preload : pages partagées entre workers)
+    NLP_BATCH_SIZE: int = 64  # textes par lot de nlp.pipe
+    NLP_N_PROCESS: int = 1  # processus des traitements par lots (reconstructions)
+    NLP_CHUNK_CHARS: int = 100_000  # morceaux des textes longs (sous nlp.max_length), coupés entre paragraphes
+    
+    # Pré-extraction locale des entités (spaCy + règles) : le LLM ne complète que les champs non résolus
+    ENTITY_LOCAL_ENABLED: bool = True
+    ENTITY_LOCAL_MIN_CONFIDENCE: float = 0.8  # confiance en dessous de laquelle le champ est demandé au LLM
+    
+    # Vérification des citations (source_quote) des analyses de critères
+    QUOTE_CHECK_ENABLED: bool = True
+    QUOTE_NGRAM_SIZE: int = 2  # n-grammes de mots indexés par document (plus grand : plus strict)
+    QUOTE_MIN_COVERAGE: float = 0.8  # part des mots de la citation couverts par un n-gramme du document
+    QUOTE_UNVERIFIED_CONFIDENCE_FACTOR: float = 0.5  # confiance du critère multipliée si la citation est introuvable
+    
+    # Dossiers validés quasi identiques : décision proposée sans appel au LLM, soumise à révision
+    NN_SHORTCUT_ENABLED: bool = True
+    NN_SHORTCUT_THRESHOLD: float = 0.97  # similarité cosinus minimale de chaque voisin retenu
+    NN_SHORTCUT_NEIGHBORS: int = 3  # voisins validés les plus proches, qui doivent tous concorder
+    NN_VECTOR_MAX_CHARS: int = 100_000  # texte pris en compte pour le vecteur du document
+    
+    # Ingestion groupée : limites par archive ZIP (tailles décompressées déclarées)
+    ZIP_MAX_ENTRIES: int = 1000
+    ZIP_MAX_ENTRY_BYTES: int = 100 * 1024 * 1024
+    ZIP_MAX_TOTAL_BYTES: int = 1024 * 1024 * 1024
+    
+    # Contrôle d'admission (protection contre les rafales d'uploads)
+    ADMISSION_MAX_QUEUE_DEPTH: int = 200  # analyses en attente au-delà desquelles la file est saturée
+    ADMISSION_MAX_WAIT_SECONDS: int = 1800  # attente estimée au-delà de laquelle la file est saturée
+    ADMISSION_OVERLOAD_POLICY: str = "defer"  # "reject" (429 + Retry-After) ou "defer" (analyse différée)
+    ANALYSIS_WORKER_CAPACITY: int = 1  # analyses simultanées sur l'ensemble des workers
+    
     # Admin
     FIRST_ADMIN_EMAIL: str = "admin@conseil-etat.fr"
     FIRST_ADMIN_PASSWORD: str = "changeme-in-production"
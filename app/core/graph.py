@@ -1,6 +1,7 @@
 # app/core/graph.py
 from langgraph.graph import StateGraph, END
-from .state import CSPEState
+from typing import Dict, List, Optional
+from .state import CSPEState, AttachmentInfo, CritereAnalysis
 from .nodes import (
     extract_entities,
     analyze_deadline_criterion,
@@ -199,14 +200,27 @@ def get_compiled_workflow():
 
 # ===== FONCTIONS UTILITAIRES =====
 
-async def execute_cspe_analysis(document_id: str, document_content: str) -> dict:
-    """Fonction principale pour exécuter une analyse CSPE complète"""
+async def execute_cspe_analysis(
+    document_id: str,
+    document_content: str,
+    attachments_inventory: Optional[List[AttachmentInfo]] = None,
+    reused_analyses: Optional[Dict[str, CritereAnalysis]] = None
+) -> dict:
+    """Fonction principale pour exécuter une analyse CSPE complète
+    
+    Pour un dossier, `document_content` est le courrier principal et
+    `attachments_inventory` la liste des pièces jointes déjà typées localement.
+    Les critères présents dans `reused_analyses` (courrier quasi identique déjà
+    analysé) ne sont pas soumis au LLM.
+    """
     logger.info(f"🚀 Début de l'analyse CSPE pour le document {document_id}")
     
     # État initial
     initial_state = CSPEState(
         document_id=document_id,
         document_content=document_content,
+        attachments_inventory=attachments_inventory,
+        reused_analyses=reused_analyses or None,
         extracted_dates=None,
         extracted_applicant=None,
         deadline_analysis=None,
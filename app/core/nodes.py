@@ -1,18 +1,22 @@
 # app/core/nodes.py
 import json
 import asyncio
+import time
 from datetime import datetime
 from typing import Dict, Any
 from .state import CSPEState
-from app.services.ollama_service import ollama_service
+from app.services import entity_extractor, quote_verification
+from app.services.ollama_service import ENTITY_FIELDS, ollama_service
+from app.services.status_events import status_bus
 from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
 async def extract_entities(state: CSPEState) -> Dict[str, Any]:
-    """Extraction des entités avec Ollama/Mistral"""
+    """Extraction des entités : règles spaCy locales, Mistral pour les champs non résolus"""
     logger.info("🔍 --- Début extraction des entités ---")
+    status_bus.publish_progress(state["document_id"], "extract_entities")
     
     try:
         # Vérification des prérequis
@@ -20,11 +24,8 @@ async def extract_entities(state: CSPEState) -> Dict[str, Any]:
             logger.error("Contenu du document manquant")
             return {"error_message": "Contenu du document manquant"}
         
-        # Extraction avec le service Ollama
-        logger.info("📡 Appel à Mistral pour extraction d'entités...")
-        extracted_data = await ollama_service.extract_entities_with_llm(
-            state["document_content"]
-        )
+        # Pré-extraction locale, complétée par Mistral si nécessaire
+        extracted_data = await entity_extractor.extract_entities(state["document_content"])
         
         # Vérification des erreurs
         if "error" in extracted_data:
@@ -44,10 +45,14 @@ async def extract_entities(state: CSPEState) -> Dict[str, Any]:
             "extracted_object": extracted_data.get("objet_recours"),
             "extracted_amount": extracted_data.get("montant_conteste"),
             "extracted_authority": extracted_data.get("autorite_competente"),
-            "extracted_decision_type": extracted_data.get("type_decision")
+            "extracted_decision_type": extracted_data.get("type_decision"),
+            "extracted_entities": {field: extracted_data.get(field) for field in (*ENTITY_FIELDS, "siren")},
+            "extraction_confidence": extracted_data["field_confidence"],
+            "extraction_sources": extracted_data["field_sources"]
         }
         
         logger.info("✅ Extraction des entités terminée avec succès")
+        status_bus.publish_progress(state["document_id"], "extract_entities", "completed")
         return result
         
     except Exception as e:
@@ -57,6 +62,7 @@ async def extract_entities(state: CSPEState) -> Dict[str, Any]:
 async def analyze_deadline_criterion(state: CSPEState) -> Dict[str, Any]:
     """Analyse du critère délai avec Mistral"""
     logger.info("⏰ --- Analyse du critère délai ---")
+    status_bus.publish_progress(state["document_id"], "analyze_deadline")
     
     try:
         criterion_config = settings.CSPE_CRITERIA["deadline"]
@@ -88,6 +94,7 @@ async def analyze_deadline_criterion(state: CSPEState) -> Dict[str, Any]:
                 "reasoning": analysis_result.get("reasoning", "Analyse non disponible"),
                 "confidence": float(analysis_result.get("confidence", 0.0)),
                 "source_quote": analysis_result.get("source_quote"),
+                "cached": analysis_result.get("cached", False),
                 "criterion_name": criterion_config["name"],
                 "analyzed_at": datetime.utcnow().isoformat()
             }
@@ -109,6 +116,7 @@ async def analyze_deadline_criterion(state: CSPEState) -> Dict[str, Any]:
 async def analyze_quality_criterion(state: CSPEState) -> Dict[str, Any]:
     """Analyse du critère qualité pour agir avec Mistral"""
     logger.info("👤 --- Analyse du critère qualité ---")
+    status_bus.publish_progress(state["document_id"], "analyze_quality")
     
     try:
         criterion_config = settings.CSPE_CRITERIA["quality"]
@@ -137,6 +145,7 @@ async def analyze_quality_criterion(state: CSPEState) -> Dict[str, Any]:
                 "reasoning": analysis_result.get("reasoning", "Analyse non disponible"),
                 "confidence": float(analysis_result.get("confidence", 0.0)),
                 "source_quote": analysis_result.get("source_quote"),
+                "cached": analysis_result.get("cached", False),
                 "criterion_name": criterion_config["name"],
                 "analyzed_at": datetime.utcnow().isoformat()
             }
@@ -158,6 +167,7 @@ async def analyze_quality_criterion(state: CSPEState) -> Dict[str, Any]:
 async def analyze_object_criterion(state: CSPEState) -> Dict[str, Any]:
     """Analyse du critère objet du recours avec Mistral"""
     logger.info("📋 --- Analyse du critère objet ---")
+    status_bus.publish_progress(state["document_id"], "analyze_object")
     
     try:
         criterion_config = settings.CSPE_CRITERIA["object"]
@@ -187,6 +197,7 @@ async def analyze_object_criterion(state: CSPEState) -> Dict[str, Any]:
                 "reasoning": analysis_result.get("reasoning", "Analyse non disponible"),
                 "confidence": float(analysis_result.get("confidence", 0.0)),
                 "source_quote": analysis_result.get("source_quote"),
+                "cached": analysis_result.get("cached", False),
                 "criterion_name": criterion_config["name"],
                 "analyzed_at": datetime.utcnow().isoformat()
             }
@@ -208,6 +219,7 @@ async def analyze_object_criterion(state: CSPEState) -> Dict[str, Any]:
 async def analyze_documents_criterion(state: CSPEState) -> Dict[str, Any]:
     """Analyse du critère pièces justificatives avec Mistral"""
     logger.info("📎 --- Analyse du critère pièces justificatives ---")
+    status_bus.publish_progress(state["document_id"], "analyze_documents")
     
     try:
         criterion_config = settings.CSPE_CRITERIA["documents"]
@@ -220,6 +232,14 @@ async def analyze_documents_criterion(state: CSPEState) -> Dict[str, Any]:
             "type_decision": state.get("extracted_decision_type")
         }
         
+        # Analyse de dossier : l'inventaire des pièces jointes remplace la
+        # devinette sur les premiers caractères du courrier
+        if state.get("attachments_inventory") is not None:
+            extracted_entities["pieces_jointes"] = [
+                {"fichier": piece["filename"], "type": piece["attachment_type"], "confiance": piece["confidence"]}
+                for piece in state["attachments_inventory"]
+            ]
+        
         logger.info("📡 Appel à Mistral pour analyse des documents...")
         analysis_result = await ollama_service.analyze_criterion(
             criterion_name=criterion_config["name"],
@@ -236,6 +256,7 @@ async def analyze_documents_criterion(state: CSPEState) -> Dict[str, Any]:
                 "reasoning": analysis_result.get("reasoning", "Analyse non disponible"),
                 "confidence": float(analysis_result.get("confidence", 0.0)),
                 "source_quote": analysis_result.get("source_quote"),
+                "cached": analysis_result.get("cached", False),
                 "criterion_name": criterion_config["name"],
                 "analyzed_at": datetime.utcnow().isoformat()
             }
@@ -257,6 +278,7 @@ async def analyze_documents_criterion(state: CSPEState) -> Dict[str, Any]:
 async def make_final_decision(state: CSPEState) -> Dict[str, Any]:
     """Décision finale basée sur l'analyse des 4 critères avec Mistral"""
     logger.info("⚖️ --- Décision finale ---")
+    status_bus.publish_progress(state["document_id"], "make_decision")
     
     try:
         # Compiler les analyses
@@ -286,11 +308,19 @@ async def make_final_decision(state: CSPEState) -> Dict[str, Any]:
         ]
         avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
         
+        # Citations introuvables dans le document : un agent doit vérifier le critère
+        unverified_quotes = [
+            analysis.get("criterion_name") or key
+            for key, analysis in analyses.items()
+            if analysis and analysis.get("quote_verified") is False
+        ]
+        
         # Détermination de la nécessité de révision
         needs_review = (
             decision_result.get("final_confidence", 0.0) < settings.CONFIDENCE_THRESHOLDS["medium"] or
             decision_result.get("is_review_required", True) or
-            avg_confidence < settings.CONFIDENCE_THRESHOLDS["medium"]
+            avg_confidence < settings.CONFIDENCE_THRESHOLDS["medium"] or
+            bool(unverified_quotes)
         )
         
         result = {
@@ -298,7 +328,9 @@ async def make_final_decision(state: CSPEState) -> Dict[str, Any]:
             "final_justification": decision_result.get("final_justification", "Décision par défaut"),
             "final_confidence": float(decision_result.get("final_confidence", avg_confidence)),
             "is_review_required": needs_review,
-            "critical_issues": decision_result.get("critical_issues", []),
+            "critical_issues": decision_result.get("critical_issues", []) + [
+                f"Citation introuvable dans le document : {name}" for name in unverified_quotes
+            ],
             "analysis_summary": {
                 "total_criteria": len(analyses),
                 "compliant_criteria": sum(1 for a in analyses.values() if a and a.get("is_compliant", False)),
@@ -308,6 +340,7 @@ async def make_final_decision(state: CSPEState) -> Dict[str, Any]:
         }
         
         logger.info(f"✅ Décision finale: {json.dumps(result, indent=2, ensure_ascii=False)}")
+        status_bus.publish_progress(state["document_id"], "make_decision", "completed")
         
         return result
         
@@ -333,24 +366,53 @@ async def analyze_all_criteria_parallel(state: CSPEState) -> Dict[str, Any]:
     logger.info("⚡ --- Analyse parallèle des 4 critères ---")
     
     try:
-        # Lancer toutes les analyses en parallèle
+        async def _tracked(node: str, analysis):
+            # Signale la fin de chaque critère dès qu'il aboutit et mesure sa durée
+            started = time.perf_counter()
+            result = await analysis
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            for criterion_analysis in result.values():
+                # Réponse du cache : pas d'appel LLM, exclue des quantiles de latence
+                criterion_analysis["duration_ms"] = None if criterion_analysis.get("cached") else duration_ms
+            status_bus.publish_progress(state["document_id"], node, "completed")
+            return result
+        
+        # Critères repris d'un courrier quasi identique : pas d'appel au LLM
+        reused = state.get("reused_analyses") or {}
+        criteria = [
+            ("analyze_deadline", "deadline_analysis", analyze_deadline_criterion),
+            ("analyze_quality", "quality_analysis", analyze_quality_criterion),
+            ("analyze_object", "object_analysis", analyze_object_criterion),
+            ("analyze_documents", "documents_analysis", analyze_documents_criterion)
+        ]
+        for node, key, _ in criteria:
+            if key in reused:
+                status_bus.publish_progress(state["document_id"], node, "reused")
+        
+        # Lancer les autres analyses en parallèle
         tasks = [
-            analyze_deadline_criterion(state),
-            analyze_quality_criterion(state),
-            analyze_object_criterion(state),
-            analyze_documents_criterion(state)
+            _tracked(node, analyze(state))
+            for node, key, analyze in criteria
+            if key not in reused
         ]
         
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
         # Combiner les résultats
-        combined_result = {}
+        combined_result = dict(reused)
         for result in results:
             if isinstance(result, dict):
                 combined_result.update(result)
             else:
                 logger.error(f"Erreur dans l'analyse parallèle: {result}")
         
+        # Citations vérifiées sur le texte du document (index construit une fois pour les critères analysés ;
+        # les analyses reprises ont été vérifiées, et leur confiance réduite, lors de leur propre analyse)
+        await quote_verification.verify_document_quotes(
+            state["document_content"],
+            {key: combined_result[key] for _, key, _ in criteria if key not in reused and combined_result.get(key)}
+        )
+        
         logger.info("✅ Analyse parallèle terminée")
         return combined_result
         
@@ -36,6 +36,12 @@ class CritereAnalysis(TypedDict):
     source_quote: Optional[str]           # Citation du texte source
     criterion_name: Optional[str]         # Nom du critère analysé
     analyzed_at: Optional[str]            # Timestamp de l'analyse
+    duration_ms: Optional[int]            # Durée de l'analyse du critère (None si sans appel LLM)
+    cached: Optional[bool]                # Réponse du LLM reprise du cache
+    reused_from: Optional[str]            # Courrier quasi identique dont l'analyse est reprise
+    similarity: Optional[float]           # Similarité estimée avec ce courrier
+    quote_verified: Optional[bool]        # Citation retrouvée dans le document (None : pas de citation)
+    quote_coverage: Optional[float]       # Part des n-grammes de la citation présents dans le document
     error: Optional[str]                  # Message d'erreur éventuel
 
 class ExtractedDates(TypedDict):
@@ -46,12 +52,22 @@ class ExtractedDates(TypedDict):
 
 class ExtractedEntities(TypedDict):
     """Entités extraites du document juridique"""
+    date_decision: Optional[str]          # Date de la décision contestée (DD/MM/YYYY)
+    date_recours: Optional[str]           # Date du recours (DD/MM/YYYY)
     demandeur: Optional[str]              # Nom du demandeur
     objet_recours: Optional[str]          # Objet de la contestation
     montant_conteste: Optional[str]       # Montant financier en jeu
     autorite_competente: Optional[str]    # Autorité ayant pris la décision
     type_decision: Optional[str]          # Type de décision contestée
     numero_dossier: Optional[str]         # Numéro de dossier/référence
+    siren: Optional[str]                  # SIREN du demandeur (règles locales)
+
+class AttachmentInfo(TypedDict):
+    """Pièce jointe d'un dossier, typée par le classifieur local"""
+    document_id: str                      # Identifiant du document joint
+    filename: str                         # Nom du fichier
+    attachment_type: str                  # Type détecté (facture, copie_decision, piece_identite...)
+    confidence: float                     # Confiance du classifieur (0.0 à 1.0)
 
 class AnalysisSummary(TypedDict):
     """Résumé de l'analyse complète"""
@@ -72,6 +88,8 @@ class CSPEState(TypedDict):
     document_id: str                      # Identifiant unique du document
     document_content: str                 # Contenu textuel complet du document
     document_metadata: Optional[Dict[str, Any]]  # Métadonnées du document
+    attachments_inventory: Optional[List[AttachmentInfo]]  # Pièces jointes du dossier (si analyse de dossier)
+    reused_analyses: Optional[Dict[str, CritereAnalysis]]  # Analyses reprises d'un courrier quasi identique (clé d'état -> analyse)
     
     # ===== ENTITÉS EXTRAITES =====
     extracted_dates: Optional[ExtractedDates]           # Dates importantes extraites
@@ -81,6 +99,8 @@ class CSPEState(TypedDict):
     extracted_authority: Optional[str]                  # Autorité compétente
     extracted_decision_type: Optional[str]              # Type de décision
     extracted_entities: Optional[ExtractedEntities]     # Toutes les entités extraites
+    extraction_confidence: Optional[Dict[str, float]]   # Confiance des champs résolus localement
+    extraction_sources: Optional[Dict[str, str]]        # Origine de chaque champ ("local" ou "llm")
     
     # ===== ANALYSES DES CRITÈRES =====
     deadline_analysis: Optional[CritereAnalysis]        # Analyse du délai
@@ -170,6 +190,8 @@ def create_initial_cspe_state(document_id: str, document_content: str, **kwargs)
         extracted_authority=None,
         extracted_decision_type=None,
         extracted_entities=None,
+        extraction_confidence=None,
+        extraction_sources=None,
         
         # Analyses (initialement vides)
         deadline_analysis=None,
@@ -196,7 +218,8 @@ def create_initial_cspe_state(document_id: str, document_content: str, **kwargs)
         debug_info=None,
         
         # Métadonnées optionnelles
-        document_metadata=kwargs.get("document_metadata", None)
+        document_metadata=kwargs.get("document_metadata", None),
+        attachments_inventory=kwargs.get("attachments_inventory", None)
     )
 
 def get_confidence_level(confidence: float) -> ConfidenceLevel:
@@ -1,24 +1,122 @@
-from sqlalchemy import create_engine
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.schema import CreateColumn
 from app.config import settings
 
-# Utilisation de SQLite pour le développement
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sac_dj.db"
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+
+# Pilotes asynchrones correspondant aux pilotes synchrones
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    """Convertit une URL SQLAlchemy synchrone vers son pilote asynchrone (aiosqlite, asyncpg)"""
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+def _is_memory_sqlite(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:"
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    """Options communes aux moteurs synchrone et asynchrone"""
+    options: Dict[str, Any] = {"echo": settings.DB_ECHO}
+    is_sqlite = make_url(url).get_backend_name() == "sqlite"
+
+    if is_sqlite:
+        options["connect_args"] = {"check_same_thread": False}
+        if _is_memory_sqlite(url):
+            # Base en mémoire : pool à connexion unique, les réglages de taille ne s'appliquent pas
+            return options
+
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Réglages SQLite appliqués à chaque nouvelle connexion"""
+    cursor = dbapi_connection.cursor()
+    # WAL : les lectures ne bloquent plus l'écrivain ; NORMAL reste sûr en WAL et évite un fsync par commit
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.close()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL) -> Engine:
+    """Crée le moteur synchrone configuré (pool, pragmas SQLite)"""
+    db_engine = create_engine(url, **_engine_options(url))
+    if db_engine.dialect.name == "sqlite":
+        event.listen(db_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+def create_async_db_engine(url: str = SQLALCHEMY_DATABASE_URL) -> AsyncEngine:
+    """Crée le moteur asynchrone configuré à partir de l'URL synchrone"""
+    options = _engine_options(url)
+    if "pool_size" in options and make_url(url).get_backend_name() == "sqlite":
+        # aiosqlite n'utilise pas de pool par défaut : chaque session rouvrirait le fichier
+        options["poolclass"] = AsyncAdaptedQueuePool
+    db_engine = create_async_engine(to_async_url(url), **options)
+    if db_engine.dialect.name == "sqlite":
+        event.listen(db_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+# Moteur synchrone : création du schéma et scripts d'administration
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Moteur asynchrone : chemins de requête et d'analyse (ne bloque pas la boucle d'événements)
+async_engine = create_async_db_engine()
+# expire_on_commit=False : les objets restent lisibles après commit sans rechargement implicite
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def upgrade_schema(bind: Engine = engine) -> None:
+    """Crée les tables manquantes puis ajoute colonnes et index déclarés depuis sur les tables existantes
+
+    Le schéma est dérivé des modèles (create_all) : seules les évolutions
+    additives sont appliquées ici (colonnes nullables ou avec valeur par
+    défaut côté serveur, index) ; une colonne NOT NULL sans défaut lève une erreur.
+    """
+    Base.metadata.create_all(bind=bind)
+
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    # Les lignes existantes n'auraient aucune valeur pour cette colonne
+                    raise RuntimeError(
+                        f"Colonne {table.name}.{column.name} ajoutée NOT NULL sans server_default : "
+                        "déclarez-la nullable ou avec une valeur par défaut côté serveur"
+                    )
+                column_ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
 
 def init_db():
     # Crée toutes les tables
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    upgrade_schema()
@@ -1,15 +1,6 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from app.config import settings
-
-# Configuration de SQLAlchemy
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    echo=True
-)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Moteur, sessions et métadonnées partagés avec l'application (un seul pool de connexions,
+# une seule MetaData : celle des modèles de app.models.database_models)
+from app.database import Base, SessionLocal
 
 def get_db():
     db = SessionLocal()
@@ -17,5 +8,3 @@ def get_db():
         yield db
     finally:
         db.close()
-
-Base = declarative_base()
\ No newline at end of file
@@ -1,11 +1,26 @@
+import logging
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import documents, validation
-from app.database import engine
-from app.models import database_models
+from app.api import analytics, documents, dossiers, search, validation
+from app.config import settings
+from app.database import AsyncSessionLocal, async_engine, engine, upgrade_schema
+from app.models import database_models  # noqa: F401 (enregistre les modèles avant upgrade_schema)
+from app.services import analytics as analytics_service, criterion_results, review_queue, search_index, validation_stats
+from app.services.job_queue import get_job_queue
+from app.services.nlp_service import nlp_service, rss_mb
+from app.services.write_queue import write_queue
+
+logger = logging.getLogger(__name__)
+
+# Créer les tables dans la base de données (et les colonnes/index ajoutés depuis)
+upgrade_schema()
+search_index.ensure_schema(engine)
 
-# Créer les tables dans la base de données
-database_models.Base.metadata.create_all(bind=engine)
+# Modèle spaCy chargé avant le fork des workers (gunicorn --preload) : pages partagées
+if settings.NLP_PRELOAD:
+    nlp_service.preload()
 
 app = FastAPI(
     title="SAC-DJ API",
@@ -24,7 +39,50 @@ app.add_middleware(
 
 # Inclure les routeurs
 app.include_router(documents.router)
+app.include_router(dossiers.router)
 app.include_router(validation.router)
+app.include_router(search.router)
+app.include_router(analytics.router)
+
+# Mêmes routes sous le préfixe versionné utilisé par le frontend
+for router in (documents.router, dossiers.router, validation.router, search.router, analytics.router):
+    app.include_router(router, prefix=f"{settings.API_PREFIX}/v1", include_in_schema=False)
+
+@app.on_event("startup")
+async def backfill_rollups():
+    # Première mise en service des tables matérialisées sur une base existante
+    async with AsyncSessionLocal() as db:
+        await criterion_results.migrate_legacy(db)
+        await review_queue.backfill_if_empty(db)
+        await validation_stats.backfill_if_empty(db)
+        await analytics_service.backfill_if_empty(db)
+
+@app.on_event("startup")
+async def report_memory():
+    # Chargement du modèle spaCy et mémoire résidente de ce worker
+    if nlp_service.is_loaded:
+        logger.info(f"🧠 Modèle spaCy préchargé en {nlp_service.load_stats['load_seconds']}s, RSS du processus {os.getpid()}: {rss_mb()} Mo")
+    else:
+        logger.info(f"🧠 Modèle spaCy chargé au premier usage, RSS du processus {os.getpid()}: {rss_mb()} Mo")
+
+# Workers d'analyse embarqués (désactivables quand des workers dédiés tournent)
+_embedded_worker = None
+
+@app.on_event("startup")
+async def start_embedded_worker():
+    global _embedded_worker
+    if settings.EMBEDDED_WORKER_CONCURRENCY > 0:
+        from app.worker import AnalysisWorker
+        _embedded_worker = AnalysisWorker(get_job_queue(), settings.EMBEDDED_WORKER_CONCURRENCY)
+        _embedded_worker.start()
+
+@app.on_event("shutdown")
+async def stop_embedded_worker():
+    if _embedded_worker is not None:
+        await _embedded_worker.stop()
+    # Valide les dernières écritures groupées avant l'arrêt, puis ferme le pool de connexions
+    await write_queue.stop()
+    await async_engine.dispose()
 
 @app.get("/")
 async def root():
@@ -0,0 +1,71 @@
+# app/maintenance.py
+"""
+Commandes de maintenance des tables matérialisées.
+
+Usage :
+    python -m app.maintenance rebuild-stats
+    python -m app.maintenance rebuild-review-queue
+    python -m app.maintenance migrate-analyses
+    python -m app.maintenance rebuild-search
+    python -m app.maintenance rebuild-analytics
+    python -m app.maintenance rebuild-signatures
+    python -m app.maintenance rebuild-embeddings
+    python -m app.maintenance purge-jobs
+
+Les tables sont normalement tenues à jour à chaque classification et
+validation ; ces commandes les recalculent entièrement (reprise après un
+import direct en base, correction manuelle, changement de règle).
+migrate-analyses reprend les anciennes classifications (état JSON) vers
+criterion_results et l'état compressé ; elle s'exécute aussi au démarrage.
+rebuild-signatures recalcule les signatures MinHash (après un changement
+de MINHASH_NUM_PERM, MINHASH_BANDS ou MINHASH_SHINGLE_SIZE) ;
+rebuild-embeddings recalcule les vecteurs spaCy (changement de SPACY_MODEL).
+purge-jobs supprime les jobs terminés depuis plus de JOB_RETENTION_DAYS (les
+workers le font aussi toutes les heures).
+"""
+import argparse
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal, async_engine
+from app.services import analytics, criterion_results, near_duplicates, review_queue, search_index, validated_neighbors, validation_stats
+from app.services.job_queue import purge_completed_jobs
+
+logger = logging.getLogger(__name__)
+
+# Reconstruction associée à chaque commande
+REBUILDS: Dict[str, Callable[[AsyncSession], Awaitable[int]]] = {
+    "rebuild-stats": validation_stats.rebuild,
+    "rebuild-review-queue": review_queue.rebuild,
+    "migrate-analyses": criterion_results.migrate_legacy,
+    "rebuild-search": search_index.rebuild,
+    "rebuild-analytics": analytics.rebuild,
+    "rebuild-signatures": near_duplicates.rebuild,
+    "rebuild-embeddings": validated_neighbors.rebuild,
+    "purge-jobs": purge_completed_jobs,
+}
+
+async def _run(command: str) -> int:
+    try:
+        async with AsyncSessionLocal() as db:
+            count = await REBUILDS[command](db)
+            await db.commit()
+        return count
+    finally:
+        # Ferme les connexions aiosqlite avant la fin de la boucle (sinon le processus ne se termine pas)
+        await async_engine.dispose()
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintenance SAC-DJ")
+    parser.add_argument("command", choices=sorted(REBUILDS), help="Opération de maintenance")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    count = asyncio.run(_run(args.command))
+    print(f"✅ {args.command}: {count} ligne(s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
+import json
 import uuid
-from sqlalchemy import Column, String, Text, Boolean, DateTime, ForeignKey, Integer, Numeric, Enum as SQLAlchemyEnum
+import zlib
+from datetime import datetime
+from sqlalchemy import BigInteger, Column, String, Text, Boolean, Date, DateTime, Float, ForeignKey, Integer, LargeBinary, Numeric, Index, Enum as SQLAlchemyEnum
 from sqlalchemy.dialects.sqlite import JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 
 from app.database import Base
-from .enums import UserRole, DocumentStatus, ClassificationResult
+from .enums import UserRole, DocumentStatus, ClassificationResult, JobStatus
 
 class User(Base):
     __tablename__ = "users"
@@ -24,12 +27,38 @@ class Document(Base):
     content_hash = Column(String, unique=True, index=True, nullable=False)
     file_size = Column(Integer)
     content_type = Column(String)
+    encoding = Column(String)
     upload_date = Column(DateTime(timezone=True), server_default=func.now())
+    # Dernière modification (ETag des lectures) : horodatage Python à la microseconde,
+    # CURRENT_TIMESTAMP (à la seconde) confondrait deux transitions rapprochées
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
     status = Column(SQLAlchemyEnum(DocumentStatus), default=DocumentStatus.PENDING, nullable=False)
     file_path = Column(String, nullable=False)
     uploaded_by_id = Column(String(36), ForeignKey("users.id"))
+    batch_id = Column(String(36), index=True)
+    dossier_id = Column(String(36), ForeignKey("dossiers.id"), index=True)
+    dossier_role = Column(String)  # "main" (courrier de recours) ou "attachment" (pièce jointe)
+    attachment_type = Column(String)  # Type de pièce détecté localement (facture, copie_decision...)
     
     classification = relationship("Classification", back_populates="document", uselist=False, cascade="all, delete-orphan")
+    dossier = relationship("Dossier", back_populates="documents")
+    review_entry = relationship("ReviewQueueEntry", uselist=False, cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Listes paginées par curseur (upload_date, id), avec ou sans filtre de statut
+        Index("ix_documents_upload_date", "upload_date", "id"),
+        Index("ix_documents_status_upload_date", "status", "upload_date", "id"),
+    )
+
+class Dossier(Base):
+    __tablename__ = "dossiers"
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    reference = Column(String, index=True)
+    status = Column(SQLAlchemyEnum(DocumentStatus), default=DocumentStatus.PENDING, nullable=False)
+    created_by_id = Column(String(36), ForeignKey("users.id"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    documents = relationship("Document", back_populates="dossier")
 
 class Classification(Base):
     __tablename__ = "classifications"
@@ -38,13 +67,66 @@ class Classification(Base):
     result = Column(SQLAlchemyEnum(ClassificationResult))
     justification = Column(Text)
     confidence_score = Column(Numeric(5, 4))
-    analysis_steps = Column(JSON)
     processing_time_ms = Column(Integer)
     model_version = Column(String)
+    prompt_version = Column(String)
+    # Origine de la décision : "llm" ou "validated_neighbors" (reprise de dossiers validés, sans LLM)
+    decision_source = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Champs de décision promus depuis l'état de l'analyse (filtrables et indexés)
+    is_review_required = Column(Boolean)
+    total_criteria = Column(Integer)
+    compliant_criteria = Column(Integer)
+    average_confidence = Column(Numeric(5, 4))
+
+    # État complet de l'analyse, en JSON compressé (optionnel, chargé uniquement sur demande)
+    analysis_blob = deferred(Column(LargeBinary))
+    # Ancien état JSON non compressé, migré vers analysis_blob et criterion_results
+    legacy_analysis_steps = deferred(Column("analysis_steps", JSON(none_as_null=True)))
+
     document = relationship("Document", back_populates="classification")
     human_validation = relationship("HumanValidation", back_populates="classification", uselist=False, cascade="all, delete-orphan")
+    criterion_results = relationship("CriterionResult", back_populates="classification", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_classifications_review_created", "is_review_required", "created_at"),
+    )
+
+    @property
+    def analysis_steps(self):
+        """État complet de l'analyse (None s'il n'est pas conservé)"""
+        if self.analysis_blob is not None:
+            return json.loads(zlib.decompress(self.analysis_blob))
+        return self.legacy_analysis_steps
+
+    @analysis_steps.setter
+    def analysis_steps(self, value):
+        if value is None:
+            self.analysis_blob = None
+        else:
+            self.analysis_blob = zlib.compress(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+        self.legacy_analysis_steps = None
+
+class CriterionResult(Base):
+    """Résultat d'un critère de recevabilité : une ligne par critère et par classification"""
+    __tablename__ = "criterion_results"
+    classification_id = Column(String(36), ForeignKey("classifications.id", ondelete="CASCADE"), primary_key=True)
+    criterion = Column(String(32), primary_key=True)  # deadline, quality, object, documents
+    is_compliant = Column(Boolean, nullable=False)
+    confidence = Column(Numeric(5, 4))
+    model_version = Column(String)
+    prompt_version = Column(String)
+    duration_ms = Column(Integer)
+    quote_verified = Column(Boolean)  # citation retrouvée dans le document (NULL : pas de citation)
+    analyzed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    classification = relationship("Classification", back_populates="criterion_results")
+
+    __table_args__ = (
+        # Ex. « échecs du critère délai la semaine dernière » : parcours d'intervalle sur l'index
+        Index("ix_criterion_results_outcome", "criterion", "is_compliant", "analyzed_at"),
+    )
 
 class HumanValidation(Base):
     __tablename__ = "human_validations"
@@ -56,4 +138,111 @@ class HumanValidation(Base):
     notes = Column(Text)
     validation_date = Column(DateTime(timezone=True), server_default=func.now())
 
-    classification = relationship("Classification", back_populates="human_validation")
\ No newline at end of file
+    classification = relationship("Classification", back_populates="human_validation")
+
+    __table_args__ = (
+        # Historique paginé par curseur (validation_date, id), avec ou sans filtre de validateur
+        Index("ix_human_validations_date", "validation_date", "id"),
+        Index("ix_human_validations_validator_date", "validator_id", "validation_date", "id"),
+    )
+
+class ValidationStatsDaily(Base):
+    """Agrégats quotidiens des validations humaines (mis à jour à chaque validation)"""
+    __tablename__ = "validation_stats_daily"
+    day = Column(Date, primary_key=True)  # jour UTC de la validation
+    validator_id = Column(String(36), primary_key=True)
+    validated_result = Column(SQLAlchemyEnum(ClassificationResult), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)  # validations confirmant le résultat de l'IA
+
+class AnalyticsRollup(Base):
+    """Agrégats horaires et quotidiens des analyses et validations (mis à jour à chaque événement)"""
+    __tablename__ = "analytics_rollups"
+    granularity = Column(String(4), primary_key=True)  # "hour" ou "day"
+    # Début de la période, UTC naïf (tronqué à l'heure ou au jour)
+    bucket_start = Column(DateTime, primary_key=True)
+    classifications = Column(Integer, nullable=False, default=0)
+    recevable = Column(Integer, nullable=False, default=0)
+    irrecevable = Column(Integer, nullable=False, default=0)
+    needs_review = Column(Integer, nullable=False, default=0)
+    errors = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    processing_ms_sum = Column(Integer, nullable=False, default=0)
+    processing_ms_max = Column(Integer, nullable=False, default=0)
+    validations = Column(Integer, nullable=False, default=0)
+    ia_correct = Column(Integer, nullable=False, default=0)
+
+class AnalyticsSketch(Base):
+    """Esquisse de quantiles (DDSketch sérialisée) d'une métrique sur une période, fusionnée à la lecture"""
+    __tablename__ = "analytics_sketches"
+    metric = Column(String(48), primary_key=True)  # processing_time_ms, criterion_latency_ms.<critère>, llm_tokens_per_second
+    granularity = Column(String(4), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    sketch = Column(LargeBinary, nullable=False)
+
+class ReviewQueueEntry(Base):
+    """File de révision humaine matérialisée : une ligne par document en attente de validation
+
+    Maintenue dans la même transaction que la classification et la validation ;
+    contient exactement la projection affichée par la page de validation.
+    """
+    __tablename__ = "review_queue"
+    document_id = Column(String(36), ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    classification_id = Column(String(36), nullable=False)
+    filename = Column(String, nullable=False)
+    upload_date = Column(DateTime(timezone=True), nullable=False)
+    result = Column(SQLAlchemyEnum(ClassificationResult))
+    justification = Column(Text)
+    confidence_score = Column(Numeric(5, 4))
+    priority = Column(String(6), nullable=False)  # "high", "medium" ou "low" selon la confiance
+
+    __table_args__ = (
+        # Pagination par curseur (upload_date, document_id), avec ou sans filtre de priorité
+        Index("ix_review_queue_date", "upload_date", "document_id",
+              postgresql_include=["classification_id", "filename", "confidence_score", "priority"]),
+        Index("ix_review_queue_priority_date", "priority", "upload_date", "document_id",
+              postgresql_include=["classification_id", "filename", "confidence_score"]),
+        Index("ix_review_queue_confidence", "confidence_score", "upload_date"),
+    )
+
+class DocumentSignature(Base):
+    """Signature MinHash du texte d'un document analysé (recherche de lettres types quasi identiques)"""
+    __tablename__ = "document_signatures"
+    document_id = Column(String(36), ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)  # composantes uint64 petit-boutistes
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class DocumentSignatureBand(Base):
+    """Clé d'une bande LSH d'une signature : deux documents qui partagent une clé sont candidats"""
+    __tablename__ = "document_signature_bands"
+    bucket = Column(BigInteger, primary_key=True)  # empreinte signée 64 bits (indice de bande inclus)
+    document_id = Column(String(36), ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+class DocumentEmbedding(Base):
+    """Vecteur spaCy (normalisé) du texte d'un document analysé : index des voisins validés"""
+    __tablename__ = "document_embeddings"
+    document_id = Column(String(36), ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    model = Column(String, nullable=False)  # modèle spaCy ayant produit le vecteur
+    vector = Column(LargeBinary, nullable=False)  # float32 petit-boutistes, norme 1
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String, nullable=False)  # "document" ou "dossier"
+    target_id = Column(String(36), nullable=False, index=True)
+    status = Column(SQLAlchemyEnum(JobStatus), default=JobStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, nullable=False)
+    # Horodatages UTC naïfs : comparés à datetime.utcnow() par les workers
+    available_at = Column(DateTime, nullable=False)
+    locked_until = Column(DateTime)
+    locked_by = Column(String)
+    claim_token = Column(String(36))  # jeton de la réservation en cours : seul son détenteur met le job à jour
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_analysis_jobs_claim", "status", "available_at"),
+    )
@@ -14,4 +14,10 @@ class DocumentStatus(str, Enum):
 
 class ClassificationResult(str, Enum):
     RECEVABLE = "RECEVABLE"
-    IRRECEVABLE = "IRRECEVABLE"
\ No newline at end of file
+    IRRECEVABLE = "IRRECEVABLE"
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    DEAD = "dead"
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from .enums import UserRole, DocumentStatus, ClassificationResult
 
 class Token(BaseModel):
@@ -16,10 +16,28 @@ class UserRead(BaseModel):
     class Config:
         from_attributes = True
 
+class CriterionResultRead(BaseModel):
+    criterion: str
+    is_compliant: bool
+    confidence: Optional[float] = None
+    duration_ms: Optional[int] = None
+    quote_verified: Optional[bool] = None  # citation retrouvée dans le document
+
+    class Config:
+        from_attributes = True
+
 class ClassificationRead(BaseModel):
     result: Optional[ClassificationResult] = None
     justification: Optional[str] = None
     confidence_score: Optional[float] = None
+    is_review_required: Optional[bool] = None
+    total_criteria: Optional[int] = None
+    compliant_criteria: Optional[int] = None
+    average_confidence: Optional[float] = None
+    model_version: Optional[str] = None
+    prompt_version: Optional[str] = None
+    decision_source: Optional[str] = None  # "llm" ou "validated_neighbors" (décision reprise de dossiers validés)
+    criterion_results: List[CriterionResultRead] = []
     analysis_steps: Optional[Dict[str, Any]] = None
 
     class Config:
@@ -35,9 +53,89 @@ class DocumentRead(BaseModel):
     class Config:
         from_attributes = True
         
+class DocumentSummary(BaseModel):
+    id: str
+    filename: str
+    upload_date: datetime
+    status: DocumentStatus
+    batch_id: Optional[str] = None
+    dossier_id: Optional[str] = None
+    result: Optional[ClassificationResult] = None
+    confidence_score: Optional[float] = None
+
+class DocumentPage(BaseModel):
+    documents: List[DocumentSummary]
+    next_cursor: Optional[str] = None
+
 class DocumentUploadResponse(BaseModel):
     message: str
     document_id: str
+    analysis: str = "scheduled"  # "scheduled", "in_flight" ou "reused"
+    analysis_deferred: bool = False
+    estimated_wait_seconds: Optional[int] = None
+    status: Optional[DocumentStatus] = None  # "reused" : statut du document analysé
+    classification: Optional[ClassificationRead] = None  # "reused" : classification existante
+
+class BatchUploadItem(BaseModel):
+    filename: str
+    document_id: str
+    status: str  # "created" ou "duplicate"
+
+class BatchUploadResponse(BaseModel):
+    message: str
+    batch_id: str
+    documents: List[BatchUploadItem]
+    analysis_deferred: bool = False
+    estimated_wait_seconds: Optional[int] = None
+
+class QueueStatusRead(BaseModel):
+    pending: int
+    running: int
+    dead: int
+    avg_processing_ms: int
+    estimated_wait_seconds: int
+    accepting: bool
+    overload_policy: str
+
+class DossierCreate(BaseModel):
+    main_document_id: str
+    attachment_ids: List[str] = []
+    reference: Optional[str] = None
+
+class DossierMemberRead(BaseModel):
+    id: str
+    filename: str
+    status: DocumentStatus
+    dossier_role: Optional[str] = None
+    attachment_type: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class DossierRead(BaseModel):
+    id: str
+    reference: Optional[str] = None
+    status: DocumentStatus
+    created_at: Optional[datetime] = None
+    documents: List[DossierMemberRead] = []
+
+    class Config:
+        from_attributes = True
+
+class SearchHit(BaseModel):
+    document_id: str
+    dossier_id: Optional[str] = None
+    filename: Optional[str] = None
+    demandeur: Optional[str] = None
+    status: DocumentStatus
+    result: Optional[ClassificationResult] = None
+    snippet: Optional[str] = None
+    score: float
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchHit]
+    took_ms: float
 
 class HumanValidationCreate(BaseModel):
     validated_result: ClassificationResult
@@ -0,0 +1,159 @@
+# app/services/admission_service.py
+import asyncio
+import logging
+import random
+import statistics
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import database_models as db_m
+from app.services.job_queue import get_job_queue
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'analyses récentes utilisées pour estimer la durée d'une analyse
+RECENT_ANALYSES_WINDOW = 50
+
+# Durée supposée d'une analyse tant qu'aucun historique n'existe
+DEFAULT_PROCESSING_MS = 60_000
+
+# Durée de validité de l'état de la file : une rafale d'uploads ne relance pas les requêtes
+STATUS_CACHE_SECONDS = 2.0
+
+@dataclass
+class QueueStatus:
+    """État de la file d'analyses et capacité d'absorption"""
+    pending: int
+    running: int
+    dead: int
+    avg_processing_ms: int
+    estimated_wait_seconds: int
+    accepting: bool
+    overload_policy: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+@dataclass
+class AdmissionDecision:
+    """Décision prise pour un upload"""
+    accepted: bool
+    defer_seconds: int = 0
+    retry_after: int = 0
+    estimated_wait_seconds: int = 0
+
+class AdmissionController:
+    """Contrôle d'admission des uploads selon la profondeur de la file d'analyses"""
+
+    def __init__(self):
+        self._status: Optional[QueueStatus] = None
+        self._status_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get_status(self) -> QueueStatus:
+        """Retourne l'état de la file (mis en cache quelques secondes)"""
+        async with self._lock:
+            return await self._cached_status()
+
+    async def _cached_status(self) -> QueueStatus:
+        # Appelé sous self._lock
+        if self._status is None or time.monotonic() - self._status_at > STATUS_CACHE_SECONDS:
+            self._status = await self._compute_status()
+            self._status_at = time.monotonic()
+        return self._status
+
+    def _record_admitted(self, status: QueueStatus, new_documents: int) -> None:
+        """Compte les analyses admises dans l'état en cache (appelé sous self._lock)
+
+        Sans cela, toutes les admissions d'une même fenêtre de cache seraient
+        jugées sur la même profondeur de file et une rafale passerait les seuils.
+        """
+        pending = status.pending + new_documents
+        estimated_wait = self._estimate_wait(pending + status.running, status.avg_processing_ms)
+        self._status = replace(
+            status,
+            pending=pending,
+            estimated_wait_seconds=estimated_wait,
+            accepting=not self._is_overloaded(pending, estimated_wait),
+        )
+
+    async def _compute_status(self) -> QueueStatus:
+        depth = await get_job_queue().depth()
+        avg_processing_ms = await self._recent_processing_ms()
+        estimated_wait = self._estimate_wait(depth["pending"] + depth["running"], avg_processing_ms)
+
+        return QueueStatus(
+            pending=depth["pending"],
+            running=depth["running"],
+            dead=depth["dead"],
+            avg_processing_ms=avg_processing_ms,
+            estimated_wait_seconds=estimated_wait,
+            accepting=not self._is_overloaded(depth["pending"], estimated_wait),
+            overload_policy=settings.ADMISSION_OVERLOAD_POLICY
+        )
+
+    async def _recent_processing_ms(self) -> int:
+        """Durée médiane des dernières analyses (robuste aux analyses tombées en timeout)"""
+        async with AsyncSessionLocal() as db:
+            durations: List[int] = list(await db.scalars(
+                select(db_m.Classification.processing_time_ms)
+                .where(db_m.Classification.processing_time_ms.isnot(None))
+                .order_by(db_m.Classification.created_at.desc())
+                .limit(RECENT_ANALYSES_WINDOW)
+            ))
+        return int(statistics.median(durations)) if durations else DEFAULT_PROCESSING_MS
+
+    @staticmethod
+    def _estimate_wait(queued: int, avg_processing_ms: int) -> int:
+        capacity = max(settings.ANALYSIS_WORKER_CAPACITY, 1)
+        return int(queued * avg_processing_ms / capacity / 1000)
+
+    @staticmethod
+    def _is_overloaded(pending: int, estimated_wait: int) -> bool:
+        return (
+            pending >= settings.ADMISSION_MAX_QUEUE_DEPTH
+            or estimated_wait >= settings.ADMISSION_MAX_WAIT_SECONDS
+        )
+
+    async def admit(self, new_documents: int = 1) -> AdmissionDecision:
+        """Décide si de nouvelles analyses peuvent être mises en file immédiatement"""
+        async with self._lock:
+            status = await self._cached_status()
+            decision = self._decide(status, new_documents)
+            if decision.accepted:
+                self._record_admitted(status, new_documents)
+            return decision
+
+    def _decide(self, status: QueueStatus, new_documents: int) -> AdmissionDecision:
+        estimated_wait = self._estimate_wait(
+            status.pending + status.running + new_documents, status.avg_processing_ms
+        )
+
+        if not self._is_overloaded(status.pending + new_documents, estimated_wait):
+            return AdmissionDecision(accepted=True, estimated_wait_seconds=estimated_wait)
+
+        # Temps nécessaire pour repasser sous les seuils
+        excess_wait = estimated_wait - settings.ADMISSION_MAX_WAIT_SECONDS
+        retry_after = max(excess_wait, status.avg_processing_ms // 1000, 1)
+
+        if settings.ADMISSION_OVERLOAD_POLICY == "reject":
+            logger.warning(f"🚦 Upload refusé: {status.pending} analyse(s) en attente, ~{estimated_wait}s d'attente")
+            return AdmissionDecision(accepted=False, retry_after=retry_after, estimated_wait_seconds=estimated_wait)
+
+        # L'attente excédentaire croît avec la position dans la file ; la gigue étale en plus
+        # les analyses différées du délai minimal, pour qu'elles ne redeviennent pas dues ensemble
+        retry_after += random.randint(0, max(status.avg_processing_ms // 1000, 1))
+        logger.warning(f"🚦 Analyse différée de {retry_after}s: {status.pending} analyse(s) en attente")
+        return AdmissionDecision(
+            accepted=True,
+            defer_seconds=retry_after,
+            estimated_wait_seconds=estimated_wait + retry_after
+        )
+
+# Instance unique du service
+admission_controller = AdmissionController()
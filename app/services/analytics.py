@@ -0,0 +1,383 @@
+# app/services/analytics.py
+"""
+Agrégats du tableau de bord.
+
+Chaque classification, échec d'analyse et validation humaine incrémente, dans
+la transaction qui l'enregistre, une ligne horaire et une ligne quotidienne de
+`analytics_rollups` : les endpoints /analytics ne lisent que ces agrégats,
+jamais les tables brutes.
+
+Les distributions (temps de traitement, latence LLM par critère, débit en
+tokens/s) sont tenues dans des esquisses DDSketch par métrique et par période
+(`analytics_sketches`), fusionnées à la lecture pour n'importe quelle fenêtre.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, delete, exists, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import database_models as db_m
+from app.models.enums import ClassificationResult, DocumentStatus
+from app.services.criterion_results import CRITERIA
+from app.utils.ddsketch import DDSketch
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("hour", "day")
+
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+# Métriques suivies par esquisse
+METRIC_PROCESSING_TIME = "processing_time_ms"
+METRIC_TOKENS_PER_SECOND = "llm_tokens_per_second"
+
+_UPSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+_COUNTERS = [
+    "classifications", "recevable", "irrecevable", "needs_review", "errors",
+    "confidence_sum", "processing_ms_sum", "validations", "ia_correct",
+]
+
+def criterion_metric(criterion: str) -> str:
+    return f"criterion_latency_ms.{criterion}"
+
+def criterion_durations(analysis_result: Dict[str, Any]) -> Dict[str, int]:
+    """Durée (ms) de l'appel LLM de chaque critère analysé"""
+    durations = {}
+    for criterion, key in CRITERIA.items():
+        duration_ms = (analysis_result.get(key) or {}).get("duration_ms")
+        if duration_ms is not None:
+            durations[criterion] = duration_ms
+    return durations
+
+def as_utc(moment: datetime) -> datetime:
+    """Horodatage UTC naïf (les colonnes server_default sont datées sur PostgreSQL)"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Début de l'heure ou du jour UTC contenant `moment`"""
+    moment = as_utc(moment).replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if granularity == "day" else moment
+
+def _window_clause(model, start: datetime, end: datetime):
+    """Périodes couvrant [start, end[ : jours entiers au milieu, heures aux extrémités"""
+    start_hour = bucket_start(start, "hour")
+    end_hour = bucket_start(end, "hour")
+    if end_hour < as_utc(end):
+        end_hour += timedelta(hours=1)
+    first_day = bucket_start(start_hour, "day")
+    if first_day < start_hour:
+        first_day += timedelta(days=1)
+    last_day = bucket_start(end_hour, "day")
+
+    def hours(lower: datetime, upper: datetime):
+        return and_(model.granularity == "hour", model.bucket_start >= lower, model.bucket_start < upper)
+
+    if first_day >= last_day:
+        return hours(start_hour, end_hour)
+    return or_(
+        hours(start_hour, first_day),
+        and_(model.granularity == "day", model.bucket_start >= first_day, model.bucket_start < last_day),
+        hours(last_day, end_hour),
+    )
+
+# ===== MAINTENANCE (appelée dans la transaction de l'événement) =====
+
+async def _increment(
+    session: AsyncSession,
+    model,
+    keys: Dict[str, Any],
+    increments: Dict[str, Any],
+    maxima: Optional[Dict[str, Any]] = None
+) -> None:
+    """Ajoute `increments` (et retient `maxima`) sur la ligne `keys`, créée au besoin"""
+    maxima = maxima or {}
+    upsert = _UPSERTS.get(session.bind.dialect.name)
+    if upsert is None:
+        # Autres bases : lecture puis écriture (sérialisé par l'écrivain unique)
+        row = await session.get(model, tuple(keys.values()))
+        if row is None:
+            session.add(model(**keys, **increments, **maxima))
+            return
+        for column, value in increments.items():
+            setattr(row, column, getattr(row, column) + value)
+        for column, value in maxima.items():
+            setattr(row, column, max(getattr(row, column), value))
+        return
+
+    statement = upsert(model).values(**keys, **increments, **maxima)
+    updates = {
+        column: getattr(model, column) + statement.excluded[column]
+        for column in increments
+    }
+    updates.update({
+        column: case(
+            (statement.excluded[column] > getattr(model, column), statement.excluded[column]),
+            else_=getattr(model, column),
+        )
+        for column in maxima
+    })
+    await session.execute(statement.on_conflict_do_update(
+        index_elements=[getattr(model, column) for column in keys],
+        set_=updates,
+    ))
+
+async def _observe(session: AsyncSession, at: datetime, observations: Dict[str, Sequence[float]]) -> None:
+    """Ajoute les valeurs observées aux esquisses horaires et quotidiennes de chaque métrique"""
+    observations = {metric: values for metric, values in observations.items() if values}
+    if not observations:
+        return
+    Sketch = db_m.AnalyticsSketch
+    starts = {granularity: bucket_start(at, granularity) for granularity in GRANULARITIES}
+    keys = [
+        {"metric": metric, "granularity": granularity, "bucket_start": start}
+        for metric in observations for granularity, start in starts.items()
+    ]
+
+    # Lignes créées vides au besoin, puis verrouillées le temps de la fusion
+    upsert = _UPSERTS.get(session.bind.dialect.name)
+    empty = DDSketch().to_bytes()
+    if upsert is None:
+        for key in keys:
+            if await session.get(Sketch, tuple(key.values())) is None:
+                session.add(Sketch(**key, sketch=empty))
+        await session.flush()
+    else:
+        await session.execute(upsert(Sketch).values([{**key, "sketch": empty} for key in keys]).on_conflict_do_nothing())
+
+    rows = (await session.execute(
+        select(Sketch.metric, Sketch.granularity, Sketch.bucket_start, Sketch.sketch)
+        .where(
+            Sketch.metric.in_(observations),
+            or_(*(and_(Sketch.granularity == granularity, Sketch.bucket_start == start)
+                  for granularity, start in starts.items())),
+        )
+        .with_for_update()
+    )).all()
+    # Écriture explicite : les sessions n'ont pas d'autoflush
+    for metric, granularity, start, data in rows:
+        sketch = DDSketch.from_bytes(data)
+        for value in observations[metric]:
+            sketch.add(value)
+        await session.execute(
+            update(Sketch)
+            .where(Sketch.metric == metric, Sketch.granularity == granularity, Sketch.bucket_start == start)
+            .values(sketch=sketch.to_bytes())
+        )
+
+async def _record(
+    session: AsyncSession,
+    at: Optional[datetime],
+    increments: Dict[str, Any],
+    processing_ms: Optional[int] = None
+) -> None:
+    at = at or datetime.utcnow()
+    for granularity in GRANULARITIES:
+        keys = {"granularity": granularity, "bucket_start": bucket_start(at, granularity)}
+        maxima = {"processing_ms_max": processing_ms} if processing_ms is not None else None
+        await _increment(session, db_m.AnalyticsRollup, keys, increments, maxima)
+
+async def record_classification(
+    session: AsyncSession,
+    result: Optional[ClassificationResult],
+    needs_review: bool,
+    confidence: float,
+    processing_time_ms: Optional[int],
+    criterion_durations_ms: Optional[Dict[str, int]] = None,
+    tokens_per_second: Sequence[float] = (),
+    at: Optional[datetime] = None
+) -> None:
+    """Compte une analyse terminée (une réanalyse compte comme une nouvelle analyse)"""
+    at = at or datetime.utcnow()
+    processing_ms = processing_time_ms or 0
+    await _record(session, at, {
+        "classifications": 1,
+        "recevable": int(result == ClassificationResult.RECEVABLE),
+        "irrecevable": int(result == ClassificationResult.IRRECEVABLE),
+        "needs_review": int(needs_review),
+        "confidence_sum": float(confidence or 0.0),
+        "processing_ms_sum": processing_ms,
+    }, processing_ms)
+
+    observations: Dict[str, Sequence[float]] = {METRIC_PROCESSING_TIME: [processing_ms]}
+    for criterion, duration_ms in (criterion_durations_ms or {}).items():
+        observations[criterion_metric(criterion)] = [duration_ms]
+    observations[METRIC_TOKENS_PER_SECOND] = list(tokens_per_second)
+    await _observe(session, at, observations)
+
+async def record_error(session: AsyncSession, at: Optional[datetime] = None) -> None:
+    """Compte une analyse en échec"""
+    await _record(session, at, {"errors": 1})
+
+async def record_validation(session: AsyncSession, is_ia_correct: bool, at: Optional[datetime] = None) -> None:
+    """Compte une validation humaine et son accord avec l'IA"""
+    await _record(session, at, {"validations": 1, "ia_correct": int(is_ia_correct)})
+
+async def rebuild(session: AsyncSession) -> int:
+    """Recalcule les agrégats et esquisses à partir des classifications, documents en erreur et validations
+
+    Le débit en tokens/s n'est conservé nulle part ailleurs : ses esquisses sont gardées telles quelles.
+    """
+    Classification, HumanValidation = db_m.Classification, db_m.HumanValidation
+    Sketch = db_m.AnalyticsSketch
+
+    # Suppression en premier : sur SQLite, le verrou d'écriture est pris avant la lecture
+    await session.execute(delete(db_m.AnalyticsRollup))
+    await session.execute(delete(Sketch).where(Sketch.metric != METRIC_TOKENS_PER_SECOND))
+
+    rollups: Dict[Tuple[str, datetime], Dict[str, Any]] = defaultdict(lambda: dict.fromkeys(_COUNTERS + ["processing_ms_max"], 0))
+    sketches: Dict[Tuple[str, str, datetime], DDSketch] = defaultdict(DDSketch)
+
+    def add(at: Optional[datetime], increments: Dict[str, Any], processing_ms: Optional[int] = None) -> None:
+        if at is None:
+            return
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(at, granularity))
+            row = rollups[key]
+            for column, value in increments.items():
+                row[column] += value
+            if processing_ms is not None:
+                row["processing_ms_max"] = max(row["processing_ms_max"], processing_ms)
+                sketches[(METRIC_PROCESSING_TIME,) + key].add(processing_ms)
+
+    classifications = await session.stream(select(
+        Classification.created_at, Classification.result, Classification.is_review_required,
+        Classification.confidence_score, Classification.processing_time_ms,
+    ))
+    async for created_at, result, is_review_required, confidence, processing_time_ms in classifications:
+        processing_ms = processing_time_ms or 0
+        add(created_at, {
+            "classifications": 1,
+            "recevable": int(result == ClassificationResult.RECEVABLE),
+            "irrecevable": int(result == ClassificationResult.IRRECEVABLE),
+            "needs_review": int(bool(is_review_required) or result is None),
+            "confidence_sum": float(confidence or 0.0),
+            "processing_ms_sum": processing_ms,
+        }, processing_ms)
+
+    durations = await session.stream(
+        select(db_m.CriterionResult.criterion, db_m.CriterionResult.duration_ms, db_m.CriterionResult.analyzed_at)
+        .where(db_m.CriterionResult.duration_ms.is_not(None))
+    )
+    async for criterion, duration_ms, analyzed_at in durations:
+        if analyzed_at is None:
+            continue
+        for granularity in GRANULARITIES:
+            sketches[(criterion_metric(criterion), granularity, bucket_start(analyzed_at, granularity))].add(duration_ms)
+
+    errors = await session.stream(
+        select(db_m.Document.updated_at, db_m.Document.upload_date)
+        .where(db_m.Document.status == DocumentStatus.ERROR)
+    )
+    async for updated_at, upload_date in errors:
+        add(updated_at or upload_date, {"errors": 1})
+
+    validations = await session.stream(select(HumanValidation.validation_date, HumanValidation.is_ia_correct))
+    async for validation_date, is_ia_correct in validations:
+        add(validation_date, {"validations": 1, "ia_correct": int(is_ia_correct)})
+
+    if rollups:
+        await session.execute(insert(db_m.AnalyticsRollup), [
+            {"granularity": granularity, "bucket_start": start, **counters}
+            for (granularity, start), counters in rollups.items()
+        ])
+    if sketches:
+        await session.execute(insert(Sketch), [
+            {"metric": metric, "granularity": granularity, "bucket_start": start, "sketch": sketch.to_bytes()}
+            for (metric, granularity, start), sketch in sketches.items()
+        ])
+
+    logger.info(f"📈 Agrégats d'analyse reconstruits: {len(rollups)} période(s), {len(sketches)} esquisse(s)")
+    return len(rollups)
+
+async def backfill_if_empty(session: AsyncSession) -> None:
+    """Calcule les agrégats au premier démarrage après la création de la table"""
+    has_rollups = await session.scalar(select(exists().select_from(db_m.AnalyticsRollup)))
+    if has_rollups:
+        return
+    has_events = await session.scalar(select(exists().select_from(db_m.Classification)))
+    if has_events:
+        await rebuild(session)
+        await session.commit()
+
+# ===== LECTURE =====
+
+async def summarize(
+    db: AsyncSession,
+    granularity: str,
+    since: datetime,
+    until: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Totaux et série temporelle des périodes `granularity` entre `since` et `until`"""
+    Rollup = db_m.AnalyticsRollup
+    statement = (
+        select(Rollup)
+        .where(Rollup.granularity == granularity, Rollup.bucket_start >= bucket_start(since, granularity))
+        .order_by(Rollup.bucket_start)
+    )
+    if until is not None:
+        statement = statement.where(Rollup.bucket_start <= as_utc(until))
+    rows = (await db.execute(statement)).scalars().all()
+
+    totals = dict.fromkeys(_COUNTERS, 0)
+    processing_ms_max = 0
+    timeline: List[Dict[str, Any]] = []
+    for row in rows:
+        for column in _COUNTERS:
+            totals[column] += getattr(row, column)
+        processing_ms_max = max(processing_ms_max, row.processing_ms_max)
+        timeline.append({
+            "bucket_start": row.bucket_start.isoformat(),
+            "classifications": row.classifications,
+            "recevable": row.recevable,
+            "irrecevable": row.irrecevable,
+            "needs_review": row.needs_review,
+            "errors": row.errors,
+            "average_processing_time_ms": round(row.processing_ms_sum / row.classifications, 1) if row.classifications else 0.0,
+            "ia_accuracy_percent": round(row.ia_correct / row.validations * 100, 2) if row.validations else None,
+        })
+    totals["processing_ms_max"] = processing_ms_max
+    return {"totals": totals, "timeline": timeline}
+
+async def total_classifications(db: AsyncSession) -> int:
+    """Nombre d'analyses depuis la mise en service (somme des agrégats quotidiens)"""
+    Rollup = db_m.AnalyticsRollup
+    total = await db.scalar(select(func.sum(Rollup.classifications)).where(Rollup.granularity == "day"))
+    return int(total or 0)
+
+def _describe(sketch: DDSketch, quantiles: Iterable[float]) -> Dict[str, Any]:
+    description: Dict[str, Any] = {"count": sketch.count}
+    for quantile in quantiles:
+        value = sketch.quantile(quantile)
+        description[f"p{round(quantile * 100):d}"] = round(value, 1) if value is not None else 0.0
+    return description
+
+async def distributions(
+    db: AsyncSession,
+    start: datetime,
+    end: Optional[datetime] = None,
+    metrics: Optional[Sequence[str]] = None,
+    quantiles: Iterable[float] = PERCENTILES
+) -> Dict[str, Dict[str, Any]]:
+    """Quantiles de chaque métrique sur [start, end[, esquisses des périodes fusionnées"""
+    Sketch = db_m.AnalyticsSketch
+    statement = select(Sketch.metric, Sketch.sketch).where(_window_clause(Sketch, start, end or datetime.utcnow()))
+    if metrics is not None:
+        statement = statement.where(Sketch.metric.in_(metrics))
+
+    merged: Dict[str, DDSketch] = {}
+    for metric, data in (await db.execute(statement)).all():
+        sketch = DDSketch.from_bytes(data)
+        if metric in merged:
+            merged[metric].merge(sketch)
+        else:
+            merged[metric] = sketch
+    quantiles = tuple(quantiles)
+    return {metric: _describe(sketch, quantiles) for metric, sketch in merged.items()}
@@ -0,0 +1,97 @@
+# app/services/attachment_classifier.py
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Nombre de caractères examinés : le type d'une pièce se lit dans son en-tête
+CLASSIFIER_SAMPLE_CHARS = 3000
+
+# Poids appliqué aux indices trouvés dans le nom du fichier
+FILENAME_WEIGHT = 2.0
+
+# Types de pièces justificatives et indices (motif, poids) associés
+ATTACHMENT_PATTERNS: Dict[str, List[Tuple[str, float]]] = {
+    "copie_decision": [
+        (r"\bd[ée]lib[ée]ration\b", 2.0),
+        (r"\bd[ée]cision\b", 1.0),
+        (r"\bd[ée]cide\s*:", 2.0),
+        (r"\barticle\s+1(er)?\b", 1.0),
+        (r"\bcommission de r[ée]gulation de l.[ée]nergie\b", 1.5),
+        (r"\bvu le code de l.[ée]nergie\b", 1.5),
+    ],
+    "facture": [
+        (r"\bfacture\b", 2.0),
+        (r"\bmontant\s+(ttc|ht)\b", 1.5),
+        (r"\bk\s?wh\b", 1.0),
+        (r"\bcontribution au service public de l.[ée]lectricit[ée]\b", 1.5),
+        (r"\bcspe\b", 0.5),
+        (r"\b(échéance|echeance|n°\s*client|r[ée]f[ée]rence client)\b", 1.0),
+    ],
+    "piece_identite": [
+        (r"\bcarte nationale d.identit[ée]\b", 3.0),
+        (r"\bpasseport\b", 2.0),
+        (r"\bn[ée]\(?e?\)? le\b", 1.0),
+        (r"\bnationalit[ée]\b", 1.0),
+        (r"\bidentit[ée]\b", 1.0),
+    ],
+    "kbis": [
+        (r"\bk\s?bis\b", 3.0),
+        (r"\bregistre du commerce\b", 2.0),
+        (r"\b(rcs|siren|siret)\b", 1.0),
+        (r"\bgreffe du tribunal de commerce\b", 2.0),
+    ],
+    "mandat": [
+        (r"\bmandat\b", 2.0),
+        (r"\bpouvoir\b", 1.0),
+        (r"\bdonne pouvoir\b", 2.0),
+        (r"\bavocat\b", 0.5),
+    ],
+    "accuse_reception": [
+        (r"\baccus[ée] de r[ée]ception\b", 3.0),
+        (r"\bla poste\b", 1.0),
+        (r"\brecommand[ée]\b", 1.0),
+        (r"\bavis de r[ée]ception\b", 2.0),
+    ],
+}
+
+_COMPILED_PATTERNS = {
+    attachment_type: [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in patterns]
+    for attachment_type, patterns in ATTACHMENT_PATTERNS.items()
+}
+
+# Score en dessous duquel la pièce reste non identifiée
+MIN_SCORE = 2.0
+
+
+def classify_attachment(text: str, filename: Optional[str] = None) -> Tuple[str, float]:
+    """
+    Classe une pièce jointe par type à l'aide d'indices lexicaux (sans appel LLM).
+
+    Args:
+        text: Contenu textuel de la pièce
+        filename: Nom du fichier, souvent très parlant ("facture_2023.pdf")
+
+    Returns:
+        Tuple[str, float]: Le type de pièce ("autre" si non identifiée) et une confiance entre 0 et 1
+    """
+    sample = text[:CLASSIFIER_SAMPLE_CHARS]
+    name = re.sub(r"[_\-.]+", " ", filename or "")
+
+    scores = {}
+    for attachment_type, patterns in _COMPILED_PATTERNS.items():
+        score = 0.0
+        for regex, weight in patterns:
+            if regex.search(sample):
+                score += weight
+            if name and regex.search(name):
+                score += weight * FILENAME_WEIGHT
+        scores[attachment_type] = score
+
+    best_type = max(scores, key=scores.get)
+    best_score = scores[best_type]
+    if best_score < MIN_SCORE:
+        return "autre", 0.0
+
+    # Confiance : part du meilleur score dans le total, pondérée par son intensité
+    total = sum(scores.values())
+    confidence = (best_score / total) * min(1.0, best_score / (2 * MIN_SCORE))
+    return best_type, round(confidence, 2)
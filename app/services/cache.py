@@ -0,0 +1,183 @@
+# app/services/cache.py
+"""
+Cache partagé à espaces de noms.
+
+Deux backends derrière la même interface :
+- `memory` : LRU borné du processus (un cache par réplique) ;
+- `redis` : partagé par toutes les répliques de l'API et les workers.
+
+Les valeurs sont sérialisées en JSON, chaque entrée a une durée de vie.
+Une panne de Redis n'interrompt jamais une requête : l'entrée est
+considérée absente et la donnée relue à la source.
+"""
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Optional
+
+from app.config import settings
+from app.utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Espaces de noms (et durée de vie par défaut associée)
+NS_DOCUMENT_VERSION = "document_version"  # statut et ETag d'un document
+NS_DOCUMENT = "document"                  # réponse GET /documents/{id} sérialisée
+NS_LLM = "llm"                            # complétions du LLM par prompt
+NS_TEXT = "text"                          # texte extrait, par empreinte de contenu
+NS_STATS = "stats"                        # agrégats du tableau de bord et statistiques
+
+def _default_ttls() -> Dict[str, int]:
+    return {
+        NS_DOCUMENT_VERSION: settings.CACHE_TTL_DOCUMENT_STATUS,
+        NS_DOCUMENT: settings.CACHE_TTL_DOCUMENT,
+        NS_LLM: settings.CACHE_TTL_LLM,
+        NS_TEXT: settings.CACHE_TTL_TEXT,
+        NS_STATS: settings.CACHE_TTL_STATS,
+    }
+
+class CacheBackend(ABC):
+    """Stockage clé -> octets avec expiration"""
+
+    # Vu par tous les processus (répliques de l'API et workers dédiés)
+    shared = False
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Valeur de la clé, None si absente ou expirée"""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        """Écrit la valeur pour `ttl` secondes"""
+
+    @abstractmethod
+    async def delete(self, keys: Iterable[str]) -> None:
+        """Supprime les clés (absentes ignorées)"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+class MemoryBackend(CacheBackend):
+    """LRU du processus, expiration vérifiée à la lecture"""
+
+    def __init__(self, maxsize: int):
+        self._entries = LRUCache(maxsize)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key)
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._entries.set(key, (time.monotonic() + ttl, value))
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._entries.pop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", **self._entries.stats()}
+
+class RedisBackend(CacheBackend):
+    """Redis partagé : SET avec expiration, erreurs traitées comme des absences"""
+
+    shared = True
+
+    def __init__(self, host: str, port: Optional[int]):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise ImportError("redis requis pour CACHE_BACKEND=redis (pip install redis)")
+
+        self.redis = redis.Redis(
+            host=host,
+            port=port or 6379,
+            socket_timeout=settings.CACHE_REDIS_TIMEOUT,
+            socket_connect_timeout=settings.CACHE_REDIS_TIMEOUT,
+        )
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            return await self.redis.get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache Redis indisponible (lecture): {e}")
+            return None
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        try:
+            await self.redis.set(key, value, ex=ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache Redis indisponible (écriture): {e}")
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        try:
+            await self.redis.delete(*keys)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache Redis indisponible (invalidation): {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+class Cache:
+    """Cache JSON à espaces de noms : `sacdj:cache:<espace>:<clé>`"""
+
+    def __init__(self, backend: CacheBackend, prefix: str = "sacdj:cache"):
+        self.backend = backend
+        self.prefix = prefix
+        self.ttls = _default_ttls()
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        data = await self.backend.get(self._key(namespace, key))
+        return json.loads(data) if data is not None else None
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ttl = ttl if ttl is not None else self.ttls.get(namespace, 0)
+        if ttl <= 0:
+            return
+        data = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        await self.backend.set(self._key(namespace, key), data, ttl)
+
+    async def delete(self, namespace: str, *keys: str) -> None:
+        await self.backend.delete(self._key(namespace, key) for key in keys)
+
+    async def invalidate_document(self, document_id: str) -> None:
+        """À appeler après chaque écriture validée sur un document (transition de statut, suppression)"""
+        await self.backend.delete([
+            self._key(NS_DOCUMENT_VERSION, document_id),
+            self._key(NS_DOCUMENT, document_id),
+        ])
+
+    @property
+    def shared(self) -> bool:
+        """Vrai si les invalidations d'un processus sont vues par les autres"""
+        return self.backend.shared
+
+    def stats(self) -> Dict[str, Any]:
+        return self.backend.stats()
+
+_cache: Optional[Cache] = None
+
+def get_cache() -> Cache:
+    """Retourne le cache configuré (singleton)"""
+    global _cache
+    if _cache is None:
+        if settings.CACHE_BACKEND == "redis":
+            if not settings.REDIS_HOST:
+                raise RuntimeError("REDIS_HOST requis pour CACHE_BACKEND=redis")
+            backend: CacheBackend = RedisBackend(settings.REDIS_HOST, settings.REDIS_PORT)
+        else:
+            backend = MemoryBackend(settings.CACHE_MEMORY_SIZE)
+        _cache = Cache(backend, settings.CACHE_KEY_PREFIX)
+    return _cache
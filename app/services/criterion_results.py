@@ -0,0 +1,117 @@
+# app/services/criterion_results.py
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+
+from app.config import settings
+from app.models import database_models as db_m
+
+logger = logging.getLogger(__name__)
+
+# Critère -> clé de son analyse dans l'état du workflow
+CRITERIA = {
+    "deadline": "deadline_analysis",
+    "quality": "quality_analysis",
+    "object": "object_analysis",
+    "documents": "documents_analysis",
+}
+
+# Classifications migrées par transaction lors de la reprise des anciens états JSON
+MIGRATION_BATCH_SIZE = 200
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+def build_results(
+    analysis_result: Dict[str, Any],
+    model_version: Optional[str],
+    prompt_version: Optional[str],
+    default_analyzed_at: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """Lignes criterion_results (hors classification_id) extraites de l'état de l'analyse"""
+    rows = []
+    for criterion, key in CRITERIA.items():
+        analysis = analysis_result.get(key)
+        if not analysis:
+            continue
+        rows.append({
+            "criterion": criterion,
+            "is_compliant": bool(analysis.get("is_compliant", False)),
+            "confidence": float(analysis.get("confidence") or 0.0),
+            "model_version": model_version,
+            "prompt_version": prompt_version,
+            "duration_ms": analysis.get("duration_ms"),
+            "quote_verified": analysis.get("quote_verified"),
+            "analyzed_at": _parse_timestamp(analysis.get("analyzed_at")) or default_analyzed_at or datetime.utcnow(),
+        })
+    return rows
+
+def _promote(classification: db_m.Classification, analysis_result: Dict[str, Any]) -> None:
+    """Recopie les champs de décision de l'état de l'analyse dans les colonnes de la classification"""
+    summary = analysis_result.get("analysis_summary") or {}
+    classification.is_review_required = bool(analysis_result.get("is_review_required", True))
+    classification.total_criteria = summary.get("total_criteria")
+    classification.compliant_criteria = summary.get("compliant_criteria")
+    classification.average_confidence = summary.get("average_confidence")
+
+async def save_results(
+    session: AsyncSession,
+    classification: db_m.Classification,
+    analysis_result: Dict[str, Any],
+    default_analyzed_at: Optional[datetime] = None
+) -> None:
+    """Enregistre champs promus, résultats par critère et état compressé (classification déjà flushée)"""
+    _promote(classification, analysis_result)
+    classification.analysis_steps = analysis_result if settings.ANALYSIS_BLOB_ENABLED else None
+
+    # Une réanalyse remplace les résultats précédents
+    await session.execute(
+        delete(db_m.CriterionResult).where(db_m.CriterionResult.classification_id == classification.id)
+    )
+    rows = build_results(
+        analysis_result, classification.model_version, classification.prompt_version, default_analyzed_at
+    )
+    if rows:
+        await session.execute(
+            insert(db_m.CriterionResult),
+            [{"classification_id": classification.id, **row} for row in rows]
+        )
+
+async def migrate_legacy(session: AsyncSession, batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """Reprend les anciennes classifications (état JSON non compressé) par lots
+
+    Chaque lot est validé séparément : la reprise peut être interrompue et relancée.
+    """
+    Classification = db_m.Classification
+    migrated = 0
+    while True:
+        classifications = (await session.execute(
+            select(Classification)
+            .options(undefer(Classification.legacy_analysis_steps))
+            .where(Classification.legacy_analysis_steps.is_not(None))
+            .limit(batch_size)
+        )).scalars().all()
+        if not classifications:
+            break
+
+        for classification in classifications:
+            analysis_result = classification.legacy_analysis_steps
+            # Le blob JSON peut valoir "null" : la ligne ne serait jamais sélectionnée à nouveau
+            classification.legacy_analysis_steps = None
+            if isinstance(analysis_result, dict):
+                await save_results(session, classification, analysis_result, classification.created_at)
+        await session.commit()
+        migrated += len(classifications)
+
+    if migrated:
+        logger.info(f"🗜️ Analyses migrées vers criterion_results: {migrated}")
+    return migrated
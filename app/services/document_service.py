@@ -3,15 +3,30 @@ import uuid
 import hashlib
 import os
 import asyncio
+import zipfile
 from pathlib import Path
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from fastapi import UploadFile
 from datetime import datetime
+from typing import Optional, List, Dict, Any, Awaitable, BinaryIO, Callable, Tuple
 import logging
 
 from app.models import database_models as db_m
 from app.core.graph import execute_cspe_analysis
 from app.config import settings
+from app.services import analytics, criterion_results, near_duplicates, review_queue, search_index, validated_neighbors
+from app.services.admission_service import AdmissionDecision
+from app.services.cache import NS_TEXT, get_cache
+from app.services.job_queue import JOB_KIND_DOCUMENT, get_job_queue, pending_retry_delay
+from app.services.ollama_service import PROMPT_SET_VERSION, collect_generation_rates
+from app.services.status_events import status_bus
+from app.services.write_queue import write_queue
+from app.utils.encoding_utils import read_text_file
+from app.utils.pagination import before_cursor, cursor_key, split_page
+from app.utils.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
@@ -19,30 +34,169 @@ logger = logging.getLogger(__name__)
 UPLOAD_DIRECTORY = Path(settings.UPLOAD_DIR)
 UPLOAD_DIRECTORY.mkdir(exist_ok=True)
 
+# Taille des blocs lus lors de l'écriture en flux des fichiers reçus
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+# Tentatives d'insertion d'un lot dont un contenu est enregistré en parallèle par une autre requête
+BATCH_INSERT_ATTEMPTS = 3
+
+# Issue de la planification d'une analyse à la réception d'un document
+ANALYSIS_SCHEDULED = "scheduled"  # analyse mise en file par cette requête
+ANALYSIS_IN_FLIGHT = "in_flight"  # déjà en file ou en cours : rien de plus à lancer
+ANALYSIS_REUSED = "reused"        # classification existante du même contenu, même modèle et mêmes prompts
+
+# Statuts d'un document dont l'analyse est en file ou en cours, ou a abouti
+IN_FLIGHT_STATUSES = {db_m.DocumentStatus.PENDING, db_m.DocumentStatus.PROCESSING}
+ANALYZED_STATUSES = {db_m.DocumentStatus.COMPLETED, db_m.DocumentStatus.NEEDS_REVIEW}
+
+# Contrôle d'admission appelé avec le nombre d'analyses nouvelles, une fois les doublons écartés
+# et avant toute écriture : lève une exception pour refuser l'upload, ou retourne la décision
+# (délai de mise en file des analyses admises)
+Admit = Callable[[int], Awaitable[Optional[AdmissionDecision]]]
+
+# Analyses en cours dans ce processus : un même document n'est analysé qu'une fois à la fois
+_analysis_flights = SingleFlight()
+
+async def _admitted_delay(admit: Optional[Admit], new_documents: int) -> int:
+    """Passe le contrôle d'admission et retourne le délai de mise en file des analyses admises"""
+    if admit is None:
+        return 0
+    decision = await admit(new_documents)
+    return decision.defer_seconds if decision is not None else 0
+
+def is_current_classification(classification: Optional[db_m.Classification]) -> bool:
+    """Classification produite par le modèle et le jeu de prompts actuels (réutilisable telle quelle)"""
+    return (
+        classification is not None
+        and classification.model_version == settings.LLM_MODEL
+        and classification.prompt_version == PROMPT_SET_VERSION
+    )
+
+def _check_archive_limits(archive_name: Optional[str], infos: List[zipfile.ZipInfo]) -> None:
+    """Refuse une archive trop volumineuse une fois décompressée, avant d'en extraire la moindre entrée
+
+    Les tailles déclarées dans le répertoire central suffisent : zipfile
+    n'en lit jamais plus pour une entrée.
+    """
+    if len(infos) > settings.ZIP_MAX_ENTRIES:
+        raise ValueError(f"Archive {archive_name}: {len(infos)} entrées (maximum {settings.ZIP_MAX_ENTRIES})")
+    total = 0
+    for info in infos:
+        if info.file_size > settings.ZIP_MAX_ENTRY_BYTES:
+            raise ValueError(
+                f"Archive {archive_name}: {info.filename} dépasse {settings.ZIP_MAX_ENTRY_BYTES} octets une fois décompressé"
+            )
+        total += info.file_size
+    if total > settings.ZIP_MAX_TOTAL_BYTES:
+        raise ValueError(f"Archive {archive_name}: {total} octets décompressés (maximum {settings.ZIP_MAX_TOTAL_BYTES})")
+
+# Textes extraits plus longs non mis en cache (une entrée Redis reste raisonnable)
+TEXT_CACHE_MAX_CHARS = 500_000
+
 class DocumentService:
     """Service pour la gestion des documents et analyses"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
+    async def _get_document(self, document_id: str) -> Optional[db_m.Document]:
+        """Charge un document avec sa classification (pas de chargement paresseux en asynchrone)"""
+        result = await self.db.execute(
+            select(db_m.Document)
+            .options(selectinload(db_m.Document.classification))
+            .where(db_m.Document.id == document_id)
+        )
+        return result.scalars().first()
+    
+    async def update_document(self, document_id: str, **values) -> int:
+        """Met à jour les colonnes d'un document via l'écrivain unique (retourne le nombre de lignes)"""
+        async def operation(session: AsyncSession) -> int:
+            result = await session.execute(
+                update(db_m.Document).where(db_m.Document.id == document_id).values(**values)
+            )
+            return result.rowcount
+        updated = await write_queue.submit(operation)
+        await get_cache().invalidate_document(document_id)
+        return updated
+    
+    async def _find_by_hash(self, content_hash: str) -> Optional[db_m.Document]:
+        return (await self.db.execute(
+            select(db_m.Document)
+            .options(selectinload(db_m.Document.classification))
+            .where(db_m.Document.content_hash == content_hash)
+        )).scalars().first()
+    
     async def receive_document(self, file: UploadFile, user_id: str) -> db_m.Document:
-        """Reçoit et sauvegarde un document"""
+        """Reçoit et sauvegarde un document (analyse mise en file s'il est nouveau)"""
+        document, _ = await self._receive_document(file, user_id)
+        return document
+    
+    async def receive_for_analysis(
+        self, file: UploadFile, user_id: str, admit: Optional[Admit] = None
+    ) -> Tuple[db_m.Document, str]:
+        """Reçoit un document et décide de son analyse (ANALYSIS_SCHEDULED, ANALYSIS_IN_FLIGHT ou ANALYSIS_REUSED)
+        
+        Seul ANALYSIS_SCHEDULED met l'analyse en file : la création du document,
+        ou le passage conditionnel de son statut à PENDING, fait office de verrou
+        entre requêtes et répliques concurrentes, et le job est enregistré dans la
+        même transaction. `admit` n'est appelé que dans ce cas.
+        """
+        document, created = await self._receive_document(file, user_id, admit)
+        if created:
+            return document, ANALYSIS_SCHEDULED
+        
+        if is_current_classification(document.classification) and document.status in ANALYZED_STATUSES:
+            logger.info(f"♻️ Classification existante réutilisée: {document.id}")
+            return document, ANALYSIS_REUSED
+        if document.status in IN_FLIGHT_STATUSES:
+            logger.info(f"⏳ Analyse déjà en file ou en cours: {document.id}")
+            return document, ANALYSIS_IN_FLIGHT
+        
+        # Échec précédent ou classification d'un autre modèle / d'autres prompts : une seule requête relance
+        delay = await _admitted_delay(admit, 1)
+        observed_status = document.status
+        queue = get_job_queue()
+        jobs = [(JOB_KIND_DOCUMENT, document.id)]
+        async def claim(session: AsyncSession) -> Tuple[int, bool]:
+            result = await session.execute(
+                update(db_m.Document)
+                .where(db_m.Document.id == document.id, db_m.Document.status == observed_status)
+                .values(status=db_m.DocumentStatus.PENDING)
+            )
+            staged = result.rowcount == 1 and queue.stage_many(session, jobs, delay)
+            return result.rowcount, staged
+        claimed, staged = await write_queue.submit(claim)
+        if not claimed:
+            return document, ANALYSIS_IN_FLIGHT
+        if not staged:
+            await queue.enqueue_many(jobs, delay)
+        await get_cache().invalidate_document(document.id)
+        document.status = db_m.DocumentStatus.PENDING
+        return document, ANALYSIS_SCHEDULED
+    
+    async def _receive_document(
+        self, file: UploadFile, user_id: str, admit: Optional[Admit] = None
+    ) -> Tuple[db_m.Document, bool]:
+        """Document existant de même contenu, ou nouveau document enregistré (second élément : créé)"""
         logger.info(f"📄 Réception du document: {file.filename}")
         
+        # Lire le contenu du fichier
+        contents = await file.read()
+        content_hash = hashlib.sha256(contents).hexdigest()
+        
+        # Vérifier si le document existe déjà
+        existing_doc = await self._find_by_hash(content_hash)
+        
+        if existing_doc:
+            logger.info(f"📄 Document existant trouvé: {existing_doc.id}")
+            return existing_doc, False
+        
+        # Nouveau contenu : soumis au contrôle d'admission avant d'être enregistré
+        delay = await _admitted_delay(admit, 1)
+        
         try:
-            # Lire le contenu du fichier
-            contents = await file.read()
-            content_hash = hashlib.sha256(contents).hexdigest()
-            
-            # Vérifier si le document existe déjà
-            existing_doc = self.db.query(db_m.Document).filter(
-                db_m.Document.content_hash == content_hash
-            ).first()
-            
-            if existing_doc:
-                logger.info(f"📄 Document existant trouvé: {existing_doc.id}")
-                return existing_doc
-            
             # Générer un nom de fichier unique
             file_extension = Path(file.filename).suffix if file.filename else '.txt'
             unique_filename = f"{content_hash[:16]}{file_extension}"
@@ -54,6 +208,7 @@ class DocumentService:
             
             # Créer l'enregistrement en base de données
             new_doc = db_m.Document(
+                id=str(uuid.uuid4()),
                 filename=file.filename or "document_sans_nom.txt",
                 content_hash=content_hash,
                 file_size=len(contents),
@@ -64,17 +219,215 @@ class DocumentService:
             )
             
             self.db.add(new_doc)
-            self.db.commit()
-            self.db.refresh(new_doc)
+            # Analyse mise en file dans la même transaction que le document quand la file est en base
+            queue = get_job_queue()
+            jobs = [(JOB_KIND_DOCUMENT, new_doc.id)]
+            staged = queue.stage_many(self.db, jobs, delay)
+            try:
+                await self.db.commit()
+            except IntegrityError:
+                # Même contenu reçu en parallèle : le document enregistré par l'autre requête fait foi
+                await self.db.rollback()
+                existing_doc = await self._find_by_hash(content_hash)
+                if existing_doc is None:
+                    raise
+                logger.info(f"📄 Document reçu en parallèle: {existing_doc.id}")
+                return existing_doc, False
+            await self.db.refresh(new_doc)
+            if not staged:
+                await queue.enqueue_many(jobs, delay)
             
             logger.info(f"✅ Document sauvegardé: {new_doc.id}")
-            return new_doc
+            return new_doc, True
             
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             logger.error(f"❌ Erreur lors de la réception du document: {e}")
             raise
     
+    def _store_stream(self, stream: BinaryIO, filename: Optional[str]) -> Tuple[str, int, Path, bool]:
+        """Écrit un flux sur disque par blocs en calculant son empreinte au passage (dernier élément : fichier créé)"""
+        hasher = hashlib.sha256()
+        size = 0
+        temp_path = UPLOAD_DIRECTORY / f".upload-{uuid.uuid4().hex}"
+        
+        try:
+            with open(temp_path, "wb") as f:
+                while chunk := stream.read(STREAM_CHUNK_SIZE):
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            temp_path.unlink(missing_ok=True)
+            raise
+        
+        content_hash = hasher.hexdigest()
+        file_extension = Path(filename).suffix if filename else '.txt'
+        file_path = UPLOAD_DIRECTORY / f"{content_hash[:16]}{file_extension}"
+        
+        if file_path.exists():
+            temp_path.unlink()
+            return content_hash, size, file_path, False
+        
+        temp_path.replace(file_path)
+        return content_hash, size, file_path, True
+    
+    def _iter_batch_entries(self, files: List[UploadFile]):
+        """Parcourt les fichiers d'un lot en dépliant les archives ZIP entrée par entrée"""
+        for upload in files:
+            is_zip = (
+                upload.content_type in ZIP_CONTENT_TYPES
+                or (upload.filename or "").lower().endswith(".zip")
+            )
+            
+            if not is_zip:
+                yield upload.filename, upload.content_type, upload.file
+                continue
+            
+            # zipfile lit le répertoire central puis décompresse chaque entrée en flux
+            with zipfile.ZipFile(upload.file) as archive:
+                _check_archive_limits(upload.filename, archive.infolist())
+                for info in archive.infolist():
+                    name = Path(info.filename).name
+                    if info.is_dir() or not name or name.startswith(".") or info.filename.startswith("__MACOSX/"):
+                        continue
+                    with archive.open(info) as entry:
+                        yield name, None, entry
+    
+    def _ingest_batch_files(self, files: List[UploadFile], created: List[Tuple[str, Path]]) -> List[Dict[str, Any]]:
+        """Stocke les fichiers d'un lot sur disque (exécuté hors de la boucle d'événements)
+
+        Les fichiers écrits par ce lot sont ajoutés à `created` au fur et à mesure,
+        pour être retirés si le lot échoue, même en cours d'écriture.
+        """
+        entries = []
+        for filename, content_type, stream in self._iter_batch_entries(files):
+            content_hash, size, file_path, is_new = self._store_stream(stream, filename)
+            if is_new:
+                created.append((content_hash, file_path))
+            entries.append({
+                "filename": filename or "document_sans_nom.txt",
+                "content_type": content_type or _guess_content_type(filename),
+                "content_hash": content_hash,
+                "file_size": size,
+                "file_path": str(file_path),
+            })
+        return entries
+    
+    async def _discard_batch_files(self, created: List[Tuple[str, Path]]) -> None:
+        """Supprime les fichiers écrits par un lot en échec, sauf ceux d'un document enregistré entre-temps (même contenu)"""
+        if not created:
+            return
+        kept = set((await self.db.execute(
+            select(db_m.Document.content_hash).where(
+                db_m.Document.content_hash.in_([content_hash for content_hash, _ in created])
+            )
+        )).scalars().all())
+        for content_hash, file_path in created:
+            if content_hash not in kept:
+                file_path.unlink(missing_ok=True)
+        logger.info(f"🧹 {len(created) - len(kept)} fichier(s) du lot en échec supprimé(s)")
+    
+    async def _plan_batch(
+        self, batch_id: str, entries: List[Dict[str, Any]], user_id: str
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, db_m.Document]]:
+        """Sépare les entrées d'un lot en doublons (en base ou dans le lot) et documents à créer"""
+        # Dédoublonnage contre la base en une seule requête
+        hashes = {entry["content_hash"] for entry in entries}
+        existing = dict((await self.db.execute(
+            select(db_m.Document.content_hash, db_m.Document.id).where(
+                db_m.Document.content_hash.in_(hashes)
+            )
+        )).all()) if hashes else {}
+        
+        items = []
+        new_docs = {}
+        for entry in entries:
+            content_hash = entry["content_hash"]
+            
+            if content_hash in existing:
+                items.append({"filename": entry["filename"], "document_id": existing[content_hash], "status": "duplicate"})
+                continue
+            
+            if content_hash in new_docs:
+                # Doublon à l'intérieur du même lot
+                items.append({"filename": entry["filename"], "document": new_docs[content_hash], "status": "duplicate"})
+                continue
+            
+            new_doc = db_m.Document(
+                id=str(uuid.uuid4()),
+                batch_id=batch_id,
+                uploaded_by_id=user_id,
+                status=db_m.DocumentStatus.PENDING,
+                **entry
+            )
+            new_docs[content_hash] = new_doc
+            items.append({"filename": entry["filename"], "document": new_doc, "status": "created"})
+        return items, new_docs
+    
+    async def receive_batch(
+        self, files: List[UploadFile], user_id: str, admit: Optional[Admit] = None
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """Reçoit un lot de fichiers (ou d'archives ZIP) et crée les documents en une transaction
+
+        `admit` reçoit le nombre de documents nouveaux, doublons écartés (archives dépliées).
+        Les analyses des documents créés sont mises en file avec eux.
+        """
+        batch_id = str(uuid.uuid4())
+        logger.info(f"📦 Réception du lot {batch_id}: {len(files)} fichier(s)")
+        
+        queue = get_job_queue()
+        delay = 0
+        created: List[Tuple[str, Path]] = []
+        try:
+            entries = await asyncio.to_thread(self._ingest_batch_files, files, created)
+            
+            for attempt in range(1, BATCH_INSERT_ATTEMPTS + 1):
+                items, new_docs = await self._plan_batch(batch_id, entries, user_id)
+                if attempt == 1 and new_docs:
+                    delay = await _admitted_delay(admit, len(new_docs))
+                self.db.add_all(new_docs.values())
+                jobs = [(JOB_KIND_DOCUMENT, document.id) for document in new_docs.values()]
+                staged = queue.stage_many(self.db, jobs, delay) if jobs else True
+                try:
+                    await self.db.commit()
+                    break
+                except IntegrityError:
+                    # Même contenu reçu en parallèle par une autre requête : les empreintes sont relues
+                    await self.db.rollback()
+                    if attempt == BATCH_INSERT_ATTEMPTS:
+                        raise
+                    logger.info(f"📦 Lot {batch_id}: contenu reçu en parallèle, nouvelle tentative ({attempt})")
+            if not staged:
+                await queue.enqueue_many(jobs, delay)
+            
+            for item in items:
+                if "document" in item:
+                    item["document_id"] = item.pop("document").id
+            
+            logger.info(f"✅ Lot {batch_id}: {len(new_docs)} document(s) créé(s), {len(items) - len(new_docs)} doublon(s)")
+            return batch_id, items
+            
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"❌ Erreur lors de la réception du lot: {e}")
+            # Admission refusée, archive hors limites ou insertion impossible : aucun fichier orphelin
+            await self._discard_batch_files(created)
+            raise
+    
+    async def get_document_text(self, document: db_m.Document) -> str:
+        """Texte extrait d'un document, en cache par empreinte de contenu (partagé entre répliques et workers)"""
+        cache = get_cache()
+        cached = await cache.get(NS_TEXT, document.content_hash)
+        if cached is not None:
+            document.encoding = cached["encoding"] or document.encoding
+            return cached["text"]
+        
+        content = await asyncio.to_thread(self.read_document_content, document)
+        if len(content) <= TEXT_CACHE_MAX_CHARS:
+            await cache.set(NS_TEXT, document.content_hash, {"text": content, "encoding": document.encoding})
+        return content
+    
     def read_document_content(self, document: db_m.Document) -> str:
         """Lit le contenu textuel d'un document"""
         logger.info(f"📖 Lecture du contenu: {document.filename}")
@@ -87,37 +440,27 @@ class DocumentService:
             
             # Lire selon le type de fichier
             if document.content_type == "text/plain" or file_path.suffix == ".txt":
-                return self._read_text_file(file_path)
+                return self._read_text_file(file_path, document)
             elif file_path.suffix == ".pdf":
                 return self._read_pdf_file(file_path)
             elif file_path.suffix in [".docx", ".doc"]:
                 return self._read_word_file(file_path)
             else:
                 # Essayer de lire comme texte brut
-                return self._read_text_file(file_path)
+                return self._read_text_file(file_path, document)
                 
         except Exception as e:
             logger.error(f"❌ Erreur lors de la lecture: {e}")
             raise
     
-    def _read_text_file(self, file_path: Path) -> str:
-        """Lit un fichier texte"""
-        encodings = ['utf-8', 'latin1', 'cp1252', 'iso-8859-1']
-        
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    content = f.read()
-                logger.info(f"✅ Fichier lu avec encodage {encoding}")
-                return content
-            except UnicodeDecodeError:
-                continue
+    def _read_text_file(self, file_path: Path, document: Optional[db_m.Document] = None) -> str:
+        """Lit un fichier texte en une seule passe et enregistre l'encodage détecté"""
+        content, encoding = read_text_file(file_path)
         
-        # Si aucun encodage ne fonctionne, utiliser errors='ignore'
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
+        if document is not None:
+            document.encoding = encoding
         
-        logger.warning("⚠️ Fichier lu avec des caractères ignorés")
+        logger.info(f"✅ Fichier lu avec encodage {encoding}")
         return content
     
     def _read_pdf_file(self, file_path: Path) -> str:
@@ -162,34 +505,77 @@ class DocumentService:
             logger.error(f"❌ Erreur lecture Word: {e}")
             raise
     
-    async def process_document_analysis(self, document_id: str) -> None:
-        """Lance l'analyse complète d'un document avec LangGraph"""
+    async def process_document_analysis(
+        self,
+        document_id: str,
+        content: Optional[str] = None,
+        attachments_inventory: Optional[List[Dict[str, Any]]] = None,
+        force: bool = False
+    ) -> None:
+        """Lance l'analyse complète d'un document avec LangGraph
+        
+        `content` évite une relecture quand le texte a déjà été extrait (analyse
+        de dossier) ; `attachments_inventory` est transmis au critère des pièces.
+        `force` réanalyse même un document déjà classé (le courrier principal d'un
+        dossier, déjà analysé seul à son upload, est repris avec son inventaire).
+        """
         logger.info(f"🤖 Début de l'analyse: {document_id}")
         
         try:
             # Récupérer le document
-            document = self.db.query(db_m.Document).filter(
-                db_m.Document.id == document_id
-            ).first()
+            document = await self._get_document(document_id)
             
             if not document:
                 raise ValueError(f"Document non trouvé: {document_id}")
             
+            # Job rejoué ou en double : ce contenu est déjà classé avec ce modèle et ces prompts
+            if (
+                not force
+                and is_current_classification(document.classification)
+                and document.status in ANALYZED_STATUSES
+            ):
+                logger.info(f"♻️ Analyse déjà disponible, rien à refaire: {document_id}")
+                return
+            
             # Mettre à jour le statut
-            document.status = db_m.DocumentStatus.PROCESSING
-            self.db.commit()
+            await self.update_document(document_id, status=db_m.DocumentStatus.PROCESSING)
+            status_bus.publish_status(document_id, db_m.DocumentStatus.PROCESSING.value)
             
             # Lire le contenu
-            content = self.read_document_content(document)
+            if content is None:
+                content = await self.get_document_text(document)
             
             if not content.strip():
                 raise ValueError("Le document est vide ou illisible")
             
             logger.info(f"📄 Contenu lu: {len(content)} caractères")
             
-            # Exécuter l'analyse avec LangGraph
             start_time = datetime.utcnow()
-            analysis_result = await execute_cspe_analysis(document_id, content)
+            
+            # Dossiers validés quasi identiques et concordants : leur décision est proposée sans LLM, en révision
+            vector, neighbors = None, None
+            if settings.NN_SHORTCUT_ENABLED:
+                vector = await validated_neighbors.compute_vector(content)
+                if vector is not None:
+                    neighbors = await validated_neighbors.find_shortcut(self.db, document_id, vector, attachments_inventory)
+            
+            signature, generation_rates = None, []
+            if neighbors:
+                logger.info(f"🧭 Décision proposée d'après {len(neighbors)} dossiers validés: {document_id}")
+                analysis_result = validated_neighbors.shortcut_analysis(neighbors, attachments_inventory)
+                if settings.NEAR_DUPLICATE_ENABLED:
+                    signature = await near_duplicates.compute_signature(content)
+            else:
+                # Lettre type déjà analysée : reprise des critères liés au modèle de courrier
+                reused_analyses = {}
+                if settings.NEAR_DUPLICATE_ENABLED:
+                    signature, reused_analyses = await near_duplicates.find_reusable_analyses(
+                        self.db, document_id, content, attachments_inventory
+                    )
+                
+                # Exécuter l'analyse avec LangGraph
+                with collect_generation_rates() as generation_rates:
+                    analysis_result = await execute_cspe_analysis(document_id, content, attachments_inventory, reused_analyses)
             end_time = datetime.utcnow()
             
             processing_time_ms = int((end_time - start_time).total_seconds() * 1000)
@@ -203,53 +589,114 @@ class DocumentService:
             else:
                 classification_result = None  # Nécessite une révision
             
-            # Sauvegarder la classification
-            classification = db_m.Classification(
-                document_id=document_id,
-                result=classification_result,
-                justification=analysis_result.get("final_justification", ""),
-                confidence_score=float(analysis_result.get("final_confidence", 0.0)),
-                analysis_steps=analysis_result,
-                processing_time_ms=processing_time_ms,
-                model_version=settings.LLM_MODEL
-            )
-            
-            self.db.add(classification)
-            
-            # Mettre à jour le statut du document
+            # Statut final du document
             if analysis_result.get("is_review_required", True) or classification_result is None:
-                document.status = db_m.DocumentStatus.NEEDS_REVIEW
+                final_status = db_m.DocumentStatus.NEEDS_REVIEW
             else:
-                document.status = db_m.DocumentStatus.COMPLETED
-            
-            self.db.commit()
+                final_status = db_m.DocumentStatus.COMPLETED
+            encoding = document.encoding
+            filename, dossier_id = document.filename, document.dossier_id
+            
+            async def save_classification(session: AsyncSession) -> Tuple[str, bool]:
+                # Une réanalyse remplace la classification précédente
+                classification = await session.scalar(
+                    select(db_m.Classification).where(db_m.Classification.document_id == document_id)
+                )
+                validation_removed = False
+                if classification is None:
+                    classification = db_m.Classification(document_id=document_id)
+                    session.add(classification)
+                elif classification.result != classification_result:
+                    # La validation portait sur l'ancien résultat : elle ne s'applique plus (ni aux voisins validés)
+                    removed = await session.execute(
+                        delete(db_m.HumanValidation).where(db_m.HumanValidation.classification_id == classification.id)
+                    )
+                    validation_removed = bool(removed.rowcount)
+                classification.result = classification_result
+                classification.justification = analysis_result.get("final_justification", "")
+                classification.confidence_score = float(analysis_result.get("final_confidence", 0.0))
+                classification.processing_time_ms = processing_time_ms
+                classification.model_version = settings.LLM_MODEL
+                classification.prompt_version = PROMPT_SET_VERSION
+                classification.decision_source = analysis_result.get("decision_source", validated_neighbors.DECISION_SOURCE_LLM)
+                
+                await session.execute(
+                    update(db_m.Document)
+                    .where(db_m.Document.id == document_id)
+                    .values(status=final_status, encoding=encoding)
+                )
+                await session.flush()
+                # Champs de décision promus, une ligne par critère et état complet compressé
+                await criterion_results.save_results(session, classification, analysis_result)
+                await search_index.index_document(
+                    session, document_id, dossier_id,
+                    search_index.fields_from_analysis(filename, content, analysis_result, classification.justification)
+                )
+                if signature is not None:
+                    await near_duplicates.index_signature(session, document_id, signature)
+                if vector is not None:
+                    await validated_neighbors.store_vector(session, document_id, vector)
+                
+                if final_status == db_m.DocumentStatus.NEEDS_REVIEW:
+                    await review_queue.upsert_entry(session, document_id, classification)
+                else:
+                    await review_queue.remove_entry(session, document_id)
+                await analytics.record_classification(
+                    session, classification_result, final_status == db_m.DocumentStatus.NEEDS_REVIEW,
+                    classification.confidence_score, processing_time_ms,
+                    criterion_durations_ms=analytics.criterion_durations(analysis_result),
+                    tokens_per_second=generation_rates
+                )
+                return classification.id, validation_removed
+            
+            # Classification, statut et file de révision sont validés dans la même transaction
+            classification_id, validation_removed = await write_queue.submit(save_classification)
+            if validation_removed:
+                logger.info(f"🧹 Validation humaine retirée, résultat modifié par la réanalyse: {document_id}")
+                validated_neighbors.validated_index.discard({document_id})
+            await get_cache().invalidate_document(document_id)
+            status_bus.publish_status(
+                document_id,
+                final_status.value,
+                classification_id=classification_id,
+                result=final_classification,
+                confidence=float(analysis_result.get("final_confidence", 0.0))
+            )
             
             logger.info(f"✅ Analyse terminée: {final_classification} (confiance: {analysis_result.get('final_confidence', 0):.1%})")
             
         except Exception as e:
-            # En cas d'erreur, marquer le document comme erreur
+            # En cas d'erreur, marquer le document comme erreur (et la compter dans les agrégats),
+            # ou de nouveau en attente si le job doit être retenté : le flux SSE reste alors ouvert
+            retry_in = pending_retry_delay()
+            error_status = db_m.DocumentStatus.ERROR if retry_in is None else db_m.DocumentStatus.PENDING
+            
+            async def mark_error(session: AsyncSession) -> int:
+                marked = await session.execute(
+                    update(db_m.Document).where(db_m.Document.id == document_id).values(status=error_status)
+                )
+                if marked.rowcount and retry_in is None:
+                    await analytics.record_error(session)
+                return marked.rowcount
+            
             try:
-                document = self.db.query(db_m.Document).filter(
-                    db_m.Document.id == document_id
-                ).first()
-                if document:
-                    document.status = db_m.DocumentStatus.ERROR
-                    self.db.commit()
+                if await write_queue.submit(mark_error):
+                    await get_cache().invalidate_document(document_id)
+                    retry = {} if retry_in is None else {"retry_in_seconds": retry_in}
+                    status_bus.publish_status(document_id, error_status.value, error=str(e), **retry)
             except:
                 pass
             
             logger.error(f"❌ Erreur lors de l'analyse: {e}")
             raise
     
-    def get_document_with_analysis(self, document_id: str) -> dict:
+    async def get_document_with_analysis(self, document_id: str) -> dict:
         """Récupère un document avec son analyse"""
         logger.info(f"📊 Récupération analyse: {document_id}")
         
         try:
             # Récupérer le document
-            document = self.db.query(db_m.Document).filter(
-                db_m.Document.id == document_id
-            ).first()
+            document = await self._get_document(document_id)
             
             if not document:
                 raise ValueError(f"Document non trouvé: {document_id}")
@@ -262,12 +709,17 @@ class DocumentService:
                 "status": document.status.value,
                 "file_size": document.file_size,
                 "content_type": document.content_type,
+                "encoding": document.encoding,
                 "classification": None
             }
             
-            # Ajouter la classification si elle existe
+            # Ajouter la classification si elle existe (colonnes promues : aucun parcours de l'état JSON)
             if document.classification:
                 classification = document.classification
+                criteria = (await self.db.execute(
+                    select(db_m.CriterionResult)
+                    .where(db_m.CriterionResult.classification_id == classification.id)
+                )).scalars().all()
                 result["classification"] = {
                     "id": classification.id,
                     "result": classification.result.value if classification.result else None,
@@ -275,14 +727,30 @@ class DocumentService:
                     "confidence_score": float(classification.confidence_score) if classification.confidence_score else 0.0,
                     "processing_time_ms": classification.processing_time_ms,
                     "model_version": classification.model_version,
+                    "prompt_version": classification.prompt_version,
+                    "decision_source": classification.decision_source,
                     "created_at": classification.created_at.isoformat(),
                     
                     # Ajouter les détails de l'analyse
-                    "final_classification": classification.analysis_steps.get("final_classification") if classification.analysis_steps else None,
-                    "final_justification": classification.analysis_steps.get("final_justification") if classification.analysis_steps else None,
-                    "final_confidence": classification.analysis_steps.get("final_confidence") if classification.analysis_steps else None,
-                    "is_review_required": classification.analysis_steps.get("is_review_required") if classification.analysis_steps else None,
-                    "analysis_summary": classification.analysis_steps.get("analysis_summary") if classification.analysis_steps else None
+                    "final_classification": classification.result.value if classification.result else None,
+                    "final_justification": classification.justification,
+                    "final_confidence": float(classification.confidence_score) if classification.confidence_score is not None else None,
+                    "is_review_required": classification.is_review_required,
+                    "analysis_summary": {
+                        "total_criteria": classification.total_criteria,
+                        "compliant_criteria": classification.compliant_criteria,
+                        "average_confidence": float(classification.average_confidence) if classification.average_confidence is not None else None
+                    },
+                    "criteria": [
+                        {
+                            "criterion": criterion.criterion,
+                            "is_compliant": criterion.is_compliant,
+                            "confidence": float(criterion.confidence) if criterion.confidence is not None else None,
+                            "duration_ms": criterion.duration_ms,
+                            "quote_verified": criterion.quote_verified
+                        }
+                        for criterion in criteria
+                    ]
                 }
             
             return result
@@ -291,14 +759,44 @@ class DocumentService:
             logger.error(f"❌ Erreur lors de la récupération: {e}")
             raise
     
-    def delete_document(self, document_id: str) -> bool:
+    async def list_documents(
+        self,
+        limit: int,
+        status: Optional[db_m.DocumentStatus] = None,
+        batch_id: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Page de documents (plus récents d'abord) et curseur de la page suivante"""
+        Document, Classification = db_m.Document, db_m.Classification
+        # Colonnes de la liste uniquement : ni objets ORM ni analysis_steps
+        query = select(
+            Document.id, Document.filename, Document.upload_date, Document.status,
+            Document.batch_id, Document.dossier_id, Classification.result, Classification.confidence_score,
+            cursor_key(Document.upload_date)
+        ).outerjoin(Classification, Classification.document_id == Document.id)
+        
+        if status is not None:
+            query = query.where(Document.status == status)
+        if batch_id:
+            query = query.where(Document.batch_id == batch_id)
+        
+        after = before_cursor(Document.upload_date, Document.id, cursor)
+        if after is not None:
+            query = query.where(after)
+        
+        rows = (await self.db.execute(
+            query.order_by(Document.upload_date.desc(), Document.id.desc()).limit(limit + 1)
+        )).all()
+        
+        rows, next_cursor = split_page(rows, limit, "id")
+        return [row._asdict() for row in rows], next_cursor
+    
+    async def delete_document(self, document_id: str) -> bool:
         """Supprime un document et son fichier"""
         logger.info(f"🗑️ Suppression document: {document_id}")
         
         try:
-            document = self.db.query(db_m.Document).filter(
-                db_m.Document.id == document_id
-            ).first()
+            document = await self._get_document(document_id)
             
             if not document:
                 return False
@@ -313,31 +811,71 @@ class DocumentService:
                 logger.warning(f"⚠️ Impossible de supprimer le fichier: {e}")
             
             # Supprimer de la base de données (cascade sur classification)
-            self.db.delete(document)
-            self.db.commit()
+            await search_index.remove_document(self.db, document_id)
+            await near_duplicates.remove_document(self.db, document_id)
+            await validated_neighbors.remove_document(self.db, document_id)
+            await self.db.delete(document)
+            await self.db.commit()
+            await get_cache().invalidate_document(document_id)
             
             logger.info(f"✅ Document supprimé: {document_id}")
             return True
             
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             logger.error(f"❌ Erreur lors de la suppression: {e}")
             return False
 
+# ===== FONCTIONS UTILITAIRES =====
+
+def _guess_content_type(filename: Optional[str]) -> str:
+    """Déduit le type MIME d'une entrée d'archive à partir de son extension"""
+    suffix = Path(filename).suffix.lower() if filename else ""
+    return {
+        ".pdf": "application/pdf",
+        ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        ".doc": "application/msword",
+    }.get(suffix, "text/plain")
+
 # ===== FONCTIONS UTILITAIRES POUR COMPATIBILITÉ =====
 
-async def receive_document(db: Session, file: UploadFile, user_id: str) -> db_m.Document:
+async def receive_document(db: AsyncSession, file: UploadFile, user_id: str) -> db_m.Document:
     """Fonction de compatibilité avec l'ancien code"""
     service = DocumentService(db)
     return await service.receive_document(file, user_id)
 
 async def process_document_analysis(document_id: str):
-    """Fonction de compatibilité avec l'ancien code"""
-    from app.database import SessionLocal
+    """Analyse un document ; les demandes concurrentes pour le même document partagent une seule analyse"""
+    from app.database import AsyncSessionLocal
+    
+    async def analyze() -> None:
+        async with AsyncSessionLocal() as db:
+            service = DocumentService(db)
+            await service.process_document_analysis(document_id)
     
-    db = SessionLocal()
-    try:
-        service = DocumentService(db)
-        await service.process_document_analysis(document_id)
-    finally:
-        db.close()
\ No newline at end of file
+    await _analysis_flights.run(document_id, analyze)
+
+async def receive_for_analysis(
+    db: AsyncSession, file: UploadFile, user_id: str, admit: Optional[Admit] = None
+) -> Tuple[db_m.Document, str]:
+    """Reçoit un document et décide de son analyse (voir DocumentService.receive_for_analysis)"""
+    service = DocumentService(db)
+    return await service.receive_for_analysis(file, user_id, admit)
+
+async def receive_batch(
+    db: AsyncSession, files: List[UploadFile], user_id: str, admit: Optional[Admit] = None
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """Reçoit un lot de fichiers pour ingestion groupée"""
+    service = DocumentService(db)
+    return await service.receive_batch(files, user_id, admit)
+
+async def list_documents(
+    db: AsyncSession,
+    limit: int,
+    status: Optional[db_m.DocumentStatus] = None,
+    batch_id: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Liste paginée des documents"""
+    service = DocumentService(db)
+    return await service.list_documents(limit, status, batch_id, cursor)
@@ -0,0 +1,167 @@
+# app/services/dossier_service.py
+import asyncio
+import logging
+from typing import List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models import database_models as db_m
+from app.services.attachment_classifier import classify_attachment
+from app.services.document_service import DocumentService
+from app.services.job_queue import JOB_KIND_DOSSIER, get_job_queue, pending_retry_delay
+from app.services.write_queue import write_queue
+
+logger = logging.getLogger(__name__)
+
+class DossierService:
+    """Service pour l'analyse d'un recours et de ses pièces jointes comme un tout"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.document_service = DocumentService(db)
+
+    async def create_dossier(
+        self,
+        main_document_id: str,
+        attachment_ids: List[str],
+        user_id: str,
+        reference: Optional[str] = None
+    ) -> db_m.Dossier:
+        """Regroupe un courrier principal et ses pièces jointes dans un dossier et met son analyse en file"""
+        logger.info(f"🗂️ Création du dossier: {main_document_id} + {len(attachment_ids)} pièce(s)")
+
+        member_ids = [main_document_id] + [doc_id for doc_id in attachment_ids if doc_id != main_document_id]
+        documents = (await self.db.execute(
+            select(db_m.Document).where(db_m.Document.id.in_(member_ids))
+        )).scalars().all()
+
+        missing = set(member_ids) - {doc.id for doc in documents}
+        if missing:
+            raise ValueError(f"Document(s) non trouvé(s): {', '.join(sorted(missing))}")
+
+        try:
+            dossier = db_m.Dossier(reference=reference, created_by_id=user_id, status=db_m.DocumentStatus.PENDING)
+            self.db.add(dossier)
+            await self.db.flush()
+
+            for document in documents:
+                document.dossier_id = dossier.id
+                document.dossier_role = "main" if document.id == main_document_id else "attachment"
+
+            # Analyse mise en file dans la même transaction que le dossier quand la file est en base
+            queue = get_job_queue()
+            jobs = [(JOB_KIND_DOSSIER, dossier.id)]
+            staged = queue.stage_many(self.db, jobs)
+            await self.db.commit()
+            if not staged:
+                await queue.enqueue_many(jobs)
+            # Rechargement avec les membres, sérialisés par la réponse
+            dossier = await self.get_dossier(dossier.id)
+
+            logger.info(f"✅ Dossier créé: {dossier.id}")
+            return dossier
+
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"❌ Erreur lors de la création du dossier: {e}")
+            raise
+
+    async def _update_dossier(self, dossier_id: str, **values) -> None:
+        """Met à jour un dossier via l'écrivain unique"""
+        async def operation(session: AsyncSession) -> None:
+            await session.execute(update(db_m.Dossier).where(db_m.Dossier.id == dossier_id).values(**values))
+        await write_queue.submit(operation)
+
+    async def get_dossier(self, dossier_id: str) -> Optional[db_m.Dossier]:
+        """Charge un dossier avec ses documents"""
+        result = await self.db.execute(
+            select(db_m.Dossier)
+            .options(selectinload(db_m.Dossier.documents))
+            .where(db_m.Dossier.id == dossier_id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().first()
+
+    async def process_dossier_analysis(self, dossier_id: str) -> None:
+        """Analyse un dossier : extraction parallèle, typage local des pièces, LLM sur le seul courrier"""
+        logger.info(f"🗂️ Début de l'analyse du dossier: {dossier_id}")
+
+        dossier = await self.get_dossier(dossier_id)
+        if not dossier:
+            raise ValueError(f"Dossier non trouvé: {dossier_id}")
+
+        main_document = next((doc for doc in dossier.documents if doc.dossier_role == "main"), None)
+        if main_document is None:
+            raise ValueError(f"Dossier sans courrier principal: {dossier_id}")
+        attachments = [doc for doc in dossier.documents if doc.dossier_role == "attachment"]
+
+        try:
+            await self._update_dossier(dossier_id, status=db_m.DocumentStatus.PROCESSING)
+
+            # Extraction de tous les membres en parallèle (texte en cache, sinon lu et décodé hors boucle)
+            members = [main_document] + attachments
+            contents = await asyncio.gather(
+                *(self.document_service.get_document_text(doc) for doc in members),
+                return_exceptions=True
+            )
+            main_content = contents[0]
+            if isinstance(main_content, Exception):
+                raise main_content
+
+            # Typage des pièces jointes sans appel au LLM
+            inventory = []
+            updates = []
+            for document, content in zip(attachments, contents[1:]):
+                if isinstance(content, Exception):
+                    logger.warning(f"⚠️ Pièce illisible {document.filename}: {content}")
+                    attachment_type, confidence = "illisible", 0.0
+                    attachment_status = db_m.DocumentStatus.ERROR
+                else:
+                    attachment_type, confidence = classify_attachment(content, document.filename)
+                    attachment_status = db_m.DocumentStatus.COMPLETED
+                updates.append(self.document_service.update_document(
+                    document.id,
+                    status=attachment_status,
+                    attachment_type=attachment_type,
+                    encoding=document.encoding
+                ))
+                inventory.append({
+                    "document_id": document.id,
+                    "filename": document.filename,
+                    "attachment_type": attachment_type,
+                    "confidence": confidence,
+                })
+            # Soumises ensemble : les mises à jour des pièces partagent un même commit
+            await asyncio.gather(*updates)
+
+            logger.info(f"📎 Inventaire des pièces: {[piece['attachment_type'] for piece in inventory]}")
+
+            # Les étapes LLM coûteuses ne portent que sur le courrier principal, réanalysé
+            # avec l'inventaire même s'il a déjà été classé seul à son upload
+            await self.document_service.process_document_analysis(
+                main_document.id, content=main_content, attachments_inventory=inventory, force=True
+            )
+
+            await self.db.refresh(main_document)
+            await self._update_dossier(dossier_id, status=main_document.status)
+
+            logger.info(f"✅ Analyse du dossier terminée: {dossier_id} ({main_document.status.value})")
+
+        except Exception as e:
+            # Échec qui sera retenté par la file : le dossier reste en attente
+            failed_status = db_m.DocumentStatus.ERROR if pending_retry_delay() is None else db_m.DocumentStatus.PENDING
+            await self._update_dossier(dossier_id, status=failed_status)
+            logger.error(f"❌ Erreur lors de l'analyse du dossier: {e}")
+            raise
+
+# ===== FONCTIONS UTILITAIRES =====
+
+async def process_dossier_analysis(dossier_id: str):
+    """Point d'entrée des tâches d'arrière-plan pour l'analyse d'un dossier"""
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        service = DossierService(db)
+        await service.process_dossier_analysis(dossier_id)
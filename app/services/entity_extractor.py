@@ -0,0 +1,299 @@
+# app/services/entity_extractor.py
+"""
+Pré-extraction locale des entités (spaCy + règles), le LLM ne complétant que
+les champs non résolus.
+
+Les recours CSPE suivent presque tous la même trame : lieu et date en
+en-tête, ligne « Objet : », décision contestée « du 12 mars 2023 », montant
+en euros, autorité (CRE, ministre). Des règles `Matcher` / `PhraseMatcher`,
+compilées une fois sur le vocabulaire du modèle, et les entités nommées de
+spaCy résolvent ces champs localement, chacun avec sa confiance : une valeur
+ancrée par son contexte et unique est sûre, plusieurs valeurs concurrentes
+ou sans contexte ne le sont pas.
+
+Seuls les champs sous ENTITY_LOCAL_MIN_CONFIDENCE sont demandés au LLM,
+avec un prompt limité à ces champs ; un courrier bien formé ne déclenche
+aucun appel d'extraction.
+"""
+import asyncio
+import logging
+import re
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.nlp_service import PIPES_ENTITIES, nlp_service
+from app.services.ollama_service import ENTITY_FIELDS, ollama_service
+
+logger = logging.getLogger(__name__)
+
+# Début du courrier examiné : en-tête, objet et exposé des faits
+ENTITY_SAMPLE_CHARS = 5000
+
+# Confiance d'une valeur ancrée par son contexte et unique, de plusieurs valeurs
+# ancrées concurrentes, d'une valeur unique trouvée sans contexte
+CONFIDENCE_ANCHORED = 0.9
+CONFIDENCE_CONFLICT = 0.5
+CONFIDENCE_UNANCHORED = 0.6
+
+# Origine de chaque champ extrait
+SOURCE_LOCAL = "local"
+SOURCE_LLM = "llm"
+
+MONTHS = {
+    "janvier": 1, "février": 2, "fevrier": 2, "mars": 3, "avril": 4, "mai": 5, "juin": 6,
+    "juillet": 7, "août": 8, "aout": 8, "septembre": 9, "octobre": 10, "novembre": 11,
+    "décembre": 12, "decembre": 12,
+}
+
+# Autorités dont émane la décision contestée (libellé retenu -> formulations)
+AUTHORITIES: Dict[str, List[str]] = {
+    "Commission de régulation de l'énergie (CRE)": [
+        "commission de régulation de l'énergie", "commission de regulation de l'energie", "CRE",
+    ],
+    "Ministre chargé de l'énergie": [
+        "ministre chargé de l'énergie", "ministre de la transition écologique",
+        "ministère de la transition écologique", "ministre de l'économie",
+    ],
+}
+
+# Juridictions saisies : reconnues pour ne pas être prises pour l'autorité
+JURISDICTIONS = ["conseil d'état", "conseil d'etat", "tribunal administratif", "cour administrative d'appel"]
+
+# Types de décision, du plus au moins spécifique (libellé retenu -> formulations)
+DECISION_TYPES: Dict[str, List[str]] = {
+    "décision implicite de rejet": ["décision implicite de rejet", "rejet implicite", "silence gardé"],
+    "décision de rejet": ["décision de rejet", "refus de remboursement", "rejet de la demande", "rejet de sa demande"],
+    "titre de perception": ["titre de perception"],
+    "délibération": ["délibération", "deliberation"],
+}
+
+_DATE_NUMERIC = re.compile(r"^(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})$")
+
+# Contexte précédant une date : décision contestée, ou en-tête « Paris, le »
+_DECISION_DATE_CONTEXT = re.compile(
+    r"\b(?:d[ée]cision|d[ée]lib[ée]ration|titre|courrier|lettre|notifi\w*)\b[^.\n]{0,60}?\b(?:du|en date du|le)\s*$",
+    re.IGNORECASE,
+)
+_RECOURS_DATE_CONTEXT = re.compile(r"(?:^|\n)\s*(?:[Ff]ait\s+)?(?:à\s+)?[A-ZÀ-Ý][\w\-' ]{1,40},?\s+le\s*$")
+
+_AMOUNT_CONTEXT = re.compile(
+    r"\b(?:montant|somme|rembours\w*|restitution|r[ée]clam\w*|contest\w*|cspe)\b[^.\n]{0,80}$",
+    re.IGNORECASE,
+)
+_APPLICANT_CONTEXT = re.compile(
+    r"\b(?:soussign[ée]e?s?|pour le compte de|au nom de|requ[ée]rante?|demandeu(?:r|se)|soci[ée]t[ée])"
+    r"\s*,?\s*(?:M\.|Mme|Madame|Monsieur|la soci[ée]t[ée])?\s*$",
+    re.IGNORECASE,
+)
+
+# Longueur maximale de l'objet repris de la ligne « Objet : »
+MAX_OBJECT_CHARS = 300
+
+def normalize_date(text: str) -> Optional[str]:
+    """Date au format DD/MM/YYYY (« 1er mars 2023 », « 01/03/2023 »), None si invalide"""
+    numeric = _DATE_NUMERIC.match(text.strip())
+    if numeric:
+        day, month, year = (int(part) for part in numeric.groups())
+    else:
+        parts = text.lower().split()
+        if len(parts) != 3 or parts[1] not in MONTHS:
+            return None
+        day = 1 if parts[0] == "1er" else int(parts[0]) if parts[0].isdigit() else 0
+        month, year = MONTHS[parts[1]], int(parts[2]) if parts[2].isdigit() else 0
+    try:
+        return date(year, month, day).strftime("%d/%m/%Y")
+    except ValueError:
+        return None
+
+def parse_amount(text: str) -> Optional[float]:
+    """Valeur d'un montant écrit à la française (« 1 234,56 € »), None si illisible"""
+    digits = re.sub(r"[^\d.,]", "", text)
+    if "," in digits:
+        digits = digits.replace(".", "").replace(",", ".")
+    elif digits.count(".") > 1 or re.search(r"\.\d{3}$", digits):
+        # Points séparateurs de milliers (« 1.500 € ») : un point suivi de deux chiffres reste décimal
+        digits = digits.replace(".", "")
+    try:
+        return float(digits)
+    except ValueError:
+        return None
+
+def _resolve(anchored: List[str], unanchored: List[str] = ()) -> Tuple[Optional[str], float]:
+    """Valeur retenue et confiance, selon l'unicité des valeurs ancrées puis non ancrées"""
+    if anchored:
+        distinct = list(dict.fromkeys(anchored))
+        return distinct[0], CONFIDENCE_ANCHORED if len(distinct) == 1 else CONFIDENCE_CONFLICT
+    distinct = list(dict.fromkeys(unanchored))
+    if len(distinct) == 1:
+        return distinct[0], CONFIDENCE_UNANCHORED
+    return None, 0.0
+
+class LocalEntityExtractor:
+    """Règles spaCy compilées une fois sur le vocabulaire du modèle chargé"""
+
+    def __init__(self):
+        self._matcher = None
+        self._phrases = None
+        self._labels: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _build(self, nlp) -> None:
+        from spacy.matcher import Matcher, PhraseMatcher
+
+        matcher = Matcher(nlp.vocab)
+        day = {"TEXT": {"REGEX": r"^(1er|\d{1,2})$"}}
+        year = {"TEXT": {"REGEX": r"^\d{4}$"}}
+        number = {"TEXT": {"REGEX": r"^\d[\d.,]*$"}}
+        matcher.add("DATE", [
+            [day, {"LOWER": {"IN": list(MONTHS)}}, year],
+            [{"TEXT": {"REGEX": _DATE_NUMERIC.pattern}}],
+        ])
+        matcher.add("AMOUNT", [
+            [number, {"TEXT": {"REGEX": r"^(\d[\d.,]*|\s+)$"}, "OP": "*"}, {"LOWER": {"IN": ["€", "euro", "euros", "eur"]}}],
+        ], greedy="LONGEST")
+        matcher.add("SIREN", [
+            [{"LOWER": {"IN": ["siren", "siret"]}}, {"ORTH": ":", "OP": "?"}, {"TEXT": {"REGEX": r"^\d+$"}, "OP": "+"}],
+        ], greedy="LONGEST")
+        matcher.add("OBJECT", [[{"LOWER": "objet"}, {"ORTH": ":"}]])
+
+        phrases = PhraseMatcher(nlp.vocab, attr="LOWER")
+        labels = {}
+        for group, entries in (("AUTHORITY", AUTHORITIES), ("DECISION_TYPE", DECISION_TYPES)):
+            for label, variants in entries.items():
+                key = f"{group}:{label}"
+                phrases.add(key, [nlp.make_doc(variant) for variant in variants])
+                labels[key] = label
+        phrases.add("JURISDICTION", [nlp.make_doc(variant) for variant in JURISDICTIONS])
+
+        self._matcher, self._phrases, self._labels = matcher, phrases, labels
+
+    def _rules(self):
+        if self._matcher is None:
+            with self._lock:
+                if self._matcher is None:
+                    self._build(nlp_service.nlp)
+        return self._matcher, self._phrases
+
+    def extract(self, text: str) -> Tuple[Dict[str, Optional[str]], Dict[str, float]]:
+        """Champs de ENTITY_FIELDS (et SIREN) trouvés localement, et confiance de chacun"""
+        matcher, phrases = self._rules()
+        doc = nlp_service.parse(text[:ENTITY_SAMPLE_CHARS], PIPES_ENTITIES)
+
+        def prefix(span, width: int = 100) -> str:
+            return doc.text[max(0, span.start_char - width):span.start_char]
+
+        dates = {"date_decision": [], "date_recours": []}
+        amounts, amounts_anchored, sirens, objects = [], [], [], []
+        for match_id, start, end in matcher(doc):
+            span, rule = doc[start:end], doc.vocab.strings[match_id]
+            if rule == "DATE":
+                value = normalize_date(span.text)
+                if value is None:
+                    continue
+                if _DECISION_DATE_CONTEXT.search(prefix(span)):
+                    dates["date_decision"].append(value)
+                elif _RECOURS_DATE_CONTEXT.search(prefix(span)):
+                    dates["date_recours"].append(value)
+            elif rule == "AMOUNT":
+                value = " ".join(span.text.split())
+                amounts.append((parse_amount(value), value))
+                if _AMOUNT_CONTEXT.search(prefix(span)):
+                    amounts_anchored.append((parse_amount(value), value))
+            elif rule == "SIREN":
+                digits = "".join(token.text for token in span if token.text.isdigit())
+                if len(digits) in (9, 14):
+                    sirens.append(digits[:9])
+            elif rule == "OBJECT":
+                line = doc.text[span.end_char:].split("\n", 1)[0].strip()
+                if len(line) >= 10:
+                    objects.append(line[:MAX_OBJECT_CHARS])
+
+        authorities, decision_types = [], []
+        for match_id, start, end in phrases(doc):
+            key = doc.vocab.strings[match_id]
+            if key.startswith("AUTHORITY:"):
+                authorities.append(self._labels[key])
+            elif key.startswith("DECISION_TYPE:"):
+                decision_types.append(self._labels[key])
+
+        applicants = [
+            ent.text for ent in doc.ents
+            if ent.label_ in ("PER", "ORG") and _APPLICANT_CONTEXT.search(prefix(ent, 60))
+        ]
+
+        resolved = {
+            "date_decision": _resolve(dates["date_decision"]),
+            "date_recours": _resolve(dates["date_recours"]),
+            "demandeur": _resolve(applicants),
+            "objet_recours": _resolve(objects[:1]),
+            "autorite_competente": _resolve(authorities),
+            "siren": _resolve(sirens),
+        }
+        # Montants : comparés par valeur (« 1 500 € » et « 1500 euros » concordent)
+        amount, confidence = _resolve(
+            [value for value, _ in amounts_anchored if value is not None],
+            [value for value, _ in amounts if value is not None],
+        )
+        written = {value: text for value, text in amounts}
+        resolved["montant_conteste"] = (written[amount] if amount is not None else None, confidence)
+        # Types : le plus spécifique l'emporte s'il n'est concurrencé que par des types plus généraux
+        if decision_types:
+            ranked = sorted(set(decision_types), key=list(DECISION_TYPES).index)
+            general = {"décision de rejet"} if ranked[0] == "décision implicite de rejet" else set()
+            unique = not set(ranked[1:]) - general
+            resolved["type_decision"] = (ranked[0], CONFIDENCE_ANCHORED if unique else CONFIDENCE_CONFLICT)
+        else:
+            resolved["type_decision"] = (None, 0.0)
+
+        entities = {field: value for field, (value, _) in resolved.items()}
+        confidence = {field: score for field, (value, score) in resolved.items() if value is not None}
+        return entities, confidence
+
+# Instance unique (règles compilées au premier usage)
+local_extractor = LocalEntityExtractor()
+
+# Modèle spaCy absent : extraction entièrement confiée au LLM pour la vie du processus
+_local_unavailable = False
+
+async def extract_entities(document_content: str) -> Dict[str, Any]:
+    """Entités du courrier : règles locales d'abord, LLM pour les seuls champs non résolus
+
+    Retourne les champs de ENTITY_FIELDS et `siren`, plus `field_confidence`
+    (champs résolus localement) et `field_sources` ; `error` si l'appel LLM a échoué.
+    """
+    global _local_unavailable
+    local: Dict[str, Optional[str]] = {}
+    confidence: Dict[str, float] = {}
+    if settings.ENTITY_LOCAL_ENABLED and not _local_unavailable:
+        try:
+            local, confidence = await asyncio.to_thread(local_extractor.extract, document_content)
+        except (ImportError, OSError) as e:
+            logger.warning(f"⚠️ Modèle spaCy indisponible, extraction d'entités confiée au LLM: {e}")
+            _local_unavailable = True
+        except Exception as e:
+            logger.warning(f"⚠️ Pré-extraction locale impossible, extraction confiée au LLM: {e}")
+
+    resolved = {
+        field: local[field] for field in ENTITY_FIELDS
+        if local.get(field) is not None and confidence.get(field, 0.0) >= settings.ENTITY_LOCAL_MIN_CONFIDENCE
+    }
+    missing = [field for field in ENTITY_FIELDS if field not in resolved]
+    result: Dict[str, Any] = {**dict.fromkeys(ENTITY_FIELDS), **resolved, "siren": local.get("siren")}
+    sources = dict.fromkeys(resolved, SOURCE_LOCAL)
+
+    if missing:
+        logger.info(f"📡 Champs demandés au LLM: {missing} ({len(resolved)} résolu(s) localement)")
+        extracted = await ollama_service.extract_entities_with_llm(document_content, fields=missing)
+        if "error" in extracted:
+            result["error"] = extracted["error"]
+        for field in missing:
+            result[field] = extracted.get(field)
+            sources[field] = SOURCE_LLM
+    else:
+        logger.info("⚡ Entités résolues localement, extraction LLM évitée")
+
+    result["field_confidence"] = {field: confidence[field] for field in resolved}
+    result["field_sources"] = sources
+    return result
@@ -0,0 +1,523 @@
+# app/services/job_queue.py
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import database_models as db_m
+from app.models.enums import JobStatus
+
+logger = logging.getLogger(__name__)
+
+# Types de jobs pris en charge par les workers
+JOB_KIND_DOCUMENT = "document"
+JOB_KIND_DOSSIER = "dossier"
+
+# Plafond du délai entre deux tentatives
+MAX_RETRY_DELAY_SECONDS = 3600
+
+@dataclass
+class Job:
+    """Job réservé par un worker"""
+    id: str
+    kind: str
+    target_id: str
+    attempts: int
+    max_attempts: int
+    token: str  # propre à cette réservation : un worker dont la réservation a expiré ne peut plus agir sur le job
+
+def retry_delay(attempts: int) -> int:
+    """Délai avant la prochaine tentative (backoff exponentiel)"""
+    return min(settings.JOB_RETRY_BACKOFF * 2 ** max(attempts - 1, 0), MAX_RETRY_DELAY_SECONDS)
+
+# Job exécuté par la tâche courante (voir running_job)
+_current_job: ContextVar[Optional[Job]] = ContextVar("current_job", default=None)
+
+@contextmanager
+def running_job(job: Job) -> Iterator[None]:
+    """Rend le job visible du traitement qu'il lance (tâches filles comprises)"""
+    token = _current_job.set(job)
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+def pending_retry_delay() -> Optional[int]:
+    """Délai avant la nouvelle tentative si l'échec du job en cours sera retenté, None sinon (dernière tentative, hors worker)"""
+    job = _current_job.get()
+    if job is None or job.attempts >= job.max_attempts:
+        return None
+    return retry_delay(job.attempts)
+
+class JobQueue(ABC):
+    """Interface commune des files d'attente d'analyses persistantes
+
+    heartbeat, complete et fail n'agissent que si la réservation du job est
+    toujours celle de `job.token` ; ils retournent False sinon (réservation
+    expirée puis reprise par un autre worker).
+    """
+
+    async def enqueue(self, kind: str, target_id: str, delay_seconds: int = 0) -> str:
+        """Ajoute un job et retourne son identifiant"""
+        job_ids = await self.enqueue_many([(kind, target_id)], delay_seconds)
+        return job_ids[0]
+
+    @abstractmethod
+    async def enqueue_many(self, items: List[Tuple[str, str]], delay_seconds: int = 0) -> List[str]:
+        """Ajoute plusieurs jobs en une seule opération"""
+
+    def stage_many(self, session: AsyncSession, items: List[Tuple[str, str]], delay_seconds: int = 0) -> bool:
+        """Ajoute les jobs à la transaction de `session`, validés ou annulés avec elle
+
+        Retourne False si le backend est hors de la base : l'appelant met alors
+        les jobs en file après son commit (enqueue_many) ; un arrêt entre les deux
+        est rattrapé par requeue_orphans.
+        """
+        return False
+
+    @abstractmethod
+    async def live_targets(self) -> Set[Tuple[str, str]]:
+        """Cibles (type, identifiant) des jobs en attente ou en cours"""
+
+    @abstractmethod
+    async def claim(self, worker_id: str) -> Optional[Job]:
+        """Réserve le prochain job disponible pour la durée de visibilité"""
+
+    @abstractmethod
+    async def heartbeat(self, job: Job) -> bool:
+        """Prolonge la réservation d'un job en cours"""
+
+    @abstractmethod
+    async def complete(self, job: Job) -> bool:
+        """Acquitte un job terminé"""
+
+    @abstractmethod
+    async def fail(self, job: Job, error: str) -> bool:
+        """Replanifie un job en échec, ou l'envoie en lettre morte après la dernière tentative"""
+
+    @abstractmethod
+    async def depth(self) -> Dict[str, int]:
+        """Nombre de jobs en attente, en cours et en lettre morte"""
+
+    @abstractmethod
+    async def purge_completed(self, older_than: timedelta) -> int:
+        """Supprime les jobs terminés depuis plus de `older_than` ; retourne leur nombre"""
+
+# ===== BACKEND BASE DE DONNÉES (SQLite / PostgreSQL) =====
+
+class DatabaseJobQueue(JobQueue):
+    """File d'attente stockée dans la table analysis_jobs"""
+
+    def _new_jobs(self, items: List[Tuple[str, str]], delay_seconds: int) -> List[db_m.AnalysisJob]:
+        available_at = datetime.utcnow() + timedelta(seconds=delay_seconds)
+        return [
+            db_m.AnalysisJob(
+                id=str(uuid.uuid4()),
+                kind=kind,
+                target_id=target_id,
+                status=JobStatus.PENDING,
+                attempts=0,
+                max_attempts=settings.JOB_MAX_ATTEMPTS,
+                available_at=available_at
+            )
+            for kind, target_id in items
+        ]
+
+    async def enqueue_many(self, items: List[Tuple[str, str]], delay_seconds: int = 0) -> List[str]:
+        jobs = self._new_jobs(items, delay_seconds)
+        async with AsyncSessionLocal() as db:
+            db.add_all(jobs)
+            await db.commit()
+        logger.info(f"📥 {len(jobs)} job(s) ajouté(s) à la file")
+        return [job.id for job in jobs]
+
+    def stage_many(self, session: AsyncSession, items: List[Tuple[str, str]], delay_seconds: int = 0) -> bool:
+        session.add_all(self._new_jobs(items, delay_seconds))
+        return True
+
+    async def live_targets(self) -> Set[Tuple[str, str]]:
+        AnalysisJob = db_m.AnalysisJob
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(AnalysisJob.kind, AnalysisJob.target_id)
+                .where(AnalysisJob.status.in_([JobStatus.PENDING, JobStatus.RUNNING]))
+            )).all()
+        return {(kind, target_id) for kind, target_id in rows}
+
+    async def claim(self, worker_id: str) -> Optional[Job]:
+        AnalysisJob = db_m.AnalysisJob
+        now = datetime.utcnow()
+        claimable = or_(
+            and_(AnalysisJob.status == JobStatus.PENDING, AnalysisJob.available_at <= now),
+            # Réservation expirée : le worker a disparu sans acquitter
+            and_(AnalysisJob.status == JobStatus.RUNNING, AnalysisJob.locked_until < now),
+        )
+
+        async with AsyncSessionLocal() as db:
+            # Quelques essais : un autre worker peut réserver le même candidat entre-temps
+            for _ in range(5):
+                candidate = (await db.execute(
+                    select(AnalysisJob.id, AnalysisJob.kind, AnalysisJob.target_id, AnalysisJob.status, AnalysisJob.attempts, AnalysisJob.max_attempts)
+                    .where(claimable)
+                    .order_by(AnalysisJob.available_at)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                )).first()
+
+                if candidate is None:
+                    await db.rollback()
+                    return None
+
+                if candidate.status == JobStatus.RUNNING and candidate.attempts >= candidate.max_attempts:
+                    await db.execute(
+                        update(AnalysisJob)
+                        .where(AnalysisJob.id == candidate.id, claimable)
+                        .values(status=JobStatus.DEAD, locked_until=None, claim_token=None,
+                                last_error="Délai de visibilité expiré lors de la dernière tentative")
+                    )
+                    await db.commit()
+                    logger.warning(f"☠️ Job {candidate.id} envoyé en lettre morte (réservation expirée)")
+                    continue
+
+                # Réservation optimiste : ne réussit que si le job est toujours réservable
+                token = str(uuid.uuid4())
+                result = await db.execute(
+                    update(AnalysisJob)
+                    .where(AnalysisJob.id == candidate.id, claimable)
+                    .values(
+                        status=JobStatus.RUNNING,
+                        attempts=AnalysisJob.attempts + 1,
+                        locked_by=worker_id,
+                        claim_token=token,
+                        locked_until=now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT)
+                    )
+                )
+                await db.commit()
+
+                if result.rowcount == 1:
+                    return Job(
+                        id=candidate.id,
+                        kind=candidate.kind,
+                        target_id=candidate.target_id,
+                        attempts=candidate.attempts + 1,
+                        max_attempts=candidate.max_attempts,
+                        token=token
+                    )
+        return None
+
+    async def heartbeat(self, job: Job) -> bool:
+        return await self._update(
+            job, locked_until=datetime.utcnow() + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT)
+        )
+
+    async def complete(self, job: Job) -> bool:
+        return await self._update(job, status=JobStatus.COMPLETED, locked_until=None, claim_token=None)
+
+    async def fail(self, job: Job, error: str) -> bool:
+        if job.attempts >= job.max_attempts:
+            logger.warning(f"☠️ Job {job.id} envoyé en lettre morte après {job.attempts} tentative(s)")
+            return await self._update(job, status=JobStatus.DEAD, locked_until=None, claim_token=None, last_error=error)
+
+        delay = retry_delay(job.attempts)
+        logger.info(f"🔁 Job {job.id} replanifié dans {delay}s (tentative {job.attempts}/{job.max_attempts})")
+        return await self._update(
+            job,
+            status=JobStatus.PENDING,
+            locked_until=None,
+            claim_token=None,
+            available_at=datetime.utcnow() + timedelta(seconds=delay),
+            last_error=error
+        )
+
+    async def _update(self, job: Job, **values) -> bool:
+        """Met à jour le job si sa réservation est toujours celle de ce worker"""
+        AnalysisJob = db_m.AnalysisJob
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(AnalysisJob)
+                .where(
+                    AnalysisJob.id == job.id,
+                    AnalysisJob.status == JobStatus.RUNNING,
+                    AnalysisJob.claim_token == job.token
+                )
+                .values(**values)
+            )
+            await db.commit()
+        if result.rowcount != 1:
+            logger.warning(f"⚠️ Réservation du job {job.id} perdue (expirée puis reprise) : mise à jour ignorée")
+            return False
+        return True
+
+    async def purge_completed(self, older_than: timedelta) -> int:
+        AnalysisJob = db_m.AnalysisJob
+        cutoff = datetime.utcnow() - older_than
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(AnalysisJob).where(
+                    AnalysisJob.status == JobStatus.COMPLETED,
+                    func.coalesce(AnalysisJob.updated_at, AnalysisJob.created_at) < cutoff
+                )
+            )
+            await db.commit()
+        return result.rowcount
+
+    async def depth(self) -> Dict[str, int]:
+        async with AsyncSessionLocal() as db:
+            counts = dict((await db.execute(
+                select(db_m.AnalysisJob.status, func.count(db_m.AnalysisJob.id))
+                .where(db_m.AnalysisJob.status != JobStatus.COMPLETED)
+                .group_by(db_m.AnalysisJob.status)
+            )).all())
+        return {
+            "pending": counts.get(JobStatus.PENDING, 0),
+            "running": counts.get(JobStatus.RUNNING, 0),
+            "dead": counts.get(JobStatus.DEAD, 0),
+        }
+
+# ===== BACKEND REDIS =====
+
+# Réservation atomique : remet en file les jobs expirés puis réserve le plus ancien disponible
+# (le jeton de réservation est retiré des jobs expirés et remplacé à chaque réservation)
+_REDIS_CLAIM_SCRIPT = """
+local now = tonumber(ARGV[1])
+local deadline = tonumber(ARGV[2])
+local prefix = ARGV[3]
+
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], id)
+    local key = prefix .. id
+    redis.call('HDEL', key, 'token')
+    local attempts = tonumber(redis.call('HGET', key, 'attempts') or '0')
+    local max_attempts = tonumber(redis.call('HGET', key, 'max_attempts') or '1')
+    if attempts >= max_attempts then
+        redis.call('HSET', key, 'last_error', 'Délai de visibilité expiré lors de la dernière tentative')
+        redis.call('LPUSH', KEYS[3], id)
+    else
+        redis.call('ZADD', KEYS[1], now, id)
+    end
+end
+
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, 1)
+if #ids == 0 then
+    return false
+end
+
+local id = ids[1]
+local key = prefix .. id
+redis.call('ZREM', KEYS[1], id)
+redis.call('ZADD', KEYS[2], deadline, id)
+redis.call('HSET', key, 'token', ARGV[4])
+local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+return {id, redis.call('HGET', key, 'kind'), redis.call('HGET', key, 'target_id'), attempts, redis.call('HGET', key, 'max_attempts')}
+"""
+
+# Les scripts suivants n'agissent que si le jeton de réservation est toujours celui du worker
+# KEYS : inflight, job ; ARGV : id, jeton, échéance
+_REDIS_HEARTBEAT_SCRIPT = """
+if redis.call('HGET', KEYS[2], 'token') ~= ARGV[2] then
+    return 0
+end
+redis.call('ZADD', KEYS[1], 'XX', ARGV[3], ARGV[1])
+return 1
+"""
+
+# KEYS : inflight, job ; ARGV : id, jeton
+_REDIS_COMPLETE_SCRIPT = """
+if redis.call('HGET', KEYS[2], 'token') ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('DEL', KEYS[2])
+return 1
+"""
+
+# KEYS : inflight, job, queue, dead ; ARGV : id, jeton, erreur, "dead" ou date de nouvelle tentative
+_REDIS_FAIL_SCRIPT = """
+if redis.call('HGET', KEYS[2], 'token') ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], 'token')
+redis.call('HSET', KEYS[2], 'last_error', ARGV[3])
+if ARGV[4] == 'dead' then
+    redis.call('LPUSH', KEYS[4], ARGV[1])
+else
+    redis.call('ZADD', KEYS[3], tonumber(ARGV[4]), ARGV[1])
+end
+return 1
+"""
+
+class RedisJobQueue(JobQueue):
+    """File d'attente Redis : sorted sets pour la file et les réservations, liste pour les lettres mortes"""
+
+    def __init__(self, host: str, port: int, prefix: str = "sacdj:jobs"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise ImportError("redis requis pour JOB_QUEUE_BACKEND=redis (pip install redis)")
+
+        self.redis = redis.Redis(host=host, port=port or 6379, decode_responses=True)
+        self.queue_key = f"{prefix}:queue"
+        self.inflight_key = f"{prefix}:inflight"
+        self.dead_key = f"{prefix}:dead"
+        self.job_prefix = f"{prefix}:job:"
+        self._claim_script = self.redis.register_script(_REDIS_CLAIM_SCRIPT)
+        self._heartbeat_script = self.redis.register_script(_REDIS_HEARTBEAT_SCRIPT)
+        self._complete_script = self.redis.register_script(_REDIS_COMPLETE_SCRIPT)
+        self._fail_script = self.redis.register_script(_REDIS_FAIL_SCRIPT)
+
+    async def enqueue_many(self, items: List[Tuple[str, str]], delay_seconds: int = 0) -> List[str]:
+        available_at = time.time() + delay_seconds
+        job_ids = []
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for kind, target_id in items:
+                job_id = str(uuid.uuid4())
+                job_ids.append(job_id)
+                pipe.hset(self.job_prefix + job_id, mapping={
+                    "kind": kind,
+                    "target_id": target_id,
+                    "attempts": 0,
+                    "max_attempts": settings.JOB_MAX_ATTEMPTS,
+                })
+                pipe.zadd(self.queue_key, {job_id: available_at})
+            await pipe.execute()
+        logger.info(f"📥 {len(job_ids)} job(s) ajouté(s) à la file Redis")
+        return job_ids
+
+    async def live_targets(self) -> Set[Tuple[str, str]]:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrange(self.queue_key, 0, -1)
+            pipe.zrange(self.inflight_key, 0, -1)
+            queued, inflight = await pipe.execute()
+        job_ids = queued + inflight
+        if not job_ids:
+            return set()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for job_id in job_ids:
+                pipe.hmget(self.job_prefix + job_id, "kind", "target_id")
+            targets = await pipe.execute()
+        return {(kind, target_id) for kind, target_id in targets if kind and target_id}
+
+    async def claim(self, worker_id: str) -> Optional[Job]:
+        now = time.time()
+        token = str(uuid.uuid4())
+        result = await self._claim_script(
+            keys=[self.queue_key, self.inflight_key, self.dead_key],
+            args=[now, now + settings.JOB_VISIBILITY_TIMEOUT, self.job_prefix, token]
+        )
+        if not result:
+            return None
+        job_id, kind, target_id, attempts, max_attempts = result
+        return Job(
+            id=job_id, kind=kind, target_id=target_id,
+            attempts=int(attempts), max_attempts=int(max_attempts), token=token
+        )
+
+    def _owned(self, job: Job, done: int) -> bool:
+        if not done:
+            logger.warning(f"⚠️ Réservation du job {job.id} perdue (expirée puis reprise) : mise à jour ignorée")
+        return bool(done)
+
+    async def heartbeat(self, job: Job) -> bool:
+        done = await self._heartbeat_script(
+            keys=[self.inflight_key, self.job_prefix + job.id],
+            args=[job.id, job.token, time.time() + settings.JOB_VISIBILITY_TIMEOUT]
+        )
+        return self._owned(job, done)
+
+    async def complete(self, job: Job) -> bool:
+        done = await self._complete_script(keys=[self.inflight_key, self.job_prefix + job.id], args=[job.id, job.token])
+        return self._owned(job, done)
+
+    async def fail(self, job: Job, error: str) -> bool:
+        if job.attempts >= job.max_attempts:
+            logger.warning(f"☠️ Job {job.id} envoyé en lettre morte après {job.attempts} tentative(s)")
+            next_attempt = "dead"
+        else:
+            next_attempt = time.time() + retry_delay(job.attempts)
+        done = await self._fail_script(
+            keys=[self.inflight_key, self.job_prefix + job.id, self.queue_key, self.dead_key],
+            args=[job.id, job.token, error, next_attempt]
+        )
+        return self._owned(job, done)
+
+    async def purge_completed(self, older_than: timedelta) -> int:
+        # Un job acquitté est supprimé aussitôt (complete) : rien ne s'accumule
+        return 0
+
+    async def depth(self) -> Dict[str, int]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zcard(self.queue_key)
+            pipe.zcard(self.inflight_key)
+            pipe.llen(self.dead_key)
+            pending, running, dead = await pipe.execute()
+        return {"pending": pending, "running": running, "dead": dead}
+
+# ===== INSTANCE PARTAGÉE =====
+
+_job_queue: Optional[JobQueue] = None
+
+def get_job_queue() -> JobQueue:
+    """Retourne la file d'attente configurée (singleton)"""
+    global _job_queue
+    if _job_queue is None:
+        if settings.JOB_QUEUE_BACKEND == "redis":
+            if not settings.REDIS_HOST:
+                raise RuntimeError("REDIS_HOST requis pour JOB_QUEUE_BACKEND=redis")
+            _job_queue = RedisJobQueue(settings.REDIS_HOST, settings.REDIS_PORT)
+        else:
+            _job_queue = DatabaseJobQueue()
+    return _job_queue
+
+async def purge_completed_jobs(session=None) -> int:
+    """Supprime les jobs terminés depuis plus de JOB_RETENTION_DAYS (commande de maintenance purge-jobs)"""
+    purged = await get_job_queue().purge_completed(timedelta(days=settings.JOB_RETENTION_DAYS))
+    if purged:
+        logger.info(f"🧹 Jobs terminés purgés: {purged}")
+    return purged
+
+async def requeue_orphans() -> int:
+    """Remet en file les documents et dossiers PENDING sans job vivant depuis JOB_ORPHAN_GRACE_SECONDS
+
+    Cas d'un arrêt entre l'enregistrement et la mise en file hors de la base
+    (backend Redis) : sans job, la cible resterait PENDING, tenue pour en cours.
+    """
+    queue = get_job_queue()
+    # Jobs relevés avant les cibles : un job créé entre-temps vise une cible plus récente que le délai de grâce
+    live = await queue.live_targets()
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_ORPHAN_GRACE_SECONDS)
+    async with AsyncSessionLocal() as db:
+        document_ids = (await db.execute(
+            select(db_m.Document.id).where(
+                db_m.Document.status == db_m.DocumentStatus.PENDING,
+                func.coalesce(db_m.Document.updated_at, db_m.Document.upload_date) < cutoff
+            )
+        )).scalars().all()
+        dossier_ids = (await db.execute(
+            select(db_m.Dossier.id).where(
+                db_m.Dossier.status == db_m.DocumentStatus.PENDING,
+                db_m.Dossier.created_at < cutoff
+            )
+        )).scalars().all()
+
+    orphans = [
+        (kind, target_id)
+        for kind, target_ids in ((JOB_KIND_DOCUMENT, document_ids), (JOB_KIND_DOSSIER, dossier_ids))
+        for target_id in target_ids
+        if (kind, target_id) not in live
+    ]
+    if orphans:
+        await queue.enqueue_many(orphans)
+        logger.warning(f"🩹 {len(orphans)} analyse(s) sans job remise(s) en file")
+    return len(orphans)
@@ -0,0 +1,220 @@
+# app/services/near_duplicates.py
+"""
+Lettres types quasi identiques (MinHash + LSH).
+
+Beaucoup de recours CSPE sont des courriers types d'un même cabinet qui ne
+diffèrent que par le nom, les dates et les montants : l'empreinte exacte
+(`content_hash`) ne les rapproche jamais. Chaque courrier analysé reçoit
+une signature MinHash et ses clés de bandes LSH (tables `document_signatures`
+et `document_signature_bands`), enregistrées dans la transaction de la
+classification.
+
+Un nouveau courrier assez proche d'un courrier déjà analysé (même modèle,
+mêmes prompts) reprend ses analyses des critères qui dépendent du modèle de
+lettre (objet, pièces) ; le délai et la qualité pour agir, propres à chaque
+demandeur, sont toujours réanalysés.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+
+from app.config import settings
+from app.models import database_models as db_m
+from app.services.criterion_results import CRITERIA
+from app.services.ollama_service import PROMPT_SET_VERSION
+from app.utils.minhash import MinHasher
+
+logger = logging.getLogger(__name__)
+
+# Critères repris d'un courrier quasi identique (ils dépendent du modèle de lettre)
+TEMPLATE_CRITERIA = ("object", "documents")
+
+# Candidats LSH comparés au plus : ceux qui partagent le plus de bandes
+MAX_CANDIDATES = 20
+
+# Documents relus par lot lors d'une reconstruction complète
+REBUILD_BATCH_SIZE = 200
+
+_hasher: Optional[MinHasher] = None
+
+def get_hasher() -> MinHasher:
+    """Paramètres MinHash de l'index (singleton)"""
+    global _hasher
+    if _hasher is None:
+        _hasher = MinHasher(settings.MINHASH_NUM_PERM, settings.MINHASH_BANDS, settings.MINHASH_SHINGLE_SIZE)
+    return _hasher
+
+async def compute_signature(content: str) -> Optional[np.ndarray]:
+    """Signature du texte, calculée hors de la boucle d'événements"""
+    return await asyncio.to_thread(get_hasher().signature, content)
+
+async def index_signature(session: AsyncSession, document_id: str, signature: np.ndarray) -> None:
+    """Enregistre (ou remplace) la signature d'un document et ses clés de bandes"""
+    await remove_document(session, document_id)
+    await session.execute(
+        insert(db_m.DocumentSignature).values(document_id=document_id, signature=MinHasher.to_bytes(signature))
+    )
+    await session.execute(
+        insert(db_m.DocumentSignatureBand),
+        [{"bucket": bucket, "document_id": document_id} for bucket in set(get_hasher().band_keys(signature))]
+    )
+
+async def remove_document(session: AsyncSession, document_id: str) -> None:
+    await session.execute(delete(db_m.DocumentSignatureBand).where(db_m.DocumentSignatureBand.document_id == document_id))
+    await session.execute(delete(db_m.DocumentSignature).where(db_m.DocumentSignature.document_id == document_id))
+
+async def find_template(
+    db: AsyncSession,
+    document_id: str,
+    signature: np.ndarray
+) -> Optional[Tuple[str, float]]:
+    """Courrier analysé le plus proche au-delà du seuil : (document_id, similarité estimée)"""
+    hasher = get_hasher()
+    Band, Signature = db_m.DocumentSignatureBand, db_m.DocumentSignature
+    shared = func.count().label("shared")
+    candidates = (await db.execute(
+        select(Band.document_id)
+        .where(Band.bucket.in_(hasher.band_keys(signature)), Band.document_id != document_id)
+        .group_by(Band.document_id)
+        .order_by(shared.desc())
+        .limit(MAX_CANDIDATES)
+    )).scalars().all()
+    if not candidates:
+        return None
+
+    # Seuls les courriers classés avec le modèle et les prompts actuels servent de modèle
+    rows = (await db.execute(
+        select(Signature.document_id, Signature.signature)
+        .join(db_m.Document, db_m.Document.id == Signature.document_id)
+        .join(db_m.Classification, db_m.Classification.document_id == Signature.document_id)
+        .where(
+            Signature.document_id.in_(candidates),
+            db_m.Document.status.in_([db_m.DocumentStatus.COMPLETED, db_m.DocumentStatus.NEEDS_REVIEW]),
+            db_m.Classification.model_version == settings.LLM_MODEL,
+            db_m.Classification.prompt_version == PROMPT_SET_VERSION,
+        )
+    )).all()
+    scored = [(hasher.similarity(signature, MinHasher.from_bytes(row.signature)), row.document_id) for row in rows]
+    if not scored:
+        return None
+    similarity, template_id = max(scored)
+    if similarity < settings.NEAR_DUPLICATE_THRESHOLD:
+        return None
+    return template_id, similarity
+
+def attachment_types(inventory: Optional[List[Dict[str, Any]]]) -> Optional[List[str]]:
+    """Types des pièces jointes d'un inventaire, triés (None hors analyse de dossier)"""
+    if inventory is None:
+        return None
+    return sorted(piece["attachment_type"] for piece in inventory)
+
+def reusable_analyses(
+    template_state: Dict[str, Any],
+    template_id: str,
+    similarity: float,
+    attachments_inventory: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Analyses des critères liés au modèle de lettre reprises du courrier modèle (clé d'état -> analyse)"""
+    reused = {}
+    for criterion in TEMPLATE_CRITERIA:
+        key = CRITERIA[criterion]
+        analysis = template_state.get(key)
+        # Analyse en erreur, à la citation introuvable ou peu sûre : elle est refaite plutôt que propagée
+        if not analysis or analysis.get("error") or analysis.get("quote_verified") is False:
+            continue
+        if float(analysis.get("confidence") or 0.0) < settings.NEAR_DUPLICATE_MIN_CONFIDENCE:
+            continue
+        # Les pièces dépendent aussi de l'inventaire : repris seulement s'il est du même type
+        if criterion == "documents" and (
+            attachment_types(attachments_inventory) != attachment_types(template_state.get("attachments_inventory"))
+        ):
+            continue
+        reused[key] = {
+            **analysis,
+            "duration_ms": None,  # pas d'appel LLM : exclu des quantiles de latence
+            "analyzed_at": datetime.utcnow().isoformat(),
+            "reused_from": template_id,
+            "similarity": round(similarity, 4),
+        }
+    return reused
+
+async def find_reusable_analyses(
+    db: AsyncSession,
+    document_id: str,
+    content: str,
+    attachments_inventory: Optional[List[Dict[str, Any]]] = None
+) -> Tuple[Optional[np.ndarray], Dict[str, Dict[str, Any]]]:
+    """Signature du courrier (à indexer avec sa classification) et analyses reprises d'un quasi-doublon
+
+    Une défaillance de la recherche n'empêche jamais l'analyse : tout est alors réanalysé.
+    """
+    try:
+        signature = await compute_signature(content)
+        if signature is None:
+            return None, {}
+        template = await find_template(db, document_id, signature)
+        if template is None:
+            return signature, {}
+
+        template_id, similarity = template
+        classification = await db.scalar(
+            select(db_m.Classification)
+            .options(undefer(db_m.Classification.analysis_blob), undefer(db_m.Classification.legacy_analysis_steps))
+            .where(db_m.Classification.document_id == template_id)
+        )
+        template_state = classification.analysis_steps if classification is not None else None
+        if not template_state:
+            # État complet non conservé (ANALYSIS_BLOB_ENABLED=false) : rien à reprendre
+            return signature, {}
+
+        reused = reusable_analyses(template_state, template_id, similarity, attachments_inventory)
+        if reused:
+            logger.info(f"♻️ Courrier quasi identique à {template_id} ({similarity:.0%}) : critères repris {sorted(reused)}")
+        return signature, reused
+    except Exception as e:
+        logger.warning(f"⚠️ Recherche de quasi-doublons impossible ({document_id}): {e}")
+        return None, {}
+
+async def rebuild(session: AsyncSession) -> int:
+    """Recalcule les signatures de tous les courriers classifiés (texte relu depuis les fichiers), par lots"""
+    # Import local : document_service alimente lui-même l'index
+    from app.services.document_service import DocumentService
+
+    service = DocumentService(session)
+    await session.execute(delete(db_m.DocumentSignatureBand))
+    await session.execute(delete(db_m.DocumentSignature))
+
+    indexed = 0
+    last_id = ""
+    while True:
+        documents = (await session.execute(
+            select(db_m.Document)
+            .join(db_m.Classification)
+            .where(db_m.Document.id > last_id)
+            .order_by(db_m.Document.id)
+            .limit(REBUILD_BATCH_SIZE)
+        )).scalars().all()
+        if not documents:
+            break
+
+        for document in documents:
+            try:
+                content = await asyncio.to_thread(service.read_document_content, document)
+            except Exception as e:
+                logger.warning(f"⚠️ Texte illisible, document sans signature ({document.id}): {e}")
+                continue
+            signature = await compute_signature(content)
+            if signature is not None:
+                await index_signature(session, document.id, signature)
+                indexed += 1
+        last_id = documents[-1].id
+        session.expunge_all()
+
+    logger.info(f"🧬 Signatures MinHash recalculées: {indexed} document(s)")
+    return indexed
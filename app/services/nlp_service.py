@@ -1,30 +1,204 @@
 # app/services/nlp_service.py
-import spacy
-from typing import List, Dict, Any
+"""
+Traitements spaCy (entités, phrases, vecteurs) à chargement paresseux.
+
+Le modèle n'est chargé qu'au premier traitement, sans les composants absents
+de SPACY_PIPES : un processus qui ne fait pas de NLP ne paie ni le temps de
+chargement ni la mémoire. Chaque appel n'exécute que les composants dont il a
+besoin ; les vecteurs (table du vocabulaire) ne demandent que le tokenizer.
+Les traitements passent par `nlp.pipe` : un texte est analysé en une seule
+passe, un lot de textes (reconstructions) par lots, sur plusieurs processus
+si NLP_N_PROCESS > 1 ; les textes longs sont découpés entre paragraphes.
+
+Avec NLP_PRELOAD, le modèle est chargé à l'import de l'application, avant
+que gunicorn --preload ne crée ses workers : leurs pages sont partagées en
+copie sur écriture.
+"""
+import gc
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import settings
+from app.utils.text_chunks import split_paragraphs
+
+logger = logging.getLogger(__name__)
+
+# Composants requis par chaque traitement (tok2vec alimente ner et senter)
+PIPES_ENTITIES = ("tok2vec", "ner")
+PIPES_ANALYSIS = ("tok2vec", "ner", "senter", "morphologizer", "attribute_ruler", "lemmatizer")
+
+# Composants entraînés des modèles spaCy ; ceux hors SPACY_PIPES sont exclus au chargement
+KNOWN_PIPES = (
+    "tok2vec", "morphologizer", "tagger", "parser", "senter",
+    "attribute_ruler", "lemmatizer", "ner", "entity_ruler", "textcat",
+)
+
+def rss_mb() -> Optional[float]:
+    """Mémoire résidente du processus (Mo), None hors Linux"""
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
 
 class NLPService:
-    def __init__(self):
-        self.nlp = spacy.load("fr_core_news_lg")
-    
-    def extract_entities(self, text: str) -> List[Dict[str, Any]]:
-        """Extrait les entités nommées d'un texte."""
-        doc = self.nlp(text)
+    def __init__(self, model_name: Optional[str] = None, pipes: Optional[Sequence[str]] = None):
+        self.model_name = model_name or settings.SPACY_MODEL
+        self.pipes = set(pipes if pipes is not None else settings.SPACY_PIPES)
+        self._nlp = None
+        self._lock = threading.Lock()
+        self.load_stats: Dict[str, Any] = {}
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._nlp is not None
+
+    @property
+    def nlp(self):
+        """Pipeline spaCy, chargé au premier accès (une seule fois, même depuis plusieurs threads)"""
+        if self._nlp is None:
+            with self._lock:
+                if self._nlp is None:
+                    self._nlp = self._load()
+        return self._nlp
+
+    def _load(self):
+        import spacy
+
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        nlp = spacy.load(self.model_name, exclude=[name for name in KNOWN_PIPES if name not in self.pipes])
+        # Sans parser, les phrases viennent du senter, désactivé par défaut dans les modèles français
+        if "senter" in nlp.disabled:
+            nlp.enable_pipe("senter")
+
+        self.load_stats = {
+            "model": self.model_name,
+            "pipes": nlp.pipe_names,
+            "load_seconds": round(time.perf_counter() - started, 2),
+            "rss_before_mb": round(rss_before, 1) if rss_before is not None else None,
+            "rss_after_mb": round(rss_mb(), 1) if rss_before is not None else None,
+        }
+        logger.info(
+            f"🧠 Modèle spaCy {self.model_name} chargé en {self.load_stats['load_seconds']}s "
+            f"(composants: {', '.join(nlp.pipe_names) or 'aucun'}, "
+            f"RSS {self.load_stats['rss_before_mb']} → {self.load_stats['rss_after_mb']} Mo)"
+        )
+        return nlp
+
+    def preload(self) -> None:
+        """Charge le modèle maintenant (avant fork) et le soustrait au ramasse-miettes"""
+        self.nlp
+        # Les passages du GC sur les objets du modèle recopieraient leurs pages dans chaque worker
+        gc.freeze()
+
+    def _pipe(self, texts: Sequence[str], pipes: Sequence[str], batch_size: Optional[int] = None, n_process: Optional[int] = None):
+        """Docs des morceaux de chaque texte, par lots : ((indice du texte, décalage), doc)"""
+        nlp = self.nlp
+        max_chars = min(settings.NLP_CHUNK_CHARS, nlp.max_length)
+        pieces = (
+            (chunk, (index, offset))
+            for index, text in enumerate(texts)
+            for offset, chunk in split_paragraphs(text, max_chars)
+        )
+        for doc, context in nlp.pipe(
+            pieces,
+            as_tuples=True,
+            batch_size=batch_size or settings.NLP_BATCH_SIZE,
+            n_process=n_process or 1,
+            disable=[name for name in nlp.pipe_names if name not in pipes],
+        ):
+            yield context, doc
+
+    def parse(self, text: str, pipes: Sequence[str] = PIPES_ENTITIES):
+        """Doc d'un texte court (sous NLP_CHUNK_CHARS), avec les seuls composants `pipes`"""
+        nlp = self.nlp
+        return next(nlp.pipe(
+            [text[:min(settings.NLP_CHUNK_CHARS, nlp.max_length)]],
+            disable=[name for name in nlp.pipe_names if name not in pipes],
+        ))
+
+    @staticmethod
+    def _entities(doc, offset: int = 0) -> List[Dict[str, Any]]:
         return [
-            {"text": ent.text, "label": ent.label_, "start": ent.start_char, "end": ent.end_char}
+            {"text": ent.text, "label": ent.label_, "start": ent.start_char + offset, "end": ent.end_char + offset}
             for ent in doc.ents
         ]
-    
+
+    def extract_entities(self, text: str) -> List[Dict[str, Any]]:
+        """Extrait les entités nommées d'un texte."""
+        entities = []
+        for (_, offset), doc in self._pipe([text], PIPES_ENTITIES):
+            entities.extend(self._entities(doc, offset))
+        return entities
+
     def analyze_legal_text(self, text: str) -> Dict[str, Any]:
-        """Analyse un texte juridique et en extrait des informations clés."""
-        doc = self.nlp(text)
-        
-        # Exemple d'analyse simple
-        return {
-            "entities": self.extract_entities(text),
-            "sentences": [str(sent) for sent in doc.sents],
-            "keywords": list({token.lemma_ for token in doc 
-                            if not token.is_stop and token.is_alpha and len(token) > 2})
-        }
+        """Analyse un texte juridique et en extrait des informations clés (une seule passe)."""
+        return self.analyze_batch([text], n_process=1)[0]
+
+    def analyze_batch(
+        self,
+        texts: Sequence[str],
+        batch_size: Optional[int] = None,
+        n_process: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Entités, phrases, lemmes et mots-clés de chaque texte, en une passe par lots (nlp.pipe)
+
+        Les textes longs sont découpés entre paragraphes sous `nlp.max_length` ;
+        les positions des entités restent relatives au texte complet. Les lemmes
+        ne sont calculés que si le lemmatiseur figure dans SPACY_PIPES (sinon
+        forme en minuscules).
+        """
+        results = [{"entities": [], "sentences": [], "lemmas": [], "keywords": set()} for _ in texts]
+        for (index, offset), doc in self._pipe(texts, PIPES_ANALYSIS, batch_size, n_process or settings.NLP_N_PROCESS):
+            result = results[index]
+            result["entities"].extend(self._entities(doc, offset))
+            if doc.has_annotation("SENT_START"):
+                result["sentences"].extend(str(sent) for sent in doc.sents)
+            else:
+                result["sentences"].append(doc.text)
+            for token in doc:
+                if not token.is_alpha:
+                    continue
+                lemma = token.lemma_ or token.lower_
+                result["lemmas"].append(lemma)
+                if not token.is_stop and len(token) > 2:
+                    result["keywords"].add(lemma)
+        for result in results:
+            result["keywords"] = sorted(result["keywords"])
+        return results
+
+    def document_vector(self, text: str) -> np.ndarray:
+        """Vecteur du document : moyenne des vecteurs de ses mots pleins (tokenizer seul, sans pipeline)"""
+        return self.document_vectors([text], n_process=1)[0]
+
+    def document_vectors(
+        self,
+        texts: Sequence[str],
+        batch_size: Optional[int] = None,
+        n_process: Optional[int] = None
+    ) -> List[np.ndarray]:
+        """Vecteurs de plusieurs documents par lots (reconstructions)"""
+        nlp = self.nlp
+        vectors = []
+        for doc in nlp.pipe(
+            (text[:settings.NN_VECTOR_MAX_CHARS] for text in texts),
+            batch_size=batch_size or settings.NLP_BATCH_SIZE,
+            n_process=n_process or settings.NLP_N_PROCESS,
+            disable=nlp.pipe_names,
+        ):
+            words = [token.vector for token in doc if token.has_vector and token.is_alpha and not token.is_stop]
+            if words:
+                vectors.append(np.mean(words, axis=0).astype(np.float32))
+            else:
+                vectors.append(np.zeros(nlp.vocab.vectors_length, dtype=np.float32))
+        return vectors
 
-# Instance unique du service
-nlp_service = NLPService()
\ No newline at end of file
+# Instance unique du service (le modèle n'est chargé qu'au premier usage)
+nlp_service = NLPService()
@@ -1,14 +1,130 @@
 # app/services/ollama_service.py
+import hashlib
 import httpx
 import json
 import asyncio
-from typing import Dict, Any, Optional, List
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, Optional, List, Sequence
 from app.config import settings
+from app.services.cache import NS_LLM, get_cache
 import logging
 import time
 
 logger = logging.getLogger(__name__)
 
+# Champs de l'extraction d'entités et consigne donnée au LLM pour chacun
+ENTITY_FIELDS: Dict[str, str] = {
+    "date_decision": "date de la décision contestée (format DD/MM/YYYY)",
+    "date_recours": "date du recours (format DD/MM/YYYY)",
+    "demandeur": "nom du demandeur",
+    "objet_recours": "objet de la contestation",
+    "montant_conteste": "montant contesté en euros",
+    "autorite_competente": "autorité qui a pris la décision",
+    "type_decision": "type de décision contestée",
+}
+
+# Prompts d'extraction, d'analyse des critères et de décision (str.format)
+ENTITY_SYSTEM_PROMPT = """Tu es un expert en analyse de documents juridiques français. 
+        Tu dois extraire les informations clés des recours CSPE avec une précision maximale.
+        Réponds UNIQUEMENT avec un JSON valide, sans texte supplémentaire."""
+
+ENTITY_PROMPT_TEMPLATE = """
+Analyse ce document juridique et extrais les informations suivantes :
+
+DOCUMENT :
+---
+{document}...  
+---
+
+Extrais ces informations (utilise null si introuvable) :
+
+{fields}
+
+Réponds uniquement avec le JSON, sans explication.
+"""
+
+CRITERION_SYSTEM_PROMPT_TEMPLATE = """Tu es un expert juridique spécialisé dans l'analyse des recours CSPE.
+        Analyse le critère '{criterion_name}' avec rigueur et objectivité.
+        Réponds UNIQUEMENT avec un JSON valide."""
+
+CRITERION_PROMPT_TEMPLATE = """
+CRITÈRE À ANALYSER : {criterion_name}
+
+RÈGLE JURIDIQUE :
+{criterion_description}
+
+ENTITÉS EXTRAITES :
+{entities}
+
+DOCUMENT (extrait) :
+---
+{document}...
+---
+
+Analyse si ce critère est respecté selon les règles CSPE.
+
+Réponds avec ce JSON exact :
+{{
+  "is_compliant": true/false,
+  "reasoning": "Explication détaillée de ton analyse en 2-3 phrases",
+  "confidence": 0.XX,
+  "source_quote": "Citation exacte du document qui justifie ta décision ou null"
+}}
+"""
+
+DECISION_SYSTEM_PROMPT = """Tu es un expert juridique du Conseil d'État. 
+        Prends une décision finale de recevabilité basée sur l'analyse des 4 critères CSPE.
+        Réponds UNIQUEMENT avec un JSON valide."""
+
+DECISION_PROMPT_TEMPLATE = """
+ANALYSES DES 4 CRITÈRES CSPE :
+{analyses}
+
+RÈGLE DE DÉCISION :
+- RECEVABLE : TOUS les critères doivent être respectés
+- IRRECEVABLE : AU MOINS UN critère non respecté
+
+Analyse et décide :
+
+{{
+  "final_classification": "RECEVABLE" ou "IRRECEVABLE",
+  "final_justification": "Justification détaillée de la décision en 3-4 phrases",
+  "final_confidence": 0.XX,
+  "is_review_required": true/false,
+  "critical_issues": ["liste des problèmes majeurs ou vide si aucun"]
+}}
+"""
+
+# Champs des analyses de critères transmis à la décision finale ; les champs propres à chaque
+# appel (analyzed_at, duration_ms, cached, quote_coverage) changeraient le prompt, donc sa clé de cache
+DECISION_ANALYSIS_FIELDS = ("criterion_name", "is_compliant", "confidence", "reasoning", "source_quote", "quote_verified")
+
+def _prompt_set_version() -> str:
+    """Empreinte des prompts et des consignes d'extraction : change avec le moindre caractère modifié"""
+    material = json.dumps([
+        ENTITY_SYSTEM_PROMPT, ENTITY_PROMPT_TEMPLATE, ENTITY_FIELDS,
+        CRITERION_SYSTEM_PROMPT_TEMPLATE, CRITERION_PROMPT_TEMPLATE,
+        DECISION_SYSTEM_PROMPT, DECISION_PROMPT_TEMPLATE, DECISION_ANALYSIS_FIELDS,
+    ], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+# Version du jeu de prompts, enregistrée avec chaque classification et résultat de critère
+PROMPT_SET_VERSION = _prompt_set_version()
+
+# Débits de génération (tokens/s) relevés pendant l'analyse en cours (voir collect_generation_rates)
+_generation_rates: ContextVar[Optional[List[float]]] = ContextVar("generation_rates", default=None)
+
+@contextmanager
+def collect_generation_rates() -> Iterator[List[float]]:
+    """Relève le débit de chaque génération lancée dans ce contexte (tâches filles comprises)"""
+    rates: List[float] = []
+    token = _generation_rates.set(rates)
+    try:
+        yield rates
+    finally:
+        _generation_rates.reset(token)
+
 class OllamaService:
     """Service pour interagir avec Ollama et le modèle Mistral"""
     
@@ -86,7 +202,17 @@ class OllamaService:
         temperature: float = 0.1,
         max_tokens: int = 2048
     ) -> Dict[str, Any]:
-        """Génère une completion avec Mistral via Ollama"""
+        """Génère une completion avec Mistral via Ollama (réponses complètes en cache par prompt)"""
+        
+        # Même modèle, même prompt, mêmes paramètres : réponse reprise du cache partagé
+        cache = get_cache()
+        cache_key = hashlib.sha256(json.dumps(
+            [self.model, system_prompt, prompt, temperature, max_tokens], ensure_ascii=False
+        ).encode("utf-8")).hexdigest()
+        cached = await cache.get(NS_LLM, cache_key)
+        if cached is not None:
+            logger.info("Génération reprise du cache")
+            return {**cached, "cached": True}
         
         # Vérifier et télécharger le modèle si nécessaire
         if not await self.pull_model_if_needed():
@@ -125,9 +251,16 @@ class OllamaService:
             result = response.json()
             processing_time = time.time() - start_time
             
+            # Débit de génération mesuré par Ollama (eval_duration en nanosecondes)
+            eval_duration = result.get("eval_duration", 0)
+            tokens_per_second = result.get("eval_count", 0) / (eval_duration / 1e9) if eval_duration else None
+            rates = _generation_rates.get()
+            if rates is not None and tokens_per_second is not None:
+                rates.append(tokens_per_second)
+            
             logger.info(f"Génération terminée en {processing_time:.2f}s")
             
-            return {
+            completion = {
                 "response": result.get("response", "").strip(),
                 "model": result.get("model", ""),
                 "created_at": result.get("created_at", ""),
@@ -136,8 +269,14 @@ class OllamaService:
                 "load_duration": result.get("load_duration", 0),
                 "prompt_eval_count": result.get("prompt_eval_count", 0),
                 "eval_count": result.get("eval_count", 0),
+                "eval_duration": eval_duration,
+                "tokens_per_second": tokens_per_second,
                 "processing_time": processing_time
             }
+            # Une génération interrompue (limite de tokens, arrêt) n'est pas réutilisée
+            if completion["done"] and result.get("done_reason", "stop") == "stop":
+                await cache.set(NS_LLM, cache_key, completion)
+            return completion
                 
         except Exception as e:
             logger.error(f"Erreur lors de la génération: {e}")
@@ -180,35 +319,19 @@ class OllamaService:
             logger.warning(f"Impossible de parser JSON: {e}")
             raise
     
-    async def extract_entities_with_llm(self, document_content: str) -> Dict[str, Any]:
-        """Extrait les entités du document avec Mistral"""
+    async def extract_entities_with_llm(
+        self,
+        document_content: str,
+        fields: Optional[Sequence[str]] = None
+    ) -> Dict[str, Any]:
+        """Extrait les entités du document avec Mistral (toutes, ou seulement `fields`)"""
+        fields = list(fields or ENTITY_FIELDS)
         
-        system_prompt = """Tu es un expert en analyse de documents juridiques français. 
-        Tu dois extraire les informations clés des recours CSPE avec une précision maximale.
-        Réponds UNIQUEMENT avec un JSON valide, sans texte supplémentaire."""
-        
-        prompt = f"""
-Analyse ce document juridique et extrais les informations suivantes :
-
-DOCUMENT :
----
-{document_content[:3000]}...  
----
-
-Extrais ces informations (utilise null si introuvable) :
-
-{{
-  "date_decision": "date de la décision contestée (format DD/MM/YYYY)",
-  "date_recours": "date du recours (format DD/MM/YYYY)", 
-  "demandeur": "nom du demandeur",
-  "objet_recours": "objet de la contestation",
-  "montant_conteste": "montant contesté en euros",
-  "autorite_competente": "autorité qui a pris la décision",
-  "type_decision": "type de décision contestée"
-}}
-
-Réponds uniquement avec le JSON, sans explication.
-"""
+        system_prompt = ENTITY_SYSTEM_PROMPT
+        prompt = ENTITY_PROMPT_TEMPLATE.format(
+            document=document_content[:3000],
+            fields=json.dumps({field: ENTITY_FIELDS[field] for field in fields}, indent=2, ensure_ascii=False),
+        )
         
         try:
             result = await self.generate_completion(prompt, system_prompt, temperature=0.1)
@@ -218,16 +341,7 @@ Réponds uniquement avec le JSON, sans explication.
                     
         except Exception as e:
             logger.error(f"Erreur lors de l'extraction d'entités: {e}")
-            return {
-                "date_decision": None,
-                "date_recours": None,
-                "demandeur": None,
-                "objet_recours": None,
-                "montant_conteste": None,
-                "autorite_competente": None,
-                "type_decision": None,
-                "error": str(e)
-            }
+            return {**{field: None for field in fields}, "error": str(e)}
     
     async def analyze_criterion(
         self, 
@@ -238,40 +352,20 @@ Réponds uniquement avec le JSON, sans explication.
     ) -> Dict[str, Any]:
         """Analyse un critère spécifique avec Mistral"""
         
-        system_prompt = f"""Tu es un expert juridique spécialisé dans l'analyse des recours CSPE.
-        Analyse le critère '{criterion_name}' avec rigueur et objectivité.
-        Réponds UNIQUEMENT avec un JSON valide."""
-        
-        prompt = f"""
-CRITÈRE À ANALYSER : {criterion_name}
-
-RÈGLE JURIDIQUE :
-{criterion_description}
-
-ENTITÉS EXTRAITES :
-{json.dumps(extracted_entities, indent=2, ensure_ascii=False)}
-
-DOCUMENT (extrait) :
----
-{document_content[:2000]}...
----
-
-Analyse si ce critère est respecté selon les règles CSPE.
-
-Réponds avec ce JSON exact :
-{{
-  "is_compliant": true/false,
-  "reasoning": "Explication détaillée de ton analyse en 2-3 phrases",
-  "confidence": 0.XX,
-  "source_quote": "Citation exacte du document qui justifie ta décision ou null"
-}}
-"""
+        system_prompt = CRITERION_SYSTEM_PROMPT_TEMPLATE.format(criterion_name=criterion_name)
+        prompt = CRITERION_PROMPT_TEMPLATE.format(
+            criterion_name=criterion_name,
+            criterion_description=criterion_description,
+            entities=json.dumps(extracted_entities, indent=2, ensure_ascii=False),
+            document=document_content[:2000],
+        )
         
         try:
             result = await self.generate_completion(prompt, system_prompt, temperature=0.1)
             response_text = result["response"]
             
-            return self._extract_json_from_response(response_text)
+            # Réponse reprise du cache : signalée pour l'exclure des mesures de latence
+            return {**self._extract_json_from_response(response_text), "cached": bool(result.get("cached"))}
                     
         except Exception as e:
             logger.error(f"Erreur lors de l'analyse du critère {criterion_name}: {e}")
@@ -285,28 +379,12 @@ Réponds avec ce JSON exact :
     async def make_final_decision(self, analyses: Dict[str, Any]) -> Dict[str, Any]:
         """Prend la décision finale basée sur l'analyse des 4 critères"""
         
-        system_prompt = """Tu es un expert juridique du Conseil d'État. 
-        Prends une décision finale de recevabilité basée sur l'analyse des 4 critères CSPE.
-        Réponds UNIQUEMENT avec un JSON valide."""
-        
-        prompt = f"""
-ANALYSES DES 4 CRITÈRES CSPE :
-{json.dumps(analyses, indent=2, ensure_ascii=False)}
-
-RÈGLE DE DÉCISION :
-- RECEVABLE : TOUS les critères doivent être respectés
-- IRRECEVABLE : AU MOINS UN critère non respecté
-
-Analyse et décide :
-
-{{
-  "final_classification": "RECEVABLE" ou "IRRECEVABLE",
-  "final_justification": "Justification détaillée de la décision en 3-4 phrases",
-  "final_confidence": 0.XX,
-  "is_review_required": true/false,
-  "critical_issues": ["liste des problèmes majeurs ou vide si aucun"]
-}}
-"""
+        system_prompt = DECISION_SYSTEM_PROMPT
+        decision_inputs = {
+            key: {field: analysis[field] for field in DECISION_ANALYSIS_FIELDS if field in analysis} if analysis else analysis
+            for key, analysis in analyses.items()
+        }
+        prompt = DECISION_PROMPT_TEMPLATE.format(analyses=json.dumps(decision_inputs, indent=2, ensure_ascii=False))
         
         try:
             result = await self.generate_completion(prompt, system_prompt, temperature=0.1)
@@ -0,0 +1,49 @@
+# app/services/quote_verification.py
+"""
+Vérification des citations (`source_quote`) des analyses de critères.
+
+Le LLM justifie chaque critère par une citation du document, parfois
+inventée. Après l'analyse, les citations sont cherchées dans un index des
+n-grammes du texte construit une fois par document : une citation dont la
+couverture reste sous QUOTE_MIN_COVERAGE est marquée `quote_verified =
+False` et la confiance du critère est réduite, ce qui renvoie le dossier en
+révision ; les dossiers aux citations vérifiées n'y sont pas envoyés pour
+cette raison.
+"""
+import asyncio
+import logging
+from typing import Any, Dict
+
+from app.config import settings
+from app.utils.quote_index import QuoteIndex
+
+logger = logging.getLogger(__name__)
+
+def verify_quotes(index: QuoteIndex, analyses: Dict[str, Dict[str, Any]]) -> int:
+    """Marque les citations des analyses (clé d'état -> analyse) ; retourne le nombre de citations introuvables"""
+    unverified = 0
+    for key, analysis in analyses.items():
+        quote = analysis.get("source_quote")
+        coverage = index.coverage(quote) if isinstance(quote, str) else None
+        if coverage is None:
+            # Pas de citation : rien à vérifier
+            analysis["quote_verified"] = None
+            analysis["quote_coverage"] = None
+            continue
+
+        analysis["quote_coverage"] = round(coverage, 2)
+        analysis["quote_verified"] = coverage >= settings.QUOTE_MIN_COVERAGE
+        if not analysis["quote_verified"]:
+            unverified += 1
+            analysis["confidence"] = round(
+                float(analysis.get("confidence") or 0.0) * settings.QUOTE_UNVERIFIED_CONFIDENCE_FACTOR, 4
+            )
+            logger.warning(f"⚠️ Citation introuvable dans le document ({key}, couverture {coverage:.0%}): {quote[:120]!r}")
+    return unverified
+
+async def verify_document_quotes(document_content: str, analyses: Dict[str, Dict[str, Any]]) -> int:
+    """Construit l'index du document (hors boucle d'événements) et vérifie les citations des analyses"""
+    if not settings.QUOTE_CHECK_ENABLED or not analyses:
+        return 0
+    index = await asyncio.to_thread(QuoteIndex, document_content, settings.QUOTE_NGRAM_SIZE)
+    return verify_quotes(index, analyses)
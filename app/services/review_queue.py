@@ -0,0 +1,131 @@
+# app/services/review_queue.py
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import database_models as db_m
+from app.utils.pagination import before_cursor, cursor_key, split_page
+
+logger = logging.getLogger(__name__)
+
+# Seuils de confiance des priorités de révision
+HIGH_PRIORITY_BELOW = 0.5
+MEDIUM_PRIORITY_BELOW = 0.8
+
+def calculate_priority(confidence_score: Optional[float]) -> str:
+    """Calcule la priorité basée sur le score de confiance"""
+    if confidence_score is None or confidence_score < HIGH_PRIORITY_BELOW:
+        return "high"
+    if confidence_score < MEDIUM_PRIORITY_BELOW:
+        return "medium"
+    return "low"
+
+# ===== MAINTENANCE (appelée dans les transactions de l'écrivain unique) =====
+
+async def upsert_entry(session: AsyncSession, document_id: str, classification: db_m.Classification) -> None:
+    """Place (ou met à jour) un document dans la file de révision"""
+    already_validated = await session.scalar(
+        select(exists().where(db_m.HumanValidation.classification_id == classification.id))
+    )
+    if already_validated:
+        await remove_entry(session, document_id)
+        return
+
+    document = (await session.execute(
+        select(db_m.Document.filename, db_m.Document.upload_date).where(db_m.Document.id == document_id)
+    )).one()
+
+    entry = await session.get(db_m.ReviewQueueEntry, document_id)
+    if entry is None:
+        entry = db_m.ReviewQueueEntry(document_id=document_id)
+        session.add(entry)
+    entry.classification_id = classification.id
+    entry.filename = document.filename
+    entry.upload_date = document.upload_date
+    entry.result = classification.result
+    entry.justification = classification.justification
+    entry.confidence_score = classification.confidence_score
+    entry.priority = calculate_priority(
+        float(classification.confidence_score) if classification.confidence_score is not None else None
+    )
+
+async def remove_entry(session: AsyncSession, document_id: str) -> None:
+    """Retire un document de la file de révision (validé ou réanalysé sans besoin de révision)"""
+    await session.execute(delete(db_m.ReviewQueueEntry).where(db_m.ReviewQueueEntry.document_id == document_id))
+
+async def rebuild(session: AsyncSession) -> int:
+    """Reconstruit entièrement la file à partir des documents et classifications (reprise, migration)"""
+    Document, Classification, HumanValidation = db_m.Document, db_m.Classification, db_m.HumanValidation
+
+    await session.execute(delete(db_m.ReviewQueueEntry))
+    pending = (await session.execute(
+        select(
+            Document.id, Classification.id, Document.filename, Document.upload_date,
+            Classification.result, Classification.justification, Classification.confidence_score
+        )
+        .join(Classification, Classification.document_id == Document.id)
+        .outerjoin(HumanValidation, HumanValidation.classification_id == Classification.id)
+        .where(Document.status == db_m.DocumentStatus.NEEDS_REVIEW, HumanValidation.id.is_(None))
+    )).all()
+
+    if pending:
+        await session.execute(insert(db_m.ReviewQueueEntry), [
+            {
+                "document_id": document_id,
+                "classification_id": classification_id,
+                "filename": filename,
+                "upload_date": upload_date,
+                "result": result,
+                "justification": justification,
+                "confidence_score": confidence_score,
+                "priority": calculate_priority(float(confidence_score) if confidence_score is not None else None),
+            }
+            for document_id, classification_id, filename, upload_date, result, justification, confidence_score in pending
+        ])
+
+    logger.info(f"📋 File de révision reconstruite: {len(pending)} document(s)")
+    return len(pending)
+
+async def backfill_if_empty(session: AsyncSession) -> None:
+    """Alimente la file au premier démarrage après sa création (documents déjà en attente)"""
+    has_entries = await session.scalar(select(exists().select_from(db_m.ReviewQueueEntry)))
+    if has_entries:
+        return
+    has_pending = await session.scalar(
+        select(exists().where(db_m.Document.status == db_m.DocumentStatus.NEEDS_REVIEW))
+    )
+    if has_pending:
+        await rebuild(session)
+        await session.commit()
+
+# ===== LECTURE =====
+
+async def list_pending(
+    db: AsyncSession,
+    limit: int,
+    priority: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Page de la file de révision (plus récents d'abord) et curseur de la page suivante"""
+    Entry = db_m.ReviewQueueEntry
+    query = select(
+        Entry.document_id, Entry.classification_id, Entry.filename, Entry.upload_date,
+        Entry.result, Entry.justification, Entry.confidence_score, Entry.priority, cursor_key(Entry.upload_date)
+    )
+
+    if priority in ("high", "medium", "low"):
+        query = query.where(Entry.priority == priority)
+
+    after = before_cursor(Entry.upload_date, Entry.document_id, cursor)
+    if after is not None:
+        query = query.where(after)
+
+    # Une ligne de plus pour savoir s'il existe une page suivante
+    rows = (await db.execute(
+        query.order_by(Entry.upload_date.desc(), Entry.document_id.desc()).limit(limit + 1)
+    )).all()
+
+    rows, next_cursor = split_page(rows, limit, "document_id")
+    return [row._asdict() for row in rows], next_cursor
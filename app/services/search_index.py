@@ -0,0 +1,238 @@
+# app/services/search_index.py
+"""
+Recherche plein texte sur les documents analysés.
+
+Un même index (table `search_index`) sur les deux bases :
+- SQLite : table virtuelle FTS5 (tokenizer unicode61 sans accents), classement bm25 ;
+- PostgreSQL : table ordinaire avec un tsvector généré (config `french`) et un index GIN.
+
+L'index est alimenté dans la transaction qui enregistre la classification.
+"""
+import asyncio
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, undefer
+
+from app.models import database_models as db_m
+
+logger = logging.getLogger(__name__)
+
+# Colonnes indexées, de la plus à la moins discriminante
+INDEXED_FIELDS = ["filename", "demandeur", "objet_recours", "montant_conteste", "justification", "content"]
+
+# Poids bm25 (SQLite) par colonne : document_id et dossier_id ne sont pas indexés
+_BM25_WEIGHTS = "0, 0, 2.0, 10.0, 5.0, 3.0, 2.0, 1.0"
+
+# Mots de contexte autour des termes trouvés dans l'extrait
+SNIPPET_TOKENS = 16
+
+# Correspondances classées au plus par requête : au-delà (termes très courants),
+# seules les plus récemment indexées sont classées, le coût reste borné
+RANK_WINDOW = 5000
+
+# Documents relus par lot lors d'une reconstruction complète
+REBUILD_BATCH_SIZE = 200
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        document_id UNINDEXED, dossier_id UNINDEXED, {", ".join(INDEXED_FIELDS)},
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+]
+
+_POSTGRES_DDL = [
+    """CREATE TABLE IF NOT EXISTS search_index (
+        document_id VARCHAR(36) PRIMARY KEY REFERENCES documents(id) ON DELETE CASCADE,
+        dossier_id VARCHAR(36),
+        filename TEXT,
+        demandeur TEXT,
+        objet_recours TEXT,
+        montant_conteste TEXT,
+        justification TEXT,
+        content TEXT,
+        indexed_at TIMESTAMP NOT NULL DEFAULT now(),
+        search_vector TSVECTOR GENERATED ALWAYS AS (
+            setweight(to_tsvector('french', coalesce(demandeur, '') || ' ' || coalesce(filename, '')), 'A') ||
+            setweight(to_tsvector('french', coalesce(objet_recours, '') || ' ' || coalesce(montant_conteste, '')), 'B') ||
+            setweight(to_tsvector('french', coalesce(justification, '')), 'C') ||
+            setweight(to_tsvector('french', coalesce(content, '')), 'D')
+        ) STORED
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_search_index_vector ON search_index USING GIN (search_vector)",
+    # Fenêtre de classement : les plus récemment indexés, comme le rowid de FTS5
+    "ALTER TABLE search_index ADD COLUMN IF NOT EXISTS indexed_at TIMESTAMP NOT NULL DEFAULT now()",
+    "CREATE INDEX IF NOT EXISTS ix_search_index_indexed_at ON search_index (indexed_at)",
+]
+
+def ensure_schema(bind: Engine) -> None:
+    """Crée la table de recherche propre au dialecte (hors métadonnées SQLAlchemy)"""
+    statements = _SQLITE_DDL if bind.dialect.name == "sqlite" else _POSTGRES_DDL
+    with bind.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+
+def fields_from_analysis(
+    filename: Optional[str],
+    content: Optional[str],
+    analysis_result: Dict[str, Any],
+    justification: Optional[str]
+) -> Dict[str, Optional[str]]:
+    """Champs indexés d'un document à partir de son texte et de l'état de son analyse"""
+    entities = analysis_result.get("extracted_entities") or {}
+    return {
+        "filename": filename,
+        "demandeur": entities.get("demandeur") or analysis_result.get("extracted_applicant"),
+        "objet_recours": entities.get("objet_recours") or analysis_result.get("extracted_object"),
+        "montant_conteste": entities.get("montant_conteste") or analysis_result.get("extracted_amount"),
+        "justification": justification,
+        "content": content,
+    }
+
+async def index_document(
+    session: AsyncSession,
+    document_id: str,
+    dossier_id: Optional[str],
+    fields: Dict[str, Optional[str]]
+) -> None:
+    """Indexe (ou réindexe) un document"""
+    values = {"document_id": document_id, "dossier_id": dossier_id}
+    values.update({field: fields.get(field) for field in INDEXED_FIELDS})
+    columns = ", ".join(values)
+    placeholders = ", ".join(f":{column}" for column in values)
+
+    if session.bind.dialect.name == "sqlite":
+        # FTS5 n'a pas de contrainte d'unicité : suppression puis insertion
+        await remove_document(session, document_id)
+        await session.execute(text(f"INSERT INTO search_index ({columns}) VALUES ({placeholders})"), values)
+        return
+
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in values if column != "document_id")
+    updates += ", indexed_at = now()"
+    await session.execute(
+        text(f"INSERT INTO search_index ({columns}) VALUES ({placeholders}) "
+             f"ON CONFLICT (document_id) DO UPDATE SET {updates}"),
+        values
+    )
+
+async def remove_document(session: AsyncSession, document_id: str) -> None:
+    await session.execute(text("DELETE FROM search_index WHERE document_id = :document_id"), {"document_id": document_id})
+
+def _fts5_query(query: str) -> str:
+    """Requête FTS5 : chaque mot entre guillemets (pas d'opérateurs), préfixe sur le dernier"""
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+async def search(db: AsyncSession, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Documents correspondant à la requête, les plus pertinents d'abord, avec un extrait"""
+    if db.bind.dialect.name == "sqlite":
+        match = _fts5_query(query)
+        if not match:
+            return []
+        statement = text(f"""
+            SELECT s.document_id, s.dossier_id, s.filename, s.demandeur,
+                   snippet(search_index, -1, '[', ']', '…', {SNIPPET_TOKENS}) AS snippet,
+                   -bm25(search_index, {_BM25_WEIGHTS}) AS score,
+                   d.status, c.result
+            FROM search_index AS s
+            JOIN documents AS d ON d.id = s.document_id
+            LEFT JOIN classifications AS c ON c.document_id = s.document_id
+            WHERE search_index MATCH :match
+              AND s.rowid >= coalesce((
+                  SELECT rowid FROM search_index WHERE search_index MATCH :match
+                  ORDER BY rowid DESC LIMIT 1 OFFSET :window
+              ), 0)
+            ORDER BY bm25(search_index, {_BM25_WEIGHTS})
+            LIMIT :limit
+        """)
+        rows = (await db.execute(statement, {"match": match, "limit": limit, "window": RANK_WINDOW})).mappings().all()
+    else:
+        # Classement sur l'index GIN puis extraits calculés sur la seule page retenue
+        statement = text(f"""
+            SELECT ranked.document_id, ranked.dossier_id, ranked.filename, ranked.demandeur,
+                   ts_headline('french', coalesce(ranked.justification, '') || ' ' || coalesce(ranked.content, ''),
+                               ranked.query, 'StartSel=[, StopSel=], MaxWords={SNIPPET_TOKENS}, MinWords=5, MaxFragments=2') AS snippet,
+                   ranked.score, d.status, c.result
+            FROM (
+                SELECT candidates.*, ts_rank_cd(candidates.search_vector, candidates.query) AS score
+                FROM (
+                    SELECT s.*, q AS query
+                    FROM search_index AS s, websearch_to_tsquery('french', :query) AS q
+                    WHERE s.search_vector @@ q
+                    ORDER BY s.indexed_at DESC, s.document_id DESC
+                    LIMIT :window
+                ) AS candidates
+                ORDER BY score DESC
+                LIMIT :limit
+            ) AS ranked
+            JOIN documents AS d ON d.id = ranked.document_id
+            LEFT JOIN classifications AS c ON c.document_id = ranked.document_id
+            ORDER BY ranked.score DESC
+        """)
+        rows = (await db.execute(statement, {"query": query, "limit": limit, "window": RANK_WINDOW})).mappings().all()
+
+    return [
+        {
+            "document_id": row["document_id"],
+            "dossier_id": row["dossier_id"],
+            "filename": row["filename"],
+            "demandeur": row["demandeur"],
+            # Requête textuelle : les énumérations sont lues sous leur nom en base
+            "status": db_m.DocumentStatus[row["status"]].value,
+            "result": row["result"],
+            "snippet": row["snippet"],
+            "score": round(float(row["score"]), 4),
+        }
+        for row in rows
+    ]
+
+async def rebuild(session: AsyncSession) -> int:
+    """Réindexe tous les documents classifiés (texte relu depuis les fichiers), par lots"""
+    # Import local : document_service alimente lui-même l'index
+    from app.services.document_service import DocumentService
+
+    service = DocumentService(session)
+    await session.execute(text("DELETE FROM search_index"))
+
+    indexed = 0
+    last_id = ""
+    while True:
+        documents = (await session.execute(
+            select(db_m.Document)
+            .join(db_m.Classification)
+            .options(selectinload(db_m.Document.classification).options(
+                undefer(db_m.Classification.analysis_blob), undefer(db_m.Classification.legacy_analysis_steps)
+            ))
+            .where(db_m.Document.id > last_id)
+            .order_by(db_m.Document.id)
+            .limit(REBUILD_BATCH_SIZE)
+        )).scalars().all()
+        if not documents:
+            break
+
+        for document in documents:
+            try:
+                content = await asyncio.to_thread(service.read_document_content, document)
+            except Exception as e:
+                logger.warning(f"⚠️ Texte illisible, document indexé sans contenu ({document.id}): {e}")
+                content = None
+            classification = document.classification
+            fields = fields_from_analysis(
+                document.filename, content, classification.analysis_steps or {}, classification.justification
+            )
+            await index_document(session, document.id, document.dossier_id, fields)
+        indexed += len(documents)
+        last_id = documents[-1].id
+        # Libère les objets du lot (texte et état de l'analyse)
+        session.expunge_all()
+
+    logger.info(f"🔎 Index de recherche reconstruit: {indexed} document(s)")
+    return indexed
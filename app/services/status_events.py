@@ -0,0 +1,56 @@
+# app/services/status_events.py
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Événements conservés par abonné avant d'écarter les plus anciens (client trop lent)
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Statuts après lesquels plus aucune transition n'est attendue. Un échec qui sera retenté
+# repasse le document en "pending" (avec retry_in_seconds) : seul le dernier échec est "error"
+TERMINAL_STATUSES = {"completed", "needs_review", "error"}
+
+class StatusEventBus:
+    """Bus d'événements en mémoire : transitions de statut et progression par nœud, par document"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Tuple[asyncio.Queue, asyncio.AbstractEventLoop]]] = defaultdict(set)
+
+    @asynccontextmanager
+    async def subscribe(self, document_id: str) -> AsyncIterator[asyncio.Queue]:
+        """Abonne l'appelant aux événements d'un document le temps du bloc `async with`"""
+        subscriber = (asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE), asyncio.get_running_loop())
+        self._subscribers[document_id].add(subscriber)
+        try:
+            yield subscriber[0]
+        finally:
+            self._subscribers[document_id].discard(subscriber)
+            if not self._subscribers[document_id]:
+                del self._subscribers[document_id]
+
+    def publish(self, document_id: str, event: Dict[str, Any]) -> None:
+        """Diffuse un événement aux abonnés du document (utilisable depuis n'importe quel thread)"""
+        event = {"document_id": document_id, "timestamp": datetime.utcnow().isoformat(), **event}
+        for queue, loop in list(self._subscribers.get(document_id, ())):
+            loop.call_soon_threadsafe(_put_dropping_oldest, queue, event)
+
+    def publish_status(self, document_id: str, status: str, **extra: Any) -> None:
+        """Diffuse une transition de statut (PROCESSING, COMPLETED, NEEDS_REVIEW, ERROR)"""
+        self.publish(document_id, {"type": "status", "status": status, **extra})
+
+    def publish_progress(self, document_id: str, node: str, state: str = "started") -> None:
+        """Diffuse l'avancement d'un nœud du workflow d'analyse"""
+        self.publish(document_id, {"type": "progress", "node": node, "state": state})
+
+def _put_dropping_oldest(queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+# Instance unique du bus
+status_bus = StatusEventBus()
@@ -0,0 +1,300 @@
+# app/services/validated_neighbors.py
+"""
+Raccourci par les plus proches voisins validés.
+
+Chaque document analysé conserve le vecteur spaCy normalisé de son texte
+(table `document_embeddings`). Les vecteurs des documents dont la
+classification a été validée par un agent sont empilés en mémoire dans une
+matrice NumPy : une recherche est un produit matrice-vecteur (similarité
+cosinus) suivi d'une sélection partielle des k meilleurs.
+
+Chaque processus tient sa matrice, complétée avant chaque recherche par les
+validations apparues depuis la précédente et rechargée entièrement à
+intervalle régulier (documents supprimés, vecteurs recalculés).
+
+Quand les k voisins validés les plus proches dépassent tous le seuil,
+concordent et ont les mêmes types de pièces jointes, leur décision est
+proposée sans appel au LLM ; la classification est marquée
+`decision_source = "validated_neighbors"` pour l'audit.
+
+La similarité des vecteurs moyens rapproche deux courriers types quel que
+soit le demandeur : le délai et la qualité pour agir, propres à chaque
+demandeur, ne sont pas vérifiés. La décision proposée part donc toujours en
+révision, avec les dossiers voisins comme éléments de preuve.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import database_models as db_m
+from app.services.near_duplicates import attachment_types
+from app.services.nlp_service import nlp_service
+
+logger = logging.getLogger(__name__)
+
+# Origine de la décision enregistrée sur la classification
+DECISION_SOURCE_LLM = "llm"
+DECISION_SOURCE_NEIGHBORS = "validated_neighbors"
+
+# Marge de relecture des validations (horloges des répliques, commits tardifs)
+REFRESH_OVERLAP = timedelta(minutes=2)
+
+# Rechargement complet de la matrice (secondes)
+FULL_RELOAD_INTERVAL = 3600
+
+# Documents relus par lot lors d'une reconstruction complète
+REBUILD_BATCH_SIZE = 200
+
+# Modèle spaCy absent : le raccourci est désactivé pour la vie du processus
+_vectors_unavailable = False
+
+def _normalized(vector: np.ndarray) -> Optional[np.ndarray]:
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else None
+
+def _document_vector(content: str) -> Optional[np.ndarray]:
+    # Le modèle spaCy est chargé au premier vecteur calculé
+    return _normalized(nlp_service.document_vector(content))
+
+async def compute_vector(content: str) -> Optional[np.ndarray]:
+    """Vecteur normalisé du texte, None si le modèle spaCy est indisponible ou le texte sans mots pleins"""
+    global _vectors_unavailable
+    if _vectors_unavailable:
+        return None
+    try:
+        return await asyncio.to_thread(_document_vector, content)
+    except (ImportError, OSError) as e:
+        logger.warning(f"⚠️ Modèle spaCy indisponible, raccourci par dossiers validés désactivé: {e}")
+        _vectors_unavailable = True
+        return None
+
+async def store_vector(session: AsyncSession, document_id: str, vector: np.ndarray) -> None:
+    """Enregistre (ou remplace) le vecteur d'un document"""
+    await remove_document(session, document_id)
+    await session.execute(
+        insert(db_m.DocumentEmbedding).values(
+            document_id=document_id, model=settings.SPACY_MODEL, vector=vector.astype("<f4").tobytes()
+        )
+    )
+
+async def remove_document(session: AsyncSession, document_id: str) -> None:
+    await session.execute(delete(db_m.DocumentEmbedding).where(db_m.DocumentEmbedding.document_id == document_id))
+
+class ValidatedNeighborIndex:
+    """Vecteurs des documents validés, empilés dans une matrice (une ligne par validation)"""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._document_ids: List[str] = []
+        self._results: List[str] = []
+        self._validation_ids: List[str] = []
+        self._known: Set[str] = set()  # validations déjà chargées
+        self._watermark: Optional[datetime] = None
+        self._loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._document_ids)
+
+    async def refresh(self, db: AsyncSession) -> int:
+        """Ajoute les validations apparues depuis le dernier chargement ; retourne le nombre de lignes ajoutées"""
+        async with self._lock:
+            if time.monotonic() - self._loaded_at > FULL_RELOAD_INTERVAL:
+                self._reset()
+
+            Validation, Embedding = db_m.HumanValidation, db_m.DocumentEmbedding
+            query = (
+                select(
+                    Validation.id, Validation.validated_result, Validation.validation_date,
+                    db_m.Classification.document_id, Embedding.vector
+                )
+                .join(db_m.Classification, db_m.Classification.id == Validation.classification_id)
+                .join(Embedding, Embedding.document_id == db_m.Classification.document_id)
+                .where(Embedding.model == settings.SPACY_MODEL)
+            )
+            if self._watermark is not None:
+                query = query.where(Validation.validation_date >= self._watermark - REFRESH_OVERLAP)
+            rows = (await db.execute(query)).all()
+            if not rows:
+                return 0
+
+            self._watermark = max(row.validation_date for row in rows)
+            rows = [row for row in rows if row.id not in self._known]
+            if not rows:
+                return 0
+            # Document revalidé après une réanalyse : la nouvelle validation remplace l'ancienne
+            self.discard({row.document_id for row in rows})
+
+            vectors = np.stack([np.frombuffer(row.vector, dtype="<f4") for row in rows]).astype(np.float32)
+            self._matrix = vectors if not self._document_ids else np.vstack([self._matrix, vectors])
+            for row in rows:
+                self._known.add(row.id)
+                self._validation_ids.append(row.id)
+                self._document_ids.append(row.document_id)
+                self._results.append(row.validated_result.value)
+            return len(rows)
+
+    def discard(self, document_ids: Set[str]) -> None:
+        """Retire les validations de ces documents (réanalyse au résultat différent, revalidation)
+
+        Les autres processus ne les retirent qu'au prochain rechargement complet.
+        """
+        keep = [i for i, doc_id in enumerate(self._document_ids) if doc_id not in document_ids]
+        if len(keep) == len(self._document_ids):
+            return
+        self._matrix = self._matrix[keep] if keep else np.empty((0, 0), dtype=np.float32)
+        self._document_ids = [self._document_ids[i] for i in keep]
+        self._results = [self._results[i] for i in keep]
+        self._validation_ids = [self._validation_ids[i] for i in keep]
+        self._known = set(self._validation_ids)
+
+    def nearest(self, vector: np.ndarray, k: int, exclude_document_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """k voisins validés les plus proches (similarité cosinus décroissante)"""
+        if not self._document_ids or self._matrix.shape[1] != vector.shape[0]:
+            return []
+        similarities = self._matrix @ vector
+        if exclude_document_id is not None:
+            # Une réanalyse ne se sert pas de sa propre validation
+            similarities[[i for i, doc_id in enumerate(self._document_ids) if doc_id == exclude_document_id]] = -1.0
+        k = min(k, similarities.shape[0])
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [
+            {
+                "document_id": self._document_ids[i],
+                "validated_result": self._results[i],
+                "similarity": round(float(similarities[i]), 4),
+            }
+            for i in top
+            if similarities[i] > -1.0
+        ]
+
+# Index du processus
+validated_index = ValidatedNeighborIndex()
+
+async def _neighbor_attachment_types(db: AsyncSession, document_ids: List[str]) -> Dict[str, Optional[List[str]]]:
+    """Types triés des pièces du dossier de chaque document (None pour un document hors dossier)"""
+    Document = db_m.Document
+    dossiers = dict((await db.execute(
+        select(Document.id, Document.dossier_id).where(Document.id.in_(document_ids))
+    )).all())
+    types = defaultdict(list)
+    rows = await db.execute(
+        select(Document.dossier_id, Document.attachment_type)
+        .where(Document.dossier_id.in_([dossier_id for dossier_id in dossiers.values() if dossier_id]),
+               Document.attachment_type.is_not(None))
+    )
+    for dossier_id, attachment_type in rows:
+        types[dossier_id].append(attachment_type)
+    return {
+        document_id: sorted(types[dossier_id]) if dossier_id else None
+        for document_id, dossier_id in dossiers.items()
+    }
+
+async def find_shortcut(
+    db: AsyncSession,
+    document_id: str,
+    vector: np.ndarray,
+    attachments_inventory: Optional[List[Dict[str, Any]]] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """Voisins validés justifiant de proposer leur décision (au-delà du seuil, concordants, mêmes pièces), sinon None"""
+    try:
+        await validated_index.refresh(db)
+    except Exception as e:
+        logger.warning(f"⚠️ Index des dossiers validés indisponible: {e}")
+        return None
+
+    neighbors = validated_index.nearest(vector, settings.NN_SHORTCUT_NEIGHBORS, exclude_document_id=document_id)
+    if len(neighbors) < settings.NN_SHORTCUT_NEIGHBORS:
+        return None
+    if any(neighbor["similarity"] < settings.NN_SHORTCUT_THRESHOLD for neighbor in neighbors):
+        return None
+    if len({neighbor["validated_result"] for neighbor in neighbors}) != 1:
+        return None
+    # Le critère des pièces dépend de l'inventaire : mêmes types de pièces que chaque voisin
+    expected = attachment_types(attachments_inventory)
+    neighbor_types = await _neighbor_attachment_types(db, [neighbor["document_id"] for neighbor in neighbors])
+    if any(neighbor_types.get(neighbor["document_id"]) != expected for neighbor in neighbors):
+        return None
+    return neighbors
+
+def shortcut_analysis(
+    neighbors: List[Dict[str, Any]],
+    attachments_inventory: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """État d'analyse proposant la décision concordante des voisins validés (aucun critère analysé, révision requise)"""
+    similarity = min(neighbor["similarity"] for neighbor in neighbors)
+    references = ", ".join(neighbor["document_id"] for neighbor in neighbors)
+    return {
+        "final_classification": neighbors[0]["validated_result"],
+        "final_justification": (
+            f"Décision proposée d'après {len(neighbors)} dossiers validés quasi identiques "
+            f"(similarité ≥ {similarity:.1%}) : {references}"
+        ),
+        "final_confidence": similarity,
+        # Délai et qualité pour agir propres au demandeur : un agent confirme la décision
+        "is_review_required": True,
+        "critical_issues": ["Délai et qualité pour agir non vérifiés : décision proposée d'après des dossiers validés"],
+        "attachments_inventory": attachments_inventory,
+        "decision_source": DECISION_SOURCE_NEIGHBORS,
+        "validated_neighbors": neighbors,
+        "analysis_summary": {
+            "total_criteria": 0,
+            "compliant_criteria": 0,
+            "average_confidence": similarity,
+            "decision_timestamp": datetime.utcnow().isoformat()
+        }
+    }
+
+async def rebuild(session: AsyncSession) -> int:
+    """Recalcule les vecteurs de tous les documents classifiés (texte relu depuis les fichiers), par lots"""
+    # Import local : document_service alimente lui-même l'index
+    from app.services.document_service import DocumentService
+
+    service = DocumentService(session)
+    await session.execute(delete(db_m.DocumentEmbedding))
+
+    stored = 0
+    last_id = ""
+    while True:
+        documents = (await session.execute(
+            select(db_m.Document)
+            .join(db_m.Classification)
+            .where(db_m.Document.id > last_id)
+            .order_by(db_m.Document.id)
+            .limit(REBUILD_BATCH_SIZE)
+        )).scalars().all()
+        if not documents:
+            break
+
+        readable, contents = [], []
+        for document in documents:
+            try:
+                contents.append(await asyncio.to_thread(service.read_document_content, document))
+                readable.append(document.id)
+            except Exception as e:
+                logger.warning(f"⚠️ Texte illisible, document sans vecteur ({document.id}): {e}")
+
+        # Un nlp.pipe par lot (NLP_N_PROCESS processus) ; sans modèle spaCy, l'erreur interrompt la reconstruction
+        vectors = await asyncio.to_thread(nlp_service.document_vectors, contents) if contents else []
+        for document_id, vector in zip(readable, vectors):
+            vector = _normalized(vector)
+            if vector is not None:
+                await store_vector(session, document_id, vector)
+                stored += 1
+        last_id = documents[-1].id
+        session.expunge_all()
+
+    logger.info(f"🧭 Vecteurs des documents recalculés: {stored} document(s)")
+    return stored
@@ -0,0 +1,97 @@
+# app/services/validation_history.py
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models import database_models as db_m
+from app.utils.pagination import before_cursor, cursor_key, split_page
+
+logger = logging.getLogger(__name__)
+
+# Lignes lues par requête lors d'un export (une transaction courte par lot)
+EXPORT_BATCH_SIZE = 1000
+
+def _history_query(validator_id: Optional[str], cursor: Optional[str]) -> Select:
+    """Projection des seules colonnes exposées, triée par (validation_date, id) décroissants"""
+    HumanValidation, Classification, Document = db_m.HumanValidation, db_m.Classification, db_m.Document
+    query = (
+        select(
+            HumanValidation.id, HumanValidation.validated_result, HumanValidation.is_ia_correct,
+            HumanValidation.notes, HumanValidation.validation_date, HumanValidation.validator_id,
+            Classification.result, Classification.confidence_score,
+            Document.id.label("document_id"), Document.filename, Document.upload_date,
+            cursor_key(HumanValidation.validation_date),
+        )
+        .join(Classification, HumanValidation.classification_id == Classification.id)
+        .join(Document, Classification.document_id == Document.id)
+    )
+
+    if validator_id:
+        query = query.where(HumanValidation.validator_id == validator_id)
+
+    after = before_cursor(HumanValidation.validation_date, HumanValidation.id, cursor)
+    if after is not None:
+        query = query.where(after)
+
+    return query.order_by(HumanValidation.validation_date.desc(), HumanValidation.id.desc())
+
+def format_entry(row: Any) -> Dict[str, Any]:
+    """Représentation JSON d'une ligne d'historique (API et export)"""
+    return {
+        "validation_id": row.id,
+        "document": {
+            "id": row.document_id,
+            "filename": row.filename,
+            "upload_date": row.upload_date.isoformat() if row.upload_date else None
+        },
+        "original_classification": {
+            "result": row.result.value if row.result else None,
+            "confidence": float(row.confidence_score) if row.confidence_score else 0.0
+        },
+        "validation": {
+            "result": row.validated_result.value,
+            "is_ia_correct": row.is_ia_correct,
+            "notes": row.notes,
+            "validated_at": row.validation_date.isoformat(),
+            "validator_id": row.validator_id
+        }
+    }
+
+async def list_history(
+    db: AsyncSession,
+    limit: int,
+    validator_id: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Page de l'historique (plus récentes d'abord) et curseur de la page suivante"""
+    rows = (await db.execute(_history_query(validator_id, cursor).limit(limit + 1))).all()
+    rows, next_cursor = split_page(rows, limit, "id")
+    return [format_entry(row) for row in rows], next_cursor
+
+async def iter_history(
+    validator_id: Optional[str] = None,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[Dict[str, Any]]:
+    """Parcourt tout l'historique par lots pour l'export, sans le charger en mémoire
+
+    Chaque lot est lu dans sa propre session : aucune transaction ni connexion
+    n'est gardée ouverte pendant que le client consomme le flux.
+    """
+    cursor = None
+    exported = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(_history_query(validator_id, cursor).limit(batch_size + 1))).all()
+        rows, cursor = split_page(rows, batch_size, "id")
+
+        for row in rows:
+            yield format_entry(row)
+        exported += len(rows)
+
+        if cursor is None:
+            break
+
+    logger.info(f"📤 Export de l'historique des validations: {exported} ligne(s)")
@@ -0,0 +1,129 @@
+# app/services/validation_stats.py
+import logging
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Integer, cast, delete, exists, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import database_models as db_m
+from app.models.enums import ClassificationResult
+
+logger = logging.getLogger(__name__)
+
+# Nombre de validateurs retournés dans le classement
+TOP_VALIDATORS = 5
+
+_UPSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+# ===== MAINTENANCE (appelée dans la transaction de la validation) =====
+
+async def record_validation(
+    session: AsyncSession,
+    validator_id: str,
+    validated_result: ClassificationResult,
+    is_ia_correct: bool,
+    day: Optional[date] = None
+) -> None:
+    """Incrémente le compteur du jour pour ce validateur et ce résultat"""
+    Stats = db_m.ValidationStatsDaily
+    values = {
+        "day": day or datetime.utcnow().date(),
+        "validator_id": validator_id,
+        "validated_result": validated_result,
+        "total": 1,
+        "correct": int(is_ia_correct),
+    }
+
+    upsert = _UPSERTS.get(session.bind.dialect.name)
+    if upsert is None:
+        # Autres bases : lecture puis écriture (sérialisé par l'écrivain unique)
+        row = await session.get(Stats, (values["day"], validator_id, validated_result))
+        if row is None:
+            session.add(Stats(**values))
+        else:
+            row.total += 1
+            row.correct += values["correct"]
+        return
+
+    statement = upsert(Stats).values(**values)
+    await session.execute(statement.on_conflict_do_update(
+        index_elements=[Stats.day, Stats.validator_id, Stats.validated_result],
+        set_={"total": Stats.total + 1, "correct": Stats.correct + statement.excluded.correct},
+    ))
+
+async def rebuild(session: AsyncSession) -> int:
+    """Recalcule tous les agrégats à partir de human_validations"""
+    HumanValidation = db_m.HumanValidation
+    validation_day = func.date(HumanValidation.validation_date)
+
+    # Suppression en premier : sur SQLite, le verrou d'écriture est pris avant la lecture
+    await session.execute(delete(db_m.ValidationStatsDaily))
+    rows = (await session.execute(
+        select(
+            validation_day,
+            HumanValidation.validator_id,
+            HumanValidation.validated_result,
+            func.count(HumanValidation.id),
+            func.sum(cast(HumanValidation.is_ia_correct, Integer)),
+        ).group_by(validation_day, HumanValidation.validator_id, HumanValidation.validated_result)
+    )).all()
+
+    if rows:
+        await session.execute(insert(db_m.ValidationStatsDaily), [
+            {
+                # SQLite renvoie la date sous forme de texte
+                "day": date.fromisoformat(day) if isinstance(day, str) else day,
+                "validator_id": validator_id,
+                "validated_result": validated_result,
+                "total": total,
+                "correct": correct or 0,
+            }
+            for day, validator_id, validated_result, total, correct in rows
+        ])
+
+    logger.info(f"📊 Statistiques de validation reconstruites: {len(rows)} agrégat(s)")
+    return len(rows)
+
+async def backfill_if_empty(session: AsyncSession) -> None:
+    """Calcule les agrégats au premier démarrage après la création de la table"""
+    has_stats = await session.scalar(select(exists().select_from(db_m.ValidationStatsDaily)))
+    if has_stats:
+        return
+    has_validations = await session.scalar(select(exists().select_from(db_m.HumanValidation)))
+    if has_validations:
+        await rebuild(session)
+        await session.commit()
+
+# ===== LECTURE =====
+
+async def get_stats(db: AsyncSession, days: int) -> Dict[str, Any]:
+    """Statistiques sur les `days` derniers jours (jour courant inclus) en une requête sur les agrégats"""
+    Stats = db_m.ValidationStatsDaily
+    # days=1 : aujourd'hui seulement (jours UTC pleins, le jour courant compte pour un)
+    start_day = datetime.utcnow().date() - timedelta(days=days - 1)
+
+    rows = (await db.execute(
+        select(Stats.validator_id, Stats.validated_result, func.sum(Stats.total), func.sum(Stats.correct))
+        .where(Stats.day >= start_day)
+        .group_by(Stats.validator_id, Stats.validated_result)
+    )).all()
+
+    by_result: Counter = Counter()
+    by_validator: Counter = Counter()
+    total = correct = 0
+    for validator_id, validated_result, row_total, row_correct in rows:
+        by_result[validated_result] += row_total
+        by_validator[validator_id] += row_total
+        total += row_total
+        correct += row_correct
+
+    return {
+        "total_validations": total,
+        "correct_predictions": correct,
+        "validation_results": by_result,
+        "top_validators": by_validator.most_common(TOP_VALIDATORS),
+    }
@@ -0,0 +1,150 @@
+# app/services/write_queue.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.database import AsyncSessionLocal, async_engine
+
+logger = logging.getLogger(__name__)
+
+# Écriture à appliquer dans la session du writer (ne doit pas faire de commit)
+WriteOperation = Callable[[AsyncSession], Awaitable[Any]]
+
+class WriteQueue:
+    """Écrivain unique avec commit groupé (group commit)
+
+    Les écritures soumises sont regroupées pendant quelques millisecondes (ou
+    jusqu'à N opérations) puis validées en une seule transaction. Sur SQLite,
+    un seul écrivain à la fois détient le verrou : regrouper supprime les
+    erreurs "database is locked" et divise le nombre de fsync. L'appelant
+    attend le commit : le résultat n'est rendu qu'une fois l'écriture durable.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        max_batch: int = 64,
+        window_ms: int = 5,
+        session_factory: async_sessionmaker = AsyncSessionLocal
+    ):
+        self.enabled = enabled
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    async def submit(self, operation: WriteOperation) -> Any:
+        """Applique une écriture et retourne son résultat après commit"""
+        if not self.enabled:
+            async with self.session_factory() as session:
+                result = await operation(session)
+                await session.commit()
+                return result
+
+        self._ensure_writer()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((operation, future))
+        return await future
+
+    def _ensure_writer(self) -> None:
+        # Le writer vit dans la boucle d'événements courante (API, worker dédié ou tests)
+        if self._writer is None or self._writer.done() or self._writer.get_loop() is not asyncio.get_running_loop():
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._run(self._queue))
+
+    async def stop(self) -> None:
+        """Valide les écritures en attente puis arrête le writer"""
+        if self._writer is None or self._writer.done():
+            return
+        await self._queue.put(None)
+        await self._writer
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is None:
+                break
+            batch: List[Tuple[WriteOperation, asyncio.Future]] = [item]
+
+            # Fenêtre de regroupement : on accumule jusqu'à max_batch ou l'expiration de la fenêtre
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                await self._commit_batch(batch)
+            except BaseException as e:
+                # Écritures soumises entre-temps : le prochain submit démarre un nouveau writer
+                pending = []
+                while not queue.empty():
+                    item = queue.get_nowait()
+                    if item is not None:
+                        pending.append(item)
+                _fail_all(pending, e)
+                raise
+
+    async def _commit_batch(self, batch: List[Tuple[WriteOperation, asyncio.Future]]) -> None:
+        try:
+            async with self.session_factory() as session:
+                results = [await operation(session) for operation, _ in batch]
+                await session.commit()
+        except Exception as e:
+            if len(batch) == 1:
+                _resolve(batch[0][1], error=e)
+                return
+            # Une opération a fait échouer le lot : chaque écriture repasse seule pour isoler l'erreur
+            logger.warning(f"⚠️ Lot de {len(batch)} écriture(s) annulé ({e}), reprise une par une")
+            for item in batch:
+                await self._commit_batch([item])
+            return
+        except BaseException as e:
+            # Annulation du writer ou arrêt du processus : les appelants du lot ne restent pas en attente
+            _fail_all(batch, e)
+            raise
+
+        for (_, future), result in zip(batch, results):
+            _resolve(future, result=result)
+
+def _resolve(future: asyncio.Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+    # L'appelant a pu abandonner l'attente (annulation) : le résultat est alors ignoré
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+def _fail_all(batch: List[Tuple[WriteOperation, asyncio.Future]], cause: BaseException) -> None:
+    # CancelledError n'est pas transmise telle quelle : l'appelant croirait avoir été lui-même annulé
+    error = cause if isinstance(cause, Exception) else RuntimeError(f"Écriture interrompue ({type(cause).__name__})")
+    for _, future in batch:
+        _resolve(future, error=error)
+
+def _write_queue_enabled() -> bool:
+    if settings.WRITE_QUEUE_ENABLED is not None:
+        return settings.WRITE_QUEUE_ENABLED
+    # Par défaut uniquement sur SQLite : PostgreSQL gère bien les écrivains concurrents
+    return async_engine.dialect.name == "sqlite"
+
+# Instance unique du writer
+write_queue = WriteQueue(
+    enabled=_write_queue_enabled(),
+    max_batch=settings.WRITE_QUEUE_MAX_BATCH,
+    window_ms=settings.WRITE_QUEUE_WINDOW_MS
+)
@@ -0,0 +1,151 @@
+# app/utils/ddsketch.py
+"""
+Esquisse de quantiles DDSketch (Masson, Rim et Lee, VLDB 2019).
+
+Chaque valeur positive est comptée dans le seau ceil(log_gamma(x)) : tout
+quantile est restitué à `relative_accuracy` près (en relatif), et deux
+esquisses de même précision se fusionnent en additionnant leurs seaux.
+La taille ne dépend que de l'étendue des valeurs (au plus `max_bins`
+seaux), jamais de leur nombre.
+"""
+import math
+import struct
+from typing import Dict, Optional
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BINS = 2048
+
+# En deçà, les valeurs sont comptées comme nulles (log non défini)
+MIN_INDEXABLE_VALUE = 1e-9
+
+# Version, précision, seaux max, compte des zéros, compte, somme, min, max, nombre de seaux
+_HEADER = struct.Struct("<BdIQQdddI")
+_FORMAT_VERSION = 1
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def _read_varint(data: bytes, offset: int):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+class DDSketch:
+    """Esquisse de quantiles fusionnable à erreur relative bornée"""
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY, max_bins: int = DEFAULT_MAX_BINS):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy doit être dans ]0, 1[")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        # Point du seau ]gamma^(k-1), gamma^k] à erreur relative minimale
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value < 0:
+            raise ValueError("DDSketch n'accepte que des valeurs positives")
+        if value < MIN_INDEXABLE_VALUE:
+            self.zero_count += count
+        else:
+            key = self._key(value)
+            self.bins[key] = self.bins.get(key, 0) + count
+            self._collapse()
+        self.count += count
+        self.sum += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "DDSketch") -> None:
+        if other.gamma != self.gamma:
+            raise ValueError("Esquisses de précisions différentes")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _collapse(self) -> None:
+        """Au-delà de `max_bins`, les seaux les plus bas sont regroupés (les hauts quantiles restent exacts)"""
+        excess = len(self.bins) - self.max_bins
+        if excess <= 0:
+            return
+        keys = sorted(self.bins)
+        target = keys[excess]
+        self.bins[target] += sum(self.bins.pop(key) for key in keys[:excess])
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Valeur au quantile `q` (0 à 1), None si l'esquisse est vide"""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        cumulative = self.zero_count
+        for key in sorted(self.bins):
+            cumulative += self.bins[key]
+            if cumulative > rank:
+                return min(max(self._value(key), self.min), self.max)
+        return self.max
+
+    @property
+    def average(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def to_bytes(self) -> bytes:
+        """Sérialisation compacte : en-tête fixe puis (écart de clé, effectif) en varints"""
+        buffer = bytearray(_HEADER.pack(
+            _FORMAT_VERSION, self.relative_accuracy, self.max_bins, self.zero_count,
+            self.count, self.sum, self.min, self.max, len(self.bins)
+        ))
+        previous = None
+        for key in sorted(self.bins):
+            if previous is None:
+                # Première clé en zigzag (valeurs < 1 : clés négatives)
+                _write_varint(buffer, (key << 1) ^ (key >> 63))
+            else:
+                _write_varint(buffer, key - previous)
+            _write_varint(buffer, self.bins[key])
+            previous = key
+        return bytes(buffer)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DDSketch":
+        (version, relative_accuracy, max_bins, zero_count,
+         count, total, minimum, maximum, bin_count) = _HEADER.unpack_from(data)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"Version d'esquisse inconnue: {version}")
+        sketch = cls(relative_accuracy, max_bins)
+        sketch.zero_count, sketch.count, sketch.sum = zero_count, count, total
+        sketch.min, sketch.max = minimum, maximum
+
+        offset = _HEADER.size
+        key = None
+        for _ in range(bin_count):
+            encoded, offset = _read_varint(data, offset)
+            key = ((encoded >> 1) ^ -(encoded & 1)) if key is None else key + encoded
+            sketch.bins[key], offset = _read_varint(data, offset)
+        return sketch
@@ -0,0 +1,112 @@
+# app/utils/encoding_utils.py
+import codecs
+import mmap
+from collections import Counter
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+# Au-delà de cette taille, le fichier est projeté en mémoire (mmap) plutôt que lu
+MMAP_THRESHOLD_BYTES = 1024 * 1024
+
+# Taille de l'échantillon utilisé pour l'heuristique de fréquence des octets
+HEURISTIC_SAMPLE_BYTES = 256 * 1024
+
+# Marques d'ordre d'octets (BOM), de la plus longue à la plus courte
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+# Encodages 8 bits candidats pour les documents français hors UTF-8
+_SINGLE_BYTE_CANDIDATES = ["cp1252", "cp850", "iso-8859-1"]
+
+# Caractères attendus dans un texte juridique français
+_FRENCH_CHARS = set("àâäçéèêëîïôöùûüÿœæÀÂÄÇÉÈÊËÎÏÔÖÙÛÜŸŒÆ«»’‘“”€…–—°")
+
+_ASCII_BYTES = bytes(range(0x80))
+
+
+def detect_bom(head: bytes) -> Optional[str]:
+    """Retourne l'encodage annoncé par une marque d'ordre d'octets (BOM), s'il y en a une"""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    return None
+
+
+def _guess_single_byte_encoding(data: bytes) -> str:
+    """Choisit l'encodage 8 bits dont le décodage ressemble le plus à du français"""
+    high_bytes = Counter(bytes(data).translate(None, _ASCII_BYTES))
+    best_encoding, best_score = _SINGLE_BYTE_CANDIDATES[0], float("-inf")
+    for encoding in _SINGLE_BYTE_CANDIDATES:
+        score = 0
+        for byte, count in high_bytes.items():
+            char = bytes([byte]).decode(encoding, errors="replace")
+            if char in _FRENCH_CHARS:
+                score += count
+            elif not char.isprintable() or char == "�":
+                score -= 2 * count
+            elif not char.isalpha():
+                # Symboles graphiques (cadres DOS, signes rares) : peu probables
+                score -= count
+        if score > best_score:
+            best_encoding, best_score = encoding, score
+
+    return best_encoding
+
+
+def decode_bytes(data: Union[bytes, mmap.mmap]) -> Tuple[str, str]:
+    """
+    Détecte l'encodage d'un contenu brut et le décode en une seule passe.
+
+    Ordre de détection : BOM, validité UTF-8 (le décodage sert de validation),
+    puis heuristique de fréquence des octets non ASCII pour départager
+    cp1252, cp850 et iso-8859-1.
+
+    Args:
+        data: Contenu brut du fichier (bytes ou projection mmap)
+
+    Returns:
+        Tuple[str, str]: Le texte décodé et l'encodage retenu
+    """
+    encoding = detect_bom(data[:4])
+    if encoding:
+        return str(data, encoding, errors="replace"), encoding
+
+    try:
+        return str(data, "utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    encoding = _guess_single_byte_encoding(data[:HEURISTIC_SAMPLE_BYTES])
+    return str(data, encoding, errors="replace"), encoding
+
+
+def read_text_file(file_path: Path) -> Tuple[str, str]:
+    """
+    Lit un fichier texte une seule fois en octets et le décode.
+
+    Les fichiers volumineux sont projetés en mémoire pour éviter une copie
+    intermédiaire du contenu brut.
+
+    Args:
+        file_path: Chemin du fichier à lire
+
+    Returns:
+        Tuple[str, str]: Le texte décodé et l'encodage détecté
+    """
+    with open(file_path, "rb") as f:
+        size = f.seek(0, 2)
+        f.seek(0)
+
+        if size == 0:
+            return "", "utf-8"
+
+        if size < MMAP_THRESHOLD_BYTES:
+            return decode_bytes(f.read())
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return decode_bytes(mm)
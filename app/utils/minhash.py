@@ -0,0 +1,98 @@
+# app/utils/minhash.py
+"""
+Signatures MinHash et clés LSH pour repérer les textes quasi identiques.
+
+Le texte est normalisé (minuscules, sans accents, nombres remplacés par `0`)
+puis découpé en bardeaux de `shingle_size` mots. Chaque permutation est une
+fonction de hachage universelle `(a * x + b) mod p`, évaluée pour tous les
+bardeaux à la fois avec NumPy. La similarité de Jaccard de deux textes est
+estimée par la part de composantes égales de leurs signatures.
+
+Pour l'index, la signature est coupée en `bands` bandes : deux textes de
+similarité s partagent au moins une clé de bande avec la probabilité
+1 - (1 - s^r)^b (r lignes par bande).
+"""
+import hashlib
+import re
+import unicodedata
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+# Nombre premier supérieur à 2^32 : a * x + b (a, b, x < 2^32) tient dans un uint64
+_PRIME = np.uint64(4294967311)
+
+# Bardeaux traités par bloc (matrice permutations x bardeaux bornée en mémoire)
+_CHUNK_SIZE = 4096
+
+_WORD = re.compile(r"\w+")
+_NUMBER = re.compile(r"\d+")
+
+def normalize_text(text: str) -> List[str]:
+    """Mots du texte en minuscules, sans accents, dates et montants ramenés à `0`"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _WORD.findall(_NUMBER.sub("0", text))
+
+class MinHasher:
+    """Calcule signatures MinHash et clés de bandes LSH (paramètres fixes pour tout l'index)"""
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, shingle_size: int = 3, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) doit être un multiple de bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 32, size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, 2 ** 32, size=num_perm, dtype=np.uint64)[:, None]
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Empreintes 32 bits distinctes des bardeaux du texte"""
+        words = normalize_text(text)
+        if not words:
+            return np.empty(0, dtype=np.uint64)
+        size = min(self.shingle_size, len(words))
+        hashes = np.fromiter(
+            (zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)),
+            dtype=np.uint64
+        )
+        return np.unique(hashes)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Signature MinHash (uint64, `num_perm` composantes), None pour un texte sans mots"""
+        shingles = self.shingles(text)
+        if shingles.size == 0:
+            return None
+        signature = np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        for start in range(0, shingles.size, _CHUNK_SIZE):
+            chunk = shingles[None, start:start + _CHUNK_SIZE]
+            hashed = (self._a * chunk + self._b) % _PRIME
+            np.minimum(signature, hashed.min(axis=1), out=signature)
+        return signature
+
+    def band_keys(self, signature: np.ndarray) -> List[int]:
+        """Une clé signée 64 bits par bande (l'indice de bande fait partie de la clé)"""
+        keys = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(band.to_bytes(2, "big") + rows.astype("<u8").tobytes(), digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "big", signed=True))
+        return keys
+
+    @staticmethod
+    def similarity(left: np.ndarray, right: np.ndarray) -> float:
+        """Similarité de Jaccard estimée entre deux signatures"""
+        if left.shape != right.shape:
+            return 0.0
+        return float(np.mean(left == right))
+
+    @staticmethod
+    def to_bytes(signature: np.ndarray) -> bytes:
+        return signature.astype("<u8").tobytes()
+
+    @staticmethod
+    def from_bytes(data: bytes) -> np.ndarray:
+        return np.frombuffer(data, dtype="<u8").astype(np.uint64)
@@ -0,0 +1,87 @@
+# app/utils/pagination.py
+"""
+Curseurs opaques pour la pagination par clé (keyset) sur (horodatage, id).
+
+Contrairement à OFFSET, la page suivante est une simple recherche dans
+l'index à partir du dernier élément vu : son coût ne dépend pas de la
+profondeur de la page.
+"""
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import DateTime, String, bindparam, tuple_, type_coerce
+from sqlalchemy.sql.elements import ColumnElement, Label
+from sqlalchemy.types import TypeDecorator
+
+# Nom de la colonne projetée portant l'horodatage du curseur
+CURSOR_KEY = "cursor_key"
+
+class _StoredTimestamp(TypeDecorator):
+    """Horodatage tel qu'il est stocké en base
+
+    SQLite conserve les dates sous forme de texte, dont le format dépend de
+    l'écrivain (CURRENT_TIMESTAMP sans fraction de seconde, SQLAlchemy avec
+    microsecondes). Le curseur reprend donc le texte stocké : une date
+    reformatée ne serait pas comparée correctement aux lignes de même instant.
+    """
+    impl = String
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(String())
+        return dialect.type_descriptor(DateTime(timezone=True))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == "sqlite":
+            return value
+        return datetime.fromisoformat(value)
+
+    def process_result_value(self, value, dialect):
+        return value.isoformat() if isinstance(value, datetime) else value
+
+def encode_cursor(timestamp: Union[str, datetime], row_id: str) -> str:
+    """Encode la position du dernier élément d'une page"""
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.isoformat()
+    raw = f"{timestamp}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Décode un curseur ; lève ValueError s'il est invalide"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+        datetime.fromisoformat(timestamp)
+        return timestamp, row_id
+    except Exception as e:
+        raise ValueError(f"Curseur de pagination invalide: {cursor}") from e
+
+def cursor_key(timestamp_column: ColumnElement) -> Label:
+    """Colonne à ajouter à la projection pour construire le curseur de la page suivante"""
+    return type_coerce(timestamp_column, _StoredTimestamp()).label(CURSOR_KEY)
+
+def before_cursor(
+    timestamp_column: ColumnElement,
+    id_column: ColumnElement,
+    cursor: Optional[str]
+) -> Optional[ColumnElement]:
+    """Condition « après le curseur » pour un tri (horodatage, id) décroissant (None sans curseur)"""
+    position = decode_cursor(cursor)
+    if position is None:
+        return None
+    timestamp, row_id = position
+    return tuple_(timestamp_column, id_column) < tuple_(
+        bindparam(None, timestamp, type_=_StoredTimestamp()), row_id
+    )
+
+def split_page(rows: Sequence[Any], limit: int, id_key: str) -> Tuple[List[Any], Optional[str]]:
+    """Coupe une page lue avec `limit + 1` lignes et calcule le curseur de la page suivante"""
+    if len(rows) <= limit:
+        return list(rows), None
+    page = list(rows[:limit])
+    last = page[-1]
+    return page, encode_cursor(getattr(last, CURSOR_KEY), getattr(last, id_key))
@@ -0,0 +1,63 @@
+# app/utils/quote_index.py
+"""
+Index des n-grammes de mots d'un document, pour vérifier les citations.
+
+Le texte est normalisé (minuscules, sans accents ni ponctuation, espaces
+réduits) puis tous ses n-grammes de 1 à `n` mots sont hachés dans un
+ensemble, construit une fois par document. Vérifier une citation coûte une
+recherche par n-gramme de la citation, quelle que soit la longueur du
+document.
+
+La vérification est approximative : la couverture est la part des mots de
+la citation qui appartiennent à au moins un de ses n-grammes présents dans
+le document. Un mot changé ou une faute de frappe ne fait perdre que ce mot
+(avec des bigrammes, n = 2), et les coupures (« ... ») ne comptent pas ; une
+citation inventée tombe près de zéro. Un `n` plus grand est plus strict :
+chaque écart retire aussi les mots voisins de la couverture.
+"""
+import re
+import unicodedata
+from typing import List, Optional
+
+_WORD = re.compile(r"\w+")
+
+# Coupures d'une citation en extraits : points de suspension, crochets
+_ELLIPSIS = re.compile(r"\[\s*(?:\.\s*){2,}\]|\[…\]|(?:\.\s*){3,}|…")
+
+def normalize_words(text: str) -> List[str]:
+    """Mots du texte en minuscules et sans accents (nombres conservés)"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _WORD.findall(text)
+
+class QuoteIndex:
+    """Ensemble des n-grammes (1 à `n` mots) d'un document"""
+
+    def __init__(self, text: str, n: int = 2):
+        self.n = n
+        words = normalize_words(text)
+        self._grams = {
+            hash(tuple(words[i:i + size]))
+            for size in range(1, n + 1)
+            for i in range(len(words) - size + 1)
+        }
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def coverage(self, quote: str) -> Optional[float]:
+        """Part des mots de la citation couverts par un n-gramme présent dans le document, None pour une citation vide"""
+        found = total = 0
+        for fragment in _ELLIPSIS.split(quote):
+            words = normalize_words(fragment)
+            if not words:
+                continue
+            # Un extrait plus court que n est cherché d'un bloc
+            size = min(self.n, len(words))
+            covered = [False] * len(words)
+            for i in range(len(words) - size + 1):
+                if hash(tuple(words[i:i + size])) in self._grams:
+                    covered[i:i + size] = [True] * size
+            total += len(words)
+            found += sum(covered)
+        return found / total if total else None
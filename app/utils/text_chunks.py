@@ -0,0 +1,33 @@
+# app/utils/text_chunks.py
+"""
+Découpage des textes longs en morceaux de taille bornée.
+
+spaCy refuse les textes plus longs que `nlp.max_length` et sa mémoire croît
+avec la longueur du texte : les courriers volumineux sont traités par
+morceaux, coupés de préférence entre paragraphes pour ne pas couper une
+phrase (ni une entité). Chaque morceau garde son décalage dans le texte
+d'origine pour y replacer les positions des entités.
+"""
+from typing import List, Tuple
+
+# Coupures préférées, de la plus à la moins naturelle
+_SEPARATORS = ("\n\n", "\n", " ")
+
+def split_paragraphs(text: str, max_chars: int) -> List[Tuple[int, str]]:
+    """Morceaux (décalage, texte) d'au plus `max_chars` caractères, qui recomposent le texte"""
+    if max_chars <= 0:
+        raise ValueError(f"max_chars ({max_chars}) doit être positif")
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            for separator in _SEPARATORS:
+                # Le séparateur reste en fin de morceau
+                cut = text.rfind(separator, start, end - len(separator) + 1)
+                if cut > start:
+                    end = cut + len(separator)
+                    break
+        chunks.append((start, text[start:end]))
+        start = end
+    return chunks or [(0, text)]
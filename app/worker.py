@@ -0,0 +1,179 @@
+# app/worker.py
+"""
+Worker d'analyse : consomme la file d'attente persistante des analyses.
+
+Usage :
+    python -m app.worker --concurrency 4
+
+Les workers peuvent tourner sur d'autres machines que l'API : ils partagent
+seulement la base de données (ou Redis si JOB_QUEUE_BACKEND=redis).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.database import async_engine
+from app.services import document_service, dossier_service
+from app.services.job_queue import (
+    JOB_KIND_DOCUMENT,
+    JOB_KIND_DOSSIER,
+    Job,
+    JobQueue,
+    get_job_queue,
+    purge_completed_jobs,
+    requeue_orphans,
+    running_job,
+)
+from app.services.nlp_service import nlp_service
+from app.services.write_queue import write_queue
+
+logger = logging.getLogger(__name__)
+
+# Intervalle (s) entre deux purges des jobs terminés
+PURGE_INTERVAL_SECONDS = 3600
+
+# Intervalle (s) entre deux recherches de documents et dossiers PENDING restés sans job
+ORPHAN_SWEEP_INTERVAL_SECONDS = 300
+
+# Traitement associé à chaque type de job
+JOB_HANDLERS: Dict[str, Callable[[str], Awaitable[None]]] = {
+    JOB_KIND_DOCUMENT: document_service.process_document_analysis,
+    JOB_KIND_DOSSIER: dossier_service.process_dossier_analysis,
+}
+
+class AnalysisWorker:
+    """Exécute les jobs de la file avec une concurrence bornée"""
+
+    def __init__(self, queue: JobQueue, concurrency: int = 1, poll_interval: float = 1.0):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._stop = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Démarre les boucles de consommation en tâches de fond"""
+        self._tasks = [asyncio.create_task(self._consume(slot)) for slot in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._purge()))
+        self._tasks.append(asyncio.create_task(self._sweep_orphans()))
+        logger.info(f"👷 Worker {self.worker_id} démarré ({self.concurrency} tâche(s) concurrente(s))")
+
+    async def run(self) -> None:
+        """Démarre le worker et attend son arrêt"""
+        self.start()
+        await asyncio.gather(*self._tasks)
+
+    async def stop(self) -> None:
+        """Arrête la prise de nouveaux jobs et attend la fin des jobs en cours"""
+        logger.info(f"🛑 Arrêt du worker {self.worker_id}...")
+        self._stop.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _consume(self, slot: int) -> None:
+        while not self._stop.is_set():
+            try:
+                job = await self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"❌ Impossible de lire la file d'attente: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._execute(job)
+
+    async def _purge(self) -> None:
+        """Purge périodique des jobs terminés (au-delà de JOB_RETENTION_DAYS)"""
+        while not self._stop.is_set():
+            try:
+                await purge_completed_jobs()
+            except Exception as e:
+                logger.warning(f"⚠️ Purge des jobs terminés impossible: {e}")
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=PURGE_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _sweep_orphans(self) -> None:
+        """Remise en file périodique des analyses enregistrées dont la mise en file n'a pas abouti"""
+        while not self._stop.is_set():
+            try:
+                await requeue_orphans()
+            except Exception as e:
+                logger.warning(f"⚠️ Recherche des analyses sans job impossible: {e}")
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=ORPHAN_SWEEP_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, job: Job) -> None:
+        handler = JOB_HANDLERS.get(job.kind)
+        if handler is None:
+            await self.queue.fail(job, f"Type de job inconnu: {job.kind}")
+            return
+
+        logger.info(f"⚙️ Job {job.id} ({job.kind} {job.target_id}), tentative {job.attempts}/{job.max_attempts}")
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            with running_job(job):
+                await handler(job.target_id)
+        except Exception as e:
+            logger.error(f"❌ Job {job.id} en échec: {e}")
+            await self.queue.fail(job, str(e))
+        else:
+            await self.queue.complete(job)
+            logger.info(f"✅ Job {job.id} terminé")
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job: Job) -> None:
+        """Prolonge la réservation tant que le job tourne"""
+        interval = max(settings.JOB_VISIBILITY_TIMEOUT / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.queue.heartbeat(job)
+            except Exception as e:
+                logger.warning(f"⚠️ Prolongation du job {job.id} impossible: {e}")
+
+async def _run_worker(concurrency: int, poll_interval: float) -> None:
+    worker = AnalysisWorker(get_job_queue(), concurrency, poll_interval)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, lambda: asyncio.create_task(worker.stop()))
+        except NotImplementedError:
+            # Windows : Ctrl+C lève KeyboardInterrupt à la place
+            pass
+
+    await worker.run()
+    await write_queue.stop()
+    # Ferme les connexions du pool avant la fin de la boucle d'événements
+    await async_engine.dispose()
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Worker d'analyse SAC-DJ")
+    parser.add_argument("--concurrency", type=int, default=1, help="Nombre d'analyses simultanées")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Attente (s) quand la file est vide")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if settings.NLP_PRELOAD:
+        # Modèle spaCy chargé avant le premier job plutôt que pendant
+        nlp_service.preload()
+    asyncio.run(_run_worker(args.concurrency, args.poll_interval))
+
+if __name__ == "__main__":
+    main()
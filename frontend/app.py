@@ -5,7 +5,7 @@ import json
 import os
 import time
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator
 import logging
 
 # Configuration de la page
@@ -31,6 +31,17 @@ else:
 # Constantes
 UPLOAD_MAX_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_EXTENSIONS = ['txt', 'pdf', 'docx', 'doc']
+ANALYSIS_TIMEOUT = 300  # Attente max (s) du résultat d'une analyse
+
+# Étapes du workflow d'analyse (événements de progression)
+ANALYSIS_STEPS = {
+    'extract_entities': "Extraction des entités",
+    'analyze_deadline': "Critère de délai",
+    'analyze_quality': "Critère de qualité",
+    'analyze_object': "Critère d'objet",
+    'analyze_documents': "Critère des pièces",
+    'make_decision': "Décision finale",
+}
 
 # ===== STYLE CSS PERSONNALISÉ =====
 
@@ -115,6 +126,39 @@ def test_api_connection() -> bool:
     except:
         return False
 
+def iter_document_events(document_id: str, timeout: int = ANALYSIS_TIMEOUT) -> Iterator[Dict[str, Any]]:
+    """Itère sur les événements SSE d'un document jusqu'à la fermeture du flux ou le délai max"""
+    headers = {"Accept": "text/event-stream"}
+    if 'token' in st.session_state:
+        headers['Authorization'] = f"Bearer {st.session_state.token}"
+    
+    deadline = time.monotonic() + timeout
+    try:
+        with requests.get(
+            f"{API_BASE_URL}/api/v1/documents/{document_id}/events",
+            headers=headers,
+            stream=True,
+            timeout=(10, 60),  # Le serveur envoie un keep-alive bien avant 60s
+        ) as response:
+            if response.status_code >= 400:
+                st.error(f"❌ Erreur API ({response.status_code}): {response.text}")
+                return
+            
+            data_lines = []
+            for line in response.iter_lines(decode_unicode=True):
+                if time.monotonic() > deadline:
+                    return
+                if line:
+                    if line.startswith("data:"):
+                        data_lines.append(line[5:].strip())
+                    continue
+                # Ligne vide : fin d'un événement
+                if data_lines:
+                    yield json.loads("\n".join(data_lines))
+                    data_lines = []
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Flux d'événements interrompu: {e}")
+
 def make_api_request(method: str, endpoint: str, **kwargs) -> Optional[Dict[Any, Any]]:
     """Fait une requête à l'API avec gestion d'erreurs"""
     try:
@@ -443,28 +487,46 @@ def render_analyze_page():
                         
                         st.success("✅ Document reçu ! Analyse en cours...")
                         
-                        # Polling pour attendre le résultat
+                        # Suivi en direct via le flux d'événements (SSE) : aucune requête répétée
                         progress_bar = st.progress(0)
                         status_text = st.empty()
                         
-                        for i in range(60):  # 60 secondes max
-                            time.sleep(2)
-                            progress_bar.progress((i + 1) / 60)
-                            status_text.text(f"Analyse en cours... {i*2}s")
-                            
-                            # Vérifier le statut
-                            doc_info = make_api_request("GET", f"/api/v1/documents/{document_id}")
-                            if doc_info and doc_info.get('status') in ['completed', 'needs_review']:
-                                progress_bar.progress(1.0)
-                                status_text.text("✅ Analyse terminée !")
-                                
-                                # Afficher les résultats
-                                st.subheader("🎯 Résultats de l'Analyse")
-                                if 'classification' in doc_info and doc_info['classification']:
-                                    display_classification_result(doc_info['classification'])
+                        final_status = None
+                        completed_nodes = set()
+                        for event in iter_document_events(document_id, timeout=ANALYSIS_TIMEOUT):
+                            if event.get('type') == 'progress':
+                                node = event.get('node')
+                                label = ANALYSIS_STEPS.get(node, node)
+                                if event.get('state') == 'completed':
+                                    completed_nodes.add(node)
+                                    status_text.text(f"✔️ {label}")
+                                elif event.get('state') == 'reused':
+                                    # Critère repris d'un courrier quasi identique : étape terminée sans appel au LLM
+                                    completed_nodes.add(node)
+                                    status_text.text(f"♻️ {label} (repris)")
                                 else:
-                                    st.warning("⚠️ Aucune classification disponible")
+                                    status_text.text(f"⏳ {label}...")
+                                progress_bar.progress(min(len(completed_nodes) / len(ANALYSIS_STEPS), 0.95))
+                            elif event.get('status') in ['completed', 'needs_review', 'error']:
+                                final_status = event['status']
                                 break
+                            elif event.get('status') == 'processing':
+                                status_text.text("Analyse en cours...")
+                        
+                        if final_status in ['completed', 'needs_review']:
+                            progress_bar.progress(1.0)
+                            status_text.text("✅ Analyse terminée !")
+                            
+                            # Afficher les résultats
+                            doc_info = make_api_request("GET", f"/api/v1/documents/{document_id}")
+                            st.subheader("🎯 Résultats de l'Analyse")
+                            if doc_info and doc_info.get('classification'):
+                                display_classification_result(doc_info['classification'])
+                            else:
+                                st.warning("⚠️ Aucune classification disponible")
+                        elif final_status == 'error':
+                            status_text.text("❌ Échec de l'analyse")
+                            st.error("❌ L'analyse du document a échoué")
                         else:
                             st.warning("⏱️ Timeout: L'analyse prend plus de temps que prévu")
                     
@@ -1,68 +1,98 @@
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime, timedelta
-
-def generate_sample_data():
-    """Génère des données de démonstration pour le dashboard"""
-    dates = [datetime.now() - timedelta(days=i) for i in range(30, -1, -1)]
-    return pd.DataFrame({
-        "Date": dates,
-        "Dossiers traités": [max(10, min(30, 20 + (i-15)**2//10)) for i in range(31)],
-        "Temps moyen (min)": [max(1, 5 - i/10) for i in range(31)],
-        "Taux de réussite": [max(0.8, 0.9 + (i-15)*0.003) for i in range(31)],
-        "Type de décision": ["Recevable" if x > 0.6 else "Irrecevable" for x in [0.7, 0.8, 0.9, 0.6, 0.5] * 6 + [0.7]]
-    })
+import requests
+
+# URL de l'API (détection automatique Docker vs local)
+if os.getenv('IS_IN_DOCKER'):
+    API_BASE_URL = "http://api:8000"
+else:
+    API_BASE_URL = "http://localhost:8000"
+
+PERIOD_DAYS = 30
+
+def fetch_dashboard(days: int = PERIOD_DAYS):
+    """Agrégats du tableau de bord (None si l'API est indisponible)"""
+    headers = {}
+    if 'token' in st.session_state:
+        headers['Authorization'] = f"Bearer {st.session_state.token}"
+    try:
+        response = requests.get(
+            f"{API_BASE_URL}/api/v1/analytics/dashboard",
+            params={"days": days}, headers=headers, timeout=30
+        )
+    except requests.exceptions.RequestException as e:
+        st.error(f"🔌 Impossible de joindre l'API: {e}")
+        return None
+    if response.status_code >= 400:
+        st.error(f"❌ Erreur API ({response.status_code}): {response.text}")
+        return None
+    return response.json()
 
 def render():
     st.title("📊 Tableau de bord CSPE")
     st.write("Vue d'ensemble des analyses et statistiques")
-    
+
+    metrics = fetch_dashboard()
+    if not metrics:
+        return
+
     # KPI Cards
-    st.subheader("Indicateurs clés")
+    st.subheader(f"Indicateurs clés ({metrics['period_days']} derniers jours)")
     col1, col2, col3 = st.columns(3)
-    
+
     with col1:
-        st.metric("Dossiers traités", "742", "+12% vs mois dernier")
-    
+        st.metric("Dossiers traités", metrics["documents_this_period"], f"{metrics['total_documents']} au total")
+
     with col2:
-        st.metric("Temps moyen", "3.2 min", "-1.1 min")
-    
+        st.metric("Temps moyen", f"{metrics['average_processing_time_ms'] / 60000:.1f} min")
+
     with col3:
-        st.metric("Taux de précision", "94.5%", "+2.3%")
-    
+        st.metric("Taux de précision", f"{metrics['ia_accuracy_percent']:.1f}%")
+
+    df = pd.DataFrame(metrics["timeline"])
+    if df.empty:
+        st.info("Aucune analyse sur la période")
+        return
+    df["Date"] = pd.to_datetime(df["bucket_start"])
+    df["Temps moyen (min)"] = df["average_processing_time_ms"] / 60000
+    df["Taux de réussite"] = df["ia_accuracy_percent"]
+
     # Graphiques
     st.subheader("Activité récente")
-    df = generate_sample_data()
-    
+
     # Graphique d'activité
     fig1 = px.line(
-        df, x="Date", y="Dossiers traités",
+        df, x="Date", y="classifications",
         title="Volume de dossiers traités",
-        labels={"Dossiers traités": "Nombre de dossiers"}
+        labels={"classifications": "Nombre de dossiers"}
     )
     st.plotly_chart(fig1, use_container_width=True)
-    
+
     # Graphique de répartition
     col1, col2 = st.columns(2)
-    
+
     with col1:
+        decisions = pd.DataFrame(metrics["classification_results"])
         fig2 = px.pie(
-            df, names="Type de décision",
+            decisions, names="result", values="count",
             title="Répartition des décisions"
         )
         st.plotly_chart(fig2, use_container_width=True)
-    
+
     with col2:
         fig3 = px.bar(
             df, x="Date", y="Temps moyen (min)",
             title="Temps de traitement moyen"
         )
         st.plotly_chart(fig3, use_container_width=True)
-    
+
     # Dernières activités
     st.subheader("Dernières activités")
     st.dataframe(
-        df[["Date", "Dossiers traités", "Taux de réussite"]].tail(5),
+        df[["Date", "classifications", "needs_review", "Taux de réussite"]]
+        .rename(columns={"classifications": "Dossiers traités", "needs_review": "À réviser"})
+        .tail(5),
         hide_index=True
-    )
\ No newline at end of file
+    )
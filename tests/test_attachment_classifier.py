@@ -0,0 +1,25 @@
+# tests/test_attachment_classifier.py
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path Python
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.services.attachment_classifier import classify_attachment
+
+def test_classify_invoice():
+    """Une facture d'électricité est reconnue sans appel au LLM"""
+    text = "FACTURE N° 2023-0042\nConsommation : 3 200 kWh\nMontant TTC : 512,30 €"
+    attachment_type, confidence = classify_attachment(text, "scan_001.pdf")
+    assert attachment_type == "facture"
+    assert confidence > 0.5
+
+def test_classify_decision_from_filename():
+    """Le nom de fichier suffit à typer une copie de délibération"""
+    attachment_type, _ = classify_attachment("", "deliberation_CRE_2022.pdf")
+    assert attachment_type == "copie_decision"
+
+def test_classify_unknown():
+    """Une pièce sans indice reste non identifiée"""
+    assert classify_attachment("Bonjour, veuillez trouver ci-joint.", "doc.txt") == ("autre", 0.0)
@@ -0,0 +1,42 @@
+# tests/test_ddsketch.py
+import random
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path Python
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.utils.ddsketch import DDSketch
+
+def _exact(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+def test_relative_accuracy():
+    """Chaque quantile est restitué à la précision relative près"""
+    rng = random.Random(42)
+    values = [rng.lognormvariate(8, 1.2) for _ in range(20000)]
+    sketch = DDSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    for q in (0.5, 0.95, 0.99):
+        exact = _exact(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact
+
+def test_merge_and_round_trip():
+    """Deux esquisses fusionnées valent l'esquisse de l'ensemble, y compris après sérialisation"""
+    left, right, whole = DDSketch(), DDSketch(), DDSketch()
+    for value in [0, 0.5, 3, 120, 4500]:
+        left.add(value)
+        whole.add(value)
+    for value in [12, 90000, 7]:
+        right.add(value)
+        whole.add(value)
+    merged = DDSketch.from_bytes(left.to_bytes())
+    merged.merge(DDSketch.from_bytes(right.to_bytes()))
+    assert merged.count == whole.count == 8
+    assert merged.bins == whole.bins and merged.zero_count == 1
+    assert [merged.quantile(q) for q in (0, 0.5, 1)] == [whole.quantile(q) for q in (0, 0.5, 1)]
+    assert merged.quantile(1) == 90000
+    assert DDSketch().quantile(0.5) is None
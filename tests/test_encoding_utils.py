@@ -0,0 +1,44 @@
+# tests/test_encoding_utils.py
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path Python
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.utils import encoding_utils
+from app.utils.encoding_utils import decode_bytes, read_text_file
+
+TEXTE = "Recours contre la décision de la CRE — montant contesté : 1 250 € « CSPE »"
+
+def test_decode_utf8():
+    """Le texte UTF-8 valide est décodé tel quel"""
+    assert decode_bytes(TEXTE.encode("utf-8")) == (TEXTE, "utf-8")
+
+def test_decode_bom():
+    """Les marques BOM sont prioritaires sur l'heuristique"""
+    assert decode_bytes(TEXTE.encode("utf-8-sig")) == (TEXTE, "utf-8-sig")
+    assert decode_bytes(TEXTE.encode("utf-16")) == (TEXTE, "utf-16")
+
+def test_decode_cp1252_not_latin1():
+    """Les guillemets et le symbole euro Windows sont reconnus comme cp1252"""
+    texte = "Le requérant conteste la facture de 300 € – « CSPE »"
+    assert decode_bytes(texte.encode("cp1252")) == (texte, "cp1252")
+
+def test_decode_cp850():
+    """Un fichier DOS (cp850) n'est pas décodé comme du Windows-1252"""
+    texte = "Décision du ministère : délai dépassé, requête à rejeter"
+    assert decode_bytes(texte.encode("cp850")) == (texte, "cp850")
+
+def test_read_text_file_mmap(tmp_path, monkeypatch):
+    """Les gros fichiers sont lus par projection mémoire avec le même résultat"""
+    monkeypatch.setattr(encoding_utils, "MMAP_THRESHOLD_BYTES", 16)
+    file_path = tmp_path / "recours.txt"
+    file_path.write_bytes(TEXTE.encode("cp1252"))
+    assert read_text_file(file_path) == (TEXTE, "cp1252")
+
+def test_read_empty_file(tmp_path):
+    """Un fichier vide ne peut pas être projeté en mémoire"""
+    file_path = tmp_path / "vide.txt"
+    file_path.write_bytes(b"")
+    assert read_text_file(file_path) == ("", "utf-8")
@@ -0,0 +1,35 @@
+# tests/test_entity_extractor.py
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path Python
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.services.entity_extractor import (
+    CONFIDENCE_ANCHORED, CONFIDENCE_CONFLICT, CONFIDENCE_UNANCHORED, _resolve, normalize_date, parse_amount
+)
+
+def test_normalize_date():
+    """Dates en toutes lettres ou numériques ramenées au format DD/MM/YYYY"""
+    assert normalize_date("1er février 2023") == "01/02/2023"
+    assert normalize_date("12 Mars 2023") == "12/03/2023"
+    assert normalize_date("5/3/2023") == "05/03/2023"
+    assert normalize_date("31/02/2023") is None
+    assert normalize_date("douze mars 2023") is None
+
+def test_parse_amount():
+    """Montants écrits à la française"""
+    assert parse_amount("1 234,56 €") == 1234.56
+    assert parse_amount("1 500 euros") == 1500.0
+    assert parse_amount("1.234.567 €") == 1234567.0
+    assert parse_amount("1.500 €") == 1500.0
+    assert parse_amount("12.50 €") == 12.5
+    assert parse_amount("€") is None
+
+def test_resolve_confidence():
+    """Une valeur ancrée unique est sûre ; des valeurs concurrentes ou non ancrées ne le sont pas"""
+    assert _resolve(["a", "a"]) == ("a", CONFIDENCE_ANCHORED)
+    assert _resolve(["a", "b"]) == ("a", CONFIDENCE_CONFLICT)
+    assert _resolve([], ["a"]) == ("a", CONFIDENCE_UNANCHORED)
+    assert _resolve([], ["a", "b"]) == (None, 0.0)
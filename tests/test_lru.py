@@ -0,0 +1,26 @@
+# tests/test_lru.py
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path Python
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.utils.lru import LRUCache
+
+def test_eviction_order():
+    """L'entrée la moins récemment utilisée est évincée en premier"""
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+def test_disabled_cache():
+    """Une taille nulle désactive le cache"""
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+    assert len(cache) == 0
+    assert cache.get("a", "absent") == "absent"
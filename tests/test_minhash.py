@@ -0,0 +1,35 @@
+# tests/test_minhash.py
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path Python
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.utils.minhash import MinHasher, normalize_text
+
+LETTER = """Maître Dupont, avocat au barreau de Paris, agissant pour le compte de M. {name}, demeurant {address},
+a l'honneur de former un recours contre la décision de la Commission de régulation de l'énergie du {date}
+rejetant la demande de restitution de la contribution au service public de l'électricité (CSPE) pour un
+montant de {amount} euros au titre des années 2009 à 2015. Le requérant soutient que la CSPE méconnaît la
+directive 2003/96/CE en ce qu'elle poursuit des objectifs non spécifiques. Il demande en conséquence la
+restitution des sommes versées, assorties des intérêts moratoires. Pièces jointes : copie de la décision
+contestée, factures d'électricité, justificatif d'identité."""
+
+def test_normalize_text():
+    """Minuscules, sans accents, nombres ramenés à 0"""
+    assert normalize_text("Décision du 12/03/2019 : 1 234,56 €") == ["decision", "du", "0", "0", "0", "0", "0", "0"]
+
+def test_form_letters_are_near_duplicates():
+    """Deux lettres types du même cabinet se retrouvent par l'index, un courrier sans rapport non"""
+    hasher = MinHasher()
+    first = hasher.signature(LETTER.format(name="Jean Martin", address="12 rue des Lilas, Lyon", date="12 mars 2019", amount="1 234,56"))
+    second = hasher.signature(LETTER.format(name="Sophie Bernard", address="3 avenue Foch, Nice", date="4 juin 2020", amount="987,00"))
+    other = hasher.signature("Je conteste la facture de gaz reçue en janvier, le relevé du compteur est erroné.")
+
+    assert hasher.similarity(first, second) >= 0.75
+    assert hasher.similarity(first, other) < 0.1
+    assert set(hasher.band_keys(first)) & set(hasher.band_keys(second))
+    assert not set(hasher.band_keys(first)) & set(hasher.band_keys(other))
+    assert (MinHasher.from_bytes(MinHasher.to_bytes(first)) == first).all()
+    assert hasher.signature(" ,; ") is None
@@ -0,0 +1,37 @@
+# tests/test_pagination.py
+import sys
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+# Ajouter le répertoire parent au path Python
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.utils.pagination import decode_cursor, encode_cursor, split_page
+
+Row = namedtuple("Row", ["id", "cursor_key"])
+
+def test_cursor_roundtrip():
+    """Le texte stocké par SQLite est restitué tel quel (sans reformatage)"""
+    cursor = encode_cursor("2026-10-18 10:00:00", "doc-1")
+    assert decode_cursor(cursor) == ("2026-10-18 10:00:00", "doc-1")
+    assert decode_cursor(encode_cursor(datetime(2026, 10, 18, 10, 0, 0, 5), "doc-2")) == (
+        "2026-10-18T10:00:00.000005", "doc-2"
+    )
+
+def test_invalid_cursor():
+    """Un curseur illisible est refusé (400 côté API)"""
+    assert decode_cursor(None) is None
+    with pytest.raises(ValueError):
+        decode_cursor("pas-un-curseur")
+
+def test_split_page():
+    """La ligne supplémentaire signale une page suivante qui reprend après la dernière ligne rendue"""
+    rows = [Row(f"doc-{i}", f"2026-10-18 10:00:0{i}") for i in range(3)]
+    page, next_cursor = split_page(rows, 2, "id")
+    assert page == rows[:2]
+    assert decode_cursor(next_cursor) == ("2026-10-18 10:00:01", "doc-1")
+    assert split_page(rows, 3, "id") == (rows, None)
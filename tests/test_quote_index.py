@@ -0,0 +1,51 @@
+# tests/test_quote_index.py
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path Python
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.utils.quote_index import QuoteIndex, normalize_words
+
+DOCUMENT = """Paris, le 12 mars 2023
+
+Objet : recours contre la décision implicite de rejet
+
+Je conteste la décision du 1er février 2023 de la Commission de régulation
+de l'énergie, notifiée le 3 février 2023, et demande le remboursement de la
+contribution au service public de l'électricité acquittée en 2012.
+"""
+
+def test_normalize_words():
+    """Casse, accents, ponctuation et espaces ne comptent pas"""
+    assert normalize_words("L'Énergie,  élevée !") == ["l", "energie", "elevee"]
+
+def test_exact_quote():
+    """Une citation recopiée (retours à la ligne, accents, casse) est retrouvée entièrement"""
+    index = QuoteIndex(DOCUMENT)
+    assert index.coverage("« la décision du 1er février 2023 de la Commission de régulation de l'énergie »") == 1.0
+    assert index.coverage("REGULATION DE L ENERGIE") == 1.0
+
+def test_fuzzy_quote():
+    """Une citation légèrement altérée ou tronquée par « ... » garde une couverture élevée"""
+    index = QuoteIndex(DOCUMENT)
+    assert index.coverage("demande le remboursement de la contribution ... acquittée en 2012") == 1.0
+    coverage = index.coverage("je conteste la décision du 1er février 2023 de la commission de regulation de l'energie notifiée le 4 février 2023")
+    assert 0.8 <= coverage < 1.0
+
+def test_invented_quote():
+    """Une citation inventée n'est pas retrouvée"""
+    index = QuoteIndex(DOCUMENT)
+    assert index.coverage("le demandeur a joint une copie de sa carte d'identité") < 0.2
+    assert index.coverage("") is None
+    assert index.coverage("...") is None
+
+def test_one_word_changed():
+    """Un mot remplacé ou une faute de frappe ne fait perdre que ce mot (réglages par défaut, seuil 0.8)"""
+    index = QuoteIndex(DOCUMENT)
+    quote = "je conteste la {} du 1er février 2023 de la commission de régulation de l'énergie"
+    assert index.coverage(quote.format("décision")) == 1.0
+    assert index.coverage(quote.format("délibération")) >= 0.8
+    assert index.coverage(quote.format("décison")) >= 0.8
+    assert index.coverage("je conteste la décision du 1er février 2023 de la comission") >= 0.8
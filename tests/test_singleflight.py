@@ -0,0 +1,43 @@
+# tests/test_singleflight.py
+import asyncio
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path Python
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.utils.singleflight import SingleFlight
+
+def test_concurrent_calls_share_one_execution():
+    """Les appels concurrents de même clé partagent une seule exécution"""
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def scenario():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.run("doc", work) for _ in range(5)))
+        assert len(flights) == 0
+        # Une fois terminée, la clé peut être relancée
+        await flights.run("doc", work)
+        return results
+
+    assert asyncio.run(scenario()) == ["ok"] * 5
+    assert len(runs) == 2
+
+def test_exception_is_shared():
+    """L'exception de l'exécution partagée est propagée à tous les appelants"""
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        flights = SingleFlight()
+        return await asyncio.gather(flights.run(1, fail), flights.run(1, fail), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
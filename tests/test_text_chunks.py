@@ -0,0 +1,39 @@
+# tests/test_text_chunks.py
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path Python
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.utils.text_chunks import split_paragraphs
+
+TEXT = "Premier paragraphe. Rien ici.\n\nDeuxième paragraphe de M. Dupont.\n\nFin."
+
+def test_short_text_single_chunk():
+    """Un texte sous la limite n'est pas découpé"""
+    assert split_paragraphs(TEXT, 1000) == [(0, TEXT)]
+    assert split_paragraphs("", 10) == [(0, "")]
+
+def test_cuts_between_paragraphs():
+    """Les coupures tombent entre paragraphes et les décalages replacent chaque morceau"""
+    chunks = split_paragraphs(TEXT, 36)
+    assert [chunk for _, chunk in chunks] == [
+        "Premier paragraphe. Rien ici.\n\n",
+        "Deuxième paragraphe de M. Dupont.\n\n",
+        "Fin.",
+    ]
+    for offset, chunk in chunks:
+        assert TEXT[offset:offset + len(chunk)] == chunk
+
+def test_long_paragraph_falls_back_to_words():
+    """Un paragraphe trop long est coupé entre mots, sans dépasser la limite"""
+    text = " ".join(["mot"] * 50)
+    chunks = split_paragraphs(text, 20)
+    assert "".join(chunk for _, chunk in chunks) == text
+    assert all(len(chunk) <= 20 for _, chunk in chunks)
+    assert all(chunk.endswith(" ") for _, chunk in chunks[:-1])
+
+def test_unbreakable_text_is_hard_cut():
+    """Sans séparateur, le texte est coupé à la limite"""
+    assert split_paragraphs("x" * 25, 10) == [(0, "x" * 10), (10, "x" * 10), (20, "x" * 5)]